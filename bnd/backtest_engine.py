@@ -0,0 +1,438 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+BACKTEST_ENGINES = ("backtrader", "vectorized")
+# fixed buys one share per trade (backtrader's default sizer); all_in buys
+# with all available cash (AllInSizer)
+BACKTEST_SIZERS = ("fixed", "all_in")
+
+# Bars stepped between progress reports in sweeps; each report is also
+# where a cancelled pool job stops
+PROGRESS_EVERY = 100
+
+
+def summarize_backtest(initial_value, final_value, total_trades, won_trades, lost_trades, max_drawdown):
+    """Build the BacktestResult fields from raw engine output"""
+    total_return = final_value - initial_value
+    total_return_pct = (total_return / initial_value) * 100
+    win_rate = (won_trades / total_trades * 100) if total_trades > 0 else 0
+
+    return {
+        'final_value': round(final_value, 2),
+        'initial_value': round(initial_value, 2),
+        'total_return': round(total_return, 2),
+        'total_return_pct': round(total_return_pct, 2),
+        'total_trades': total_trades,
+        'winning_trades': won_trades,
+        'losing_trades': lost_trades,
+        'win_rate': round(win_rate, 2),
+        'max_drawdown': round(max_drawdown, 2),
+    }
+
+
+def equity_event(date, value):
+    return {'type': 'equity', 'date': date.strftime('%Y-%m-%d'), 'value': round(float(value), 2)}
+
+
+def trade_event(entry_date, exit_date, size, entry_price, exit_price, pnl):
+    return {
+        'type': 'trade',
+        'entry_date': entry_date.strftime('%Y-%m-%d'),
+        'exit_date': exit_date.strftime('%Y-%m-%d'),
+        'size': round(float(size), 6),
+        'entry_price': round(float(entry_price), 4),
+        'exit_price': round(float(exit_price), 4),
+        'pnl': round(float(pnl), 2),
+    }
+
+
+def run_backtrader_backtest(bars, rsi_period, rsi_buy, rsi_sell, initial_cash, progress=None, events=None,
+                            sizer="fixed"):
+    """Run RSIStrategy bar by bar through bt.Cerebro (see backtrader_engine).
+
+    backtrader is slow to import, so it is only loaded once a process
+    actually runs a backtrader backtest.
+    """
+    from backtrader_engine import run_cerebro_backtest
+    return run_cerebro_backtest(bars, rsi_period, rsi_buy, rsi_sell, initial_cash, progress=progress, events=events,
+                                sizer=sizer)
+
+
+def rsi_sma(close, period):
+    """RSI with simple moving averages of gains and losses, as bt.indicators.RSI_SMA.
+
+    Returns an array aligned with close; the first ``period`` values are NaN.
+    Windows without losses follow RSI_SMA's safediv: 100, or 50 if also flat
+    (RSIStrategy itself does not set safediv, and raises on them instead).
+    A 2-D close (bars x assets) gets one RSI per column.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    rsi = np.full(close.shape, np.nan)
+    if close.shape[0] <= period:
+        return rsi
+
+    delta = np.diff(close, axis=0)
+    up = sliding_window_view(np.maximum(delta, 0.0), period, axis=0).mean(axis=-1)
+    down = sliding_window_view(np.maximum(-delta, 0.0), period, axis=0).mean(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = 100.0 - 100.0 / (1.0 + up / down)
+    values[down == 0.0] = np.where(up[down == 0.0] > 0.0, 100.0, 50.0)
+    rsi[period:] = values
+    return rsi
+
+
+class SimulationResult:
+    """Equity curve and closed trades from simulate_rsi_strategy"""
+    __slots__ = ('equity', 'trades', 'open_trade', 'final_value')
+
+    def __init__(self, equity, trades, open_trade, final_value):
+        self.equity = equity
+        self.trades = trades  # list of (entry_idx, exit_idx, size, entry_price, exit_price, pnl)
+        self.open_trade = open_trade
+        self.final_value = final_value
+
+
+def simulate_rsi_strategy(open_, close, rsi, rsi_buy, rsi_sell, initial_cash, sizer="fixed", progress=None):
+    """Replay RSIStrategy's orders on arrays with backtrader's fill rules.
+
+    A signal on bar i fills at the open of bar i + 1. Buys are one share
+    (sizer="fixed") or sized all-in on the signal bar's close
+    (sizer="all_in", as AllInSizer), and are rejected for margin when cash
+    does not cover them at that close or at the next open, leaving the
+    strategy flat to retry. progress(bar, bars), if given, is called before
+    each round trip.
+    """
+    n = close.size
+    entries = np.flatnonzero(rsi[:-1] < rsi_buy)
+    exits = np.flatnonzero(rsi[:-1] > rsi_sell)
+
+    cash = initial_cash
+    trades = []
+    fills = []  # (bar, cash after fill, position size after fill)
+    bar = 0
+    open_trade = None
+    while True:
+        if progress is not None:
+            progress(bar, n)
+        # Next buy signal that the broker accepts
+        k = np.searchsorted(entries, bar)
+        while k < entries.size:
+            i = entries[k]
+            size = cash / close[i] if sizer == "all_in" else 1.0
+            if cash - size * close[i] >= 0.0 and cash - size * open_[i + 1] >= 0.0:
+                break
+            k += 1
+        else:
+            break
+        entry_bar, entry_price = i + 1, open_[i + 1]
+        cash -= size * entry_price
+        fills.append((entry_bar, cash, size))
+        open_trade = (entry_bar, size, entry_price)
+
+        # First sell signal once the position is held
+        k = np.searchsorted(exits, entry_bar)
+        if k == exits.size:
+            break
+        exit_bar = exits[k] + 1
+        exit_price = open_[exit_bar]
+        pnl = size * (exit_price - entry_price)
+        cash += size * entry_price + pnl
+        fills.append((exit_bar, cash, 0.0))
+        trades.append((entry_bar, exit_bar, size, entry_price, exit_price, pnl))
+        open_trade = None
+        bar = exit_bar
+
+    # Holdings change only at fills, so forward-fill them across the bars
+    cash_curve = np.full(n, initial_cash)
+    size_curve = np.zeros(n)
+    if fills:
+        fill_bars = np.array([f[0] for f in fills])
+        seg = np.searchsorted(fill_bars, np.arange(n), side='right') - 1
+        held = seg >= 0
+        cash_curve[held] = np.array([f[1] for f in fills])[seg[held]]
+        size_curve[held] = np.array([f[2] for f in fills])[seg[held]]
+    equity = cash_curve + size_curve * close
+
+    return SimulationResult(equity, trades, open_trade, float(equity[-1]))
+
+
+def max_drawdown_pct(equity, initial_value):
+    """Largest peak-to-trough fall of the equity curve, in percent"""
+    peak = np.maximum.accumulate(np.maximum(equity, initial_value))
+    return float(np.max(100.0 * (peak - equity) / peak)) if equity.size else 0.0
+
+
+def run_vectorized_backtest(bars, rsi_period, rsi_buy, rsi_sell, initial_cash, progress=None, events=None,
+                            sizer="fixed"):
+    """Array-based equivalent of run_backtrader_backtest for RSIStrategy.
+
+    bars is a Bars or a frame with Date, Open and Close columns; prices are
+    simulated in float64 whatever their stored dtype.
+    """
+    open_ = np.asarray(bars['Open'], dtype=np.float64)
+    close = np.asarray(bars['Close'], dtype=np.float64)
+    rsi = rsi_sma(close, rsi_period)
+    sim = simulate_rsi_strategy(open_, close, rsi, rsi_buy, rsi_sell, initial_cash, sizer, progress)
+
+    if events is not None:
+        # Same order as EventAnalyzer: a trade closing on a bar precedes its equity point
+        dates = pd.DatetimeIndex(bars['Date'])
+        trades = iter(sim.trades)
+        trade = next(trades, None)
+        for i, value in enumerate(sim.equity):
+            while trade is not None and trade[1] == i:
+                entry, exit_, size, entry_price, exit_price, pnl = trade
+                events(trade_event(dates[entry], dates[exit_], size, entry_price, exit_price, pnl))
+                trade = next(trades, None)
+            events(equity_event(dates[i], value))
+
+    return summarize_simulation(sim, initial_cash)
+
+
+def summarize_simulation(sim, initial_cash):
+    """BacktestResult fields for a SimulationResult"""
+    # TradeAnalyzer counts a still-open position in the total
+    won_trades = sum(1 for t in sim.trades if t[5] >= 0.0)
+    lost_trades = len(sim.trades) - won_trades
+    total_trades = len(sim.trades) + (1 if sim.open_trade else 0)
+
+    return summarize_backtest(
+        initial_cash,
+        sim.final_value,
+        total_trades,
+        won_trades,
+        lost_trades,
+        max_drawdown_pct(sim.equity, initial_cash),
+    )
+
+
+def sweep_rsi_thresholds(open_, close, rsi, rsi_buys, rsi_sells, initial_cash, sizer="fixed", progress=None):
+    """Run RSIStrategy for many (buy, sell) threshold pairs over one RSI series.
+
+    Bars are stepped once and every pair's broker state is carried as a
+    vector, so the cost grows with the number of bars rather than the number
+    of combinations. Fill rules and sizing match simulate_rsi_strategy
+    with the same sizer. progress(bar, bars), if given, is called every
+    PROGRESS_EVERY bars. Returns a dict of per-pair arrays: final_value,
+    total_trades, winning_trades, losing_trades and max_drawdown (percent).
+    """
+    rsi_buys = np.asarray(rsi_buys, dtype=np.float64)
+    rsi_sells = np.asarray(rsi_sells, dtype=np.float64)
+    k = rsi_buys.size
+    n = close.size
+
+    # Signal masks for every bar and pair up front; NaN RSI never signals
+    below = rsi[:, None] < rsi_buys[None, :]
+    above = rsi[:, None] > rsi_sells[None, :]
+
+    cash = np.full(k, float(initial_cash))
+    size = np.zeros(k)
+    entry_price = np.zeros(k)
+    pending_buy = np.zeros(k, dtype=bool)
+    pending_sell = np.zeros(k, dtype=bool)
+    peak = np.full(k, float(initial_cash))
+    max_dd = np.zeros(k)
+    closed = np.zeros(k, dtype=np.int64)
+    won = np.zeros(k, dtype=np.int64)
+
+    for t in range(n):
+        if progress is not None and t % PROGRESS_EVERY == 0:
+            progress(t, n)
+        if pending_buy.any():
+            want = cash / close[t - 1] if sizer == "all_in" else np.ones(k)
+            ok = pending_buy & (cash - want * close[t - 1] >= 0.0) & (cash - want * open_[t] >= 0.0)
+            size[ok] = want[ok]
+            cash[ok] -= want[ok] * open_[t]
+            entry_price[ok] = open_[t]
+        if pending_sell.any():
+            s = pending_sell
+            pnl = size[s] * (open_[t] - entry_price[s])
+            cash[s] += size[s] * entry_price[s] + pnl
+            size[s] = 0.0
+            closed[s] += 1
+            won[s] += pnl >= 0.0
+
+        equity = cash + size * close[t]
+        np.maximum(peak, equity, out=peak)
+        np.maximum(max_dd, 100.0 * (peak - equity) / peak, out=max_dd)
+
+        if t < n - 1:
+            holding = size > 0.0
+            pending_buy = ~holding & below[t]
+            pending_sell = holding & above[t]
+
+    open_trades = (size > 0.0).astype(np.int64)
+    return {
+        'final_value': cash + size * close[-1],
+        'total_trades': closed + open_trades,
+        'winning_trades': won,
+        'losing_trades': closed - won,
+        'max_drawdown': max_dd,
+    }
+
+
+def run_rsi_sweep(bars, rsi_periods, threshold_pairs, initial_cash, sizer="fixed", progress=None):
+    """Evaluate every (period, buy, sell) combination over the same bars.
+
+    RSI is computed once per distinct period and all threshold pairs for that
+    period are evaluated together by sweep_rsi_thresholds. Returns one
+    BacktestResult-shaped dict per combination, tagged with its parameters.
+    """
+    open_ = np.asarray(bars['Open'], dtype=np.float64)
+    close = np.asarray(bars['Close'], dtype=np.float64)
+    rsi_buys = [pair[0] for pair in threshold_pairs]
+    rsi_sells = [pair[1] for pair in threshold_pairs]
+
+    total = len(rsi_periods) * close.size
+    rows = []
+    for done, period in enumerate(rsi_periods):
+        report = None
+        if progress is not None:
+            def report(bar, _, offset=done * close.size):
+                progress(offset + bar, total)
+        rsi = rsi_sma(close, period)
+        metrics = sweep_rsi_thresholds(open_, close, rsi, rsi_buys, rsi_sells, initial_cash, sizer=sizer,
+                                       progress=report)
+        for j, (rsi_buy, rsi_sell) in enumerate(threshold_pairs):
+            row = summarize_backtest(
+                initial_cash,
+                float(metrics['final_value'][j]),
+                int(metrics['total_trades'][j]),
+                int(metrics['winning_trades'][j]),
+                int(metrics['losing_trades'][j]),
+                float(metrics['max_drawdown'][j]),
+            )
+            row.update(rsi_period=period, rsi_buy=rsi_buy, rsi_sell=rsi_sell)
+            rows.append(row)
+    return rows
+
+
+def run_backtest_engine(bars, engine, rsi_period, rsi_buy, rsi_sell, initial_cash, progress=None, events=None,
+                        sizer="fixed"):
+    if engine == "vectorized":
+        return run_vectorized_backtest(bars, rsi_period, rsi_buy, rsi_sell, initial_cash,
+                                       progress=progress, events=events, sizer=sizer)
+    return run_backtrader_backtest(bars, rsi_period, rsi_buy, rsi_sell, initial_cash,
+                                   progress=progress, events=events, sizer=sizer)
+
+
+def walk_forward_windows(dates, train_months, test_months, step_months, anchored=False):
+    """Split a date index into (train_start, train_end, test_start, test_end) bar ranges.
+
+    Ranges are half-open positions into dates. Test windows start
+    train_months after the first bar and move forward step_months at a
+    time; the train window either trails the test window (rolling) or
+    always starts at the first bar (anchored). Only windows whose test
+    period fits inside the data are returned.
+    """
+    dates = pd.DatetimeIndex(dates)
+    if dates.empty:
+        return []
+    first, last = dates[0], dates[-1]
+
+    windows = []
+    k = 0
+    while True:
+        test_start = first + pd.DateOffset(months=train_months + k * step_months)
+        test_end = test_start + pd.DateOffset(months=test_months)
+        if test_end > last + pd.Timedelta(days=1):
+            break
+        train_start = first if anchored else test_start - pd.DateOffset(months=train_months)
+        bounds = dates.searchsorted([train_start, test_start, test_end])
+        if bounds[1] > bounds[0] and bounds[2] > bounds[1]:
+            windows.append((int(bounds[0]), int(bounds[1]), int(bounds[1]), int(bounds[2])))
+        k += 1
+    return windows
+
+
+def run_walk_forward(bars, windows, rsi_period, threshold_pairs, optimize_by, initial_cash, progress=None):
+    """Optimize RSI thresholds on each train window and evaluate them on its test window.
+
+    RSI is computed once over the whole series and sliced per window, so
+    overlapping windows share it and each window starts with a warmed-up
+    indicator. With a single threshold pair nothing is optimized and that
+    pair is tested everywhere. Every window starts from initial_cash.
+    """
+    open_ = np.asarray(bars['Open'], dtype=np.float64)
+    close = np.asarray(bars['Close'], dtype=np.float64)
+    dates = pd.DatetimeIndex(bars['Date'])
+    rsi = rsi_sma(close, rsi_period)
+    rsi_buys = [pair[0] for pair in threshold_pairs]
+    rsi_sells = [pair[1] for pair in threshold_pairs]
+    lower_is_better = optimize_by == 'max_drawdown'
+
+    # Progress counts the bars stepped through, train and test, over all windows
+    total = sum((train_hi - train_lo) + (test_hi - test_lo) for train_lo, train_hi, test_lo, test_hi in windows)
+    offset = 0
+
+    rows = []
+    for train_lo, train_hi, test_lo, test_hi in windows:
+        train_report = test_report = None
+        if progress is not None:
+            def train_report(bar, _, offset=offset):
+                progress(offset + bar, total)
+
+            def test_report(bar, _, offset=offset + train_hi - train_lo):
+                progress(offset + bar, total)
+        offset += (train_hi - train_lo) + (test_hi - test_lo)
+
+        # Pick the train window's best pair; sweep metrics match a single run's
+        train = sweep_rsi_thresholds(open_[train_lo:train_hi], close[train_lo:train_hi],
+                                     rsi[train_lo:train_hi], rsi_buys, rsi_sells, initial_cash, sizer="all_in",
+                                     progress=train_report)
+        if optimize_by == 'win_rate':
+            trades = train['total_trades']
+            score = np.divide(train['winning_trades'], trades, out=np.zeros(trades.size), where=trades > 0)
+        elif optimize_by in ('max_drawdown', 'total_trades'):
+            score = train[optimize_by]
+        else:
+            # Returns rank the same as final values, since cash is shared
+            score = train['final_value']
+        best = int(np.argmin(score) if lower_is_better else np.argmax(score))
+        rsi_buy, rsi_sell = threshold_pairs[best]
+
+        sim = simulate_rsi_strategy(open_[test_lo:test_hi], close[test_lo:test_hi],
+                                    rsi[test_lo:test_hi], rsi_buy, rsi_sell, initial_cash, sizer="all_in",
+                                    progress=test_report)
+        row = summarize_simulation(sim, initial_cash)
+        row.update(
+            train_start=dates[train_lo].strftime('%Y-%m-%d'),
+            train_end=dates[train_hi - 1].strftime('%Y-%m-%d'),
+            test_start=dates[test_lo].strftime('%Y-%m-%d'),
+            test_end=dates[test_hi - 1].strftime('%Y-%m-%d'),
+            rsi_buy=rsi_buy,
+            rsi_sell=rsi_sell,
+            train_return_pct=round(float((train['final_value'][best] - initial_cash) / initial_cash * 100), 2),
+        )
+        rows.append(row)
+    return rows
+
+
+def summarize_walk_forward(rows):
+    """Aggregate statistics over walk-forward test windows"""
+    if not rows:
+        return None
+    returns = np.array([row['total_return_pct'] for row in rows]) / 100.0
+    trades = sum(row['total_trades'] for row in rows)
+
+    # Chain test windows that do not overlap, as if traded back to back
+    chained, last_end = 1.0, ''
+    for row, r in zip(rows, returns):
+        if row['test_start'] > last_end:
+            chained *= 1.0 + r
+            last_end = row['test_end']
+
+    won = sum(row['winning_trades'] for row in rows)
+    return {
+        'windows': len(rows),
+        'mean_return_pct': round(float(returns.mean() * 100), 2),
+        'median_return_pct': round(float(np.median(returns) * 100), 2),
+        'std_return_pct': round(float(returns.std() * 100), 2),
+        'positive_windows_pct': round(float((returns > 0).mean() * 100), 2),
+        'chained_return_pct': round(float((chained - 1.0) * 100), 2),
+        'mean_train_return_pct': round(float(np.mean([row['train_return_pct'] for row in rows])), 2),
+        'total_trades': trades,
+        'win_rate': round(won / trades * 100, 2) if trades > 0 else 0.0,
+        'worst_drawdown': round(max(row['max_drawdown'] for row in rows), 2),
+    }
@@ -0,0 +1,198 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeout
+
+from backtest_engine import run_backtest_engine
+from backtest_pool import BacktestCancelled, PoolSaturated
+
+BACKTEST_JOB_WORKERS = int(os.environ.get("BACKTEST_JOB_WORKERS", 2))
+BACKTEST_JOB_QUEUE_SIZE = int(os.environ.get("BACKTEST_JOB_QUEUE_SIZE", 100))
+BACKTEST_JOB_RESULT_TTL = float(os.environ.get("BACKTEST_JOB_RESULT_TTL", 3600))
+
+QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED = "queued", "running", "completed", "failed", "cancelled"
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting"""
+
+
+class BacktestJobRecord:
+    __slots__ = ('id', 'request', 'status', 'created_at', 'finished_at',
+                 'result', 'error', 'pool_job', 'cancel_requested', 'total_bars')
+
+    def __init__(self, request):
+        self.id = uuid.uuid4().hex
+        self.request = request
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.pool_job = None
+        self.cancel_requested = False
+        self.total_bars = 0
+
+    def progress(self):
+        """Return (bars processed, total bars) as far as is known"""
+        if self.pool_job is not None:
+            return self.pool_job.progress()
+        if self.status == COMPLETED:
+            return self.total_bars, self.total_bars
+        return 0, self.total_bars
+
+
+class BacktestJobQueue:
+    """Local queue of backtest jobs that clients submit and then poll.
+
+    A fixed number of worker threads take jobs in order, load their bars and
+    hand the CPU work to the BacktestPool, so the HTTP request returns at once
+    with a job id. ``load_bars(kind, params, ticker, start, end)`` returns the
+    bars, the result cache key and any cached result; cached jobs complete
+    without touching the pool and fresh results are stored in ``result_cache``. Finished jobs are kept for ``result_ttl`` seconds so the
+    result can be re-polled, then dropped.
+    """
+
+    def __init__(self, pool, load_bars, result_cache, workers=BACKTEST_JOB_WORKERS,
+                 max_queued=BACKTEST_JOB_QUEUE_SIZE, result_ttl=BACKTEST_JOB_RESULT_TTL):
+        self.pool = pool
+        self.load_bars = load_bars
+        self.result_cache = result_cache
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"backtest-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, request):
+        """Queue a validated StrategyInput and return its job record"""
+        self._purge_expired()
+        job = BacktestJobRecord(request)
+        with self._lock:
+            self._ensure_started()
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise JobQueueFull(f"Backtest job queue is full ({self._queue.maxsize} jobs)")
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        self._purge_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a job; returns the record, or None if unknown"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            if job.status in FINISHED_STATES:
+                return job
+            job.cancel_requested = True
+            if job.status == QUEUED:
+                self._finish(job, CANCELLED)
+            elif job.pool_job is not None:
+                job.pool_job.cancel()
+        return job
+
+    def _finish(self, job, status, result=None, error=None):
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            except Exception as e:
+                print(f"Error running backtest job {job.id}: {e}")
+                with self._lock:
+                    self._finish(job, FAILED, error=str(e))
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job):
+        with self._lock:
+            if job.cancel_requested:
+                return
+            job.status = RUNNING
+
+        request = job.request
+        try:
+            bars, key, cached = self.load_bars('backtest', request.dict(), request.ticker,
+                                               request.start_date, request.end_date)
+        except Exception as e:
+            with self._lock:
+                self._finish(job, FAILED, error=str(getattr(e, 'detail', e)))
+            return
+        job.total_bars = len(bars)
+        if cached is not None:
+            with self._lock:
+                self._finish(job, COMPLETED, result=cached)
+            return
+
+        # Wait for room in the process pool rather than failing the job
+        while True:
+            with self._lock:
+                if job.cancel_requested:
+                    self._finish(job, CANCELLED)
+                    return
+                try:
+                    job.pool_job = self.pool.submit(
+                        run_backtest_engine,
+                        bars,
+                        engine=request.engine,
+                        rsi_period=request.rsi_period,
+                        rsi_buy=request.rsi_buy,
+                        rsi_sell=request.rsi_sell,
+                        initial_cash=request.initial_cash,
+                        sizer=request.sizer
+                    )
+                    break
+                except PoolSaturated:
+                    pass
+            time.sleep(0.25)
+
+        try:
+            result = job.pool_job.future.result(timeout=self.pool.timeout)
+        except (BacktestCancelled, CancelledError):
+            with self._lock:
+                self._finish(job, CANCELLED)
+            return
+        except FutureTimeout:
+            job.pool_job.cancel()
+            with self._lock:
+                self._finish(job, FAILED, error=f"Backtest exceeded {self.pool.timeout:g}s")
+            return
+        except Exception as e:
+            with self._lock:
+                self._finish(job, FAILED, error=str(e))
+            return
+
+        self.result_cache.put(key, result)
+        with self._lock:
+            self._finish(job, COMPLETED, result=result)
@@ -0,0 +1,419 @@
+import os
+import queue
+import asyncio
+import importlib
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from bars import Bars
+
+# Pool sizing, overridable from the environment
+BACKTEST_WORKERS = int(os.environ.get("BACKTEST_WORKERS", os.cpu_count() or 1))
+BACKTEST_QUEUE_DEPTH = int(os.environ.get("BACKTEST_QUEUE_DEPTH", 4 * BACKTEST_WORKERS))
+BACKTEST_TIMEOUT = float(os.environ.get("BACKTEST_TIMEOUT", 120))
+
+# Streamed events travel in batches through a queue of at most this many
+STREAM_BATCH_SIZE = 256
+STREAM_QUEUE_BATCHES = 16
+
+# Float64 control slots per job at the head of each shared block, followed by the bars
+_CANCEL, _PROGRESS, _TOTAL = 0, 1, 2
+_HEADER = 3
+
+
+class PoolSaturated(Exception):
+    """Raised when the backtest queue is already at its configured depth"""
+
+
+class BacktestTimeout(Exception):
+    """Raised when a backtest runs past its deadline"""
+
+
+class BacktestCancelled(Exception):
+    """Raised inside a worker once its job has been cancelled"""
+
+
+class SharedBars:
+    """OHLCV bars copied once into shared memory for worker processes.
+
+    The block holds a few float64 control slots (cancel flag, bars processed,
+    total bars) for each of the ``jobs`` that read it, followed by the
+    columns of a Bars in its buffer layout, so workers view the bars in
+    place without pickling or copying them and the parent can watch each
+    job's progress or cancel it. The block is freed once every job has
+    released it.
+    """
+
+    def __init__(self, bars, jobs=1):
+        if not isinstance(bars, Bars):
+            bars = Bars.from_frame(bars)
+        self.n_rows = len(bars)
+        self.dtype = bars.dtype.str
+        self.jobs = jobs
+        self.nbytes = jobs * _HEADER * 8 + Bars.buffer_size(self.n_rows, bars.dtype)
+        self.shm = shared_memory.SharedMemory(create=True, size=self.nbytes)
+        control = np.ndarray((jobs, _HEADER), dtype=np.float64, buffer=self.shm.buf)
+        control[:] = 0.0
+        control[:, _TOTAL] = self.n_rows
+        bars.copy_into(self.shm.buf, offset=jobs * _HEADER * 8)
+        self._control = control
+        self._final_progress = [(0, self.n_rows)] * jobs
+        self._pending = jobs
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def cancel(self, job=0):
+        with self._lock:
+            if self._control is not None:
+                self._control[job, _CANCEL] = 1.0
+
+    def progress(self, job=0):
+        with self._lock:
+            control = self._control
+            if control is None:
+                return self._final_progress[job]
+            return int(control[job, _PROGRESS]), int(control[job, _TOTAL])
+
+    def release(self, job=0):
+        """Mark job as done with the block; returns True once the block is freed"""
+        with self._lock:
+            self._final_progress[job] = (int(self._control[job, _PROGRESS]), int(self._control[job, _TOTAL]))
+            self._pending -= 1
+            if self._pending:
+                return False
+            self._control = None
+        self.shm.close()
+        self.shm.unlink()
+        return True
+
+
+def _import_modules(modules):
+    for module in modules:
+        importlib.import_module(module)
+
+
+def _run_shared_job(shm_name, n_rows, dtype, jobs, job, fn, kwargs, events_queue=None):
+    """Worker entry point: attach to the shared bars and run fn on them as job.
+
+    fn gets Bars viewing the shared block. With an events_queue, fn also gets
+    an ``events`` callback whose events are sent to the parent in batches,
+    followed by a None sentinel.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    bars = None
+    try:
+        control = np.ndarray((_HEADER,), dtype=np.float64, buffer=shm.buf, offset=job * _HEADER * 8)
+        bars = Bars.from_buffer(shm.buf, n_rows, dtype, offset=jobs * _HEADER * 8)
+
+        def report(done, total=None):
+            control[_PROGRESS] = done
+            if control[_CANCEL]:
+                raise BacktestCancelled()
+
+        if control[_CANCEL]:
+            raise BacktestCancelled()
+        if events_queue is None:
+            result = fn(bars, progress=report, **kwargs)
+        else:
+            batch = []
+
+            def send(item):
+                # A full queue means a slow client; wait, but keep honouring cancel
+                while True:
+                    try:
+                        events_queue.put(item, timeout=0.5)
+                        return
+                    except queue.Full:
+                        report(control[_PROGRESS])
+
+            def emit(event):
+                batch.append(event)
+                if len(batch) >= STREAM_BATCH_SIZE:
+                    send(batch[:])
+                    batch.clear()
+
+            result = fn(bars, progress=report, events=emit, **kwargs)
+            if batch:
+                send(batch)
+            send(None)
+        control[_PROGRESS] = n_rows
+        return result
+    except BaseException as e:
+        # Frames in the traceback may still hold views of the block, which
+        # would keep it from being closed
+        traceback.clear_frames(e.__traceback__)
+        raise
+    finally:
+        control = bars = None
+        shm.close()
+
+
+class BacktestJob:
+    """Handle on a submitted backtest: its future, progress and cancellation"""
+
+    def __init__(self, future, bars, slot=0):
+        self.future = future
+        self.bars = bars
+        self.slot = slot
+
+    def progress(self):
+        """Return (bars processed, total bars)"""
+        if self.future.done() and not self.future.cancelled() and self.future.exception() is None:
+            return self.bars.n_rows, self.bars.n_rows
+        return self.bars.progress(self.slot)
+
+    def cancel(self):
+        """Cancel a queued job outright, or ask a running one to stop"""
+        if not self.future.cancel():
+            self.bars.cancel(self.slot)
+
+
+class BacktestPool:
+    """Process pool for CPU-bound backtests with a bounded queue.
+
+    Running cerebro.run() on the request threadpool holds the GIL and stalls
+    cheap endpoints; jobs here run in separate processes instead. At most
+    ``queue_depth`` jobs may be queued or running, beyond which submit()
+    raises PoolSaturated. Task functions are called as
+    ``fn(bars, progress=callback, **kwargs)`` on the job's Bars and should
+    call the callback periodically with the number of bars processed, which is also where a
+    cancelled job stops. A worker that dies breaks the whole executor; it is
+    then replaced, and run() and run_all() retry the jobs it took down once.
+    """
+
+    def __init__(self, workers=BACKTEST_WORKERS, queue_depth=BACKTEST_QUEUE_DEPTH, timeout=BACKTEST_TIMEOUT):
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self._executor = None
+        self._manager = None
+        self._in_flight = 0
+        self.shared_bytes = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn keeps workers clear of locks held by the server's threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _discard_executor(self, executor):
+        """Drop an executor broken by a dead worker, so the next job starts a fresh one"""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _executor_submit(self, *args):
+        """executor.submit, replacing a broken executor once; returns (executor, future)"""
+        with self._lock:
+            executor = self._get_executor()
+        try:
+            return executor, executor.submit(*args)
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+        with self._lock:
+            executor = self._get_executor()
+        return executor, executor.submit(*args)
+
+    def warm_up(self, modules=()):
+        """Start the worker processes now and import modules in each.
+
+        Workers are otherwise spawned by the first backtests, which then
+        also pay for their imports.
+        """
+        with self._lock:
+            executor = self._get_executor()
+        futures = [executor.submit(_import_modules, tuple(modules)) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def in_flight(self):
+        with self._lock:
+            return self._in_flight
+
+    def _get_manager(self):
+        with self._lock:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context("spawn").Manager()
+            return self._manager
+
+    def submit(self, fn, bars, events_queue=None, **kwargs):
+        """Queue fn over bars (Bars, or a frame with a Date column) in a worker
+        process and return a BacktestJob"""
+        self._reserve()
+        try:
+            shared = self._share(bars, 1)
+        except BaseException:
+            self._job_done()
+            raise
+        return self._submit_shared(shared, 0, fn, kwargs, events_queue)
+
+    def _reserve(self):
+        with self._lock:
+            if self._in_flight >= self.queue_depth:
+                raise PoolSaturated(f"Backtest queue is full ({self.queue_depth} jobs)")
+            self._in_flight += 1
+
+    def _share(self, bars, jobs):
+        shared = SharedBars(bars, jobs)
+        with self._lock:
+            self.shared_bytes += shared.nbytes
+        return shared
+
+    def _release(self, shared, slot):
+        if shared.release(slot):
+            with self._lock:
+                self.shared_bytes -= shared.nbytes
+
+    def _submit_shared(self, shared, slot, fn, kwargs, events_queue=None):
+        """Run fn as job slot of shared, in the pool slot already reserved for it"""
+        try:
+            executor, future = self._executor_submit(_run_shared_job, shared.name, shared.n_rows, shared.dtype,
+                                                     shared.jobs, slot, fn, kwargs, events_queue)
+        except BaseException:
+            self._release(shared, slot)
+            self._job_done()
+            raise
+
+        def cleanup(done):
+            self._release(shared, slot)
+            self._job_done()
+            if not done.cancelled() and isinstance(done.exception(), BrokenProcessPool):
+                self._discard_executor(executor)
+
+        future.add_done_callback(cleanup)
+        return BacktestJob(future, shared, slot)
+
+    def _job_done(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def run(self, fn, bars, timeout=None, **kwargs):
+        """Submit a job and await its result, cancelling it on timeout"""
+        try:
+            return await self._run(fn, bars, timeout, kwargs)
+        except BrokenProcessPool:
+            # A worker died under the job (not necessarily its own); try once more
+            return await self._run(fn, bars, timeout, kwargs)
+
+    async def _run(self, fn, bars, timeout, kwargs):
+        job = self.submit(fn, bars, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(job.future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            job.cancel()
+            raise BacktestTimeout(f"Backtest exceeded {timeout or self.timeout:g}s")
+        except asyncio.CancelledError:
+            # Client went away; stop the work instead of finishing it for nobody
+            job.cancel()
+            raise
+
+    async def run_all(self, calls, bars, timeout=None):
+        """Submit one job per (fn, kwargs) in calls over bars and await all their results.
+
+        The bars are copied into shared memory once for all the jobs. If a
+        job cannot be queued, fails or the whole set runs past the timeout,
+        the other jobs are cancelled as well, so a request that has already
+        failed does not keep holding pool slots.
+        """
+        calls = list(calls)
+        try:
+            return await self._run_all(calls, bars, timeout)
+        except BrokenProcessPool:
+            return await self._run_all(calls, bars, timeout)
+
+    async def _run_all(self, calls, bars, timeout):
+        shared = self._share(bars, len(calls))
+        jobs = []
+        finished = False
+        try:
+            for slot, (fn, kwargs) in enumerate(calls):
+                self._reserve()
+                jobs.append(self._submit_shared(shared, slot, fn, kwargs))
+            results = await asyncio.wait_for(asyncio.gather(*(asyncio.wrap_future(job.future) for job in jobs)),
+                                             timeout or self.timeout)
+            finished = True
+            return results
+        except asyncio.TimeoutError:
+            raise BacktestTimeout(f"Backtest exceeded {timeout or self.timeout:g}s")
+        finally:
+            if not finished:
+                for job in jobs:
+                    job.cancel()
+                # Slots that never got a job still hold the block
+                for slot in range(len(jobs), len(calls)):
+                    self._release(shared, slot)
+
+    def stream(self, fn, bars, timeout=None, **kwargs):
+        """Submit a job whose events are streamed back; returns a BacktestStream.
+
+        fn is called with an extra ``events`` callback. The job is queued
+        here, so PoolSaturated is raised before any event is read.
+        """
+        events_queue = self._get_manager().Queue(STREAM_QUEUE_BATCHES)
+        job = self.submit(fn, bars, events_queue=events_queue, **kwargs)
+        return BacktestStream(job, events_queue, timeout or self.timeout)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._manager is not None:
+            self._manager.shutdown()
+            self._manager = None
+
+
+class BacktestStream:
+    """Events of a running pool job, read as they arrive.
+
+    Iterate events() for the event dicts; once it is exhausted ``result``
+    holds the job's return value. Leaving the iteration early cancels the
+    job, and the bounded queue stalls the worker while the reader lags.
+    """
+
+    def __init__(self, job, events_queue, timeout):
+        self.job = job
+        self.events_queue = events_queue
+        self.timeout = timeout
+        self.result = None
+
+    async def events(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        finished = False
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise BacktestTimeout(f"Backtest exceeded {self.timeout:g}s")
+                try:
+                    batch = await loop.run_in_executor(None, self.events_queue.get, True, min(remaining, 0.5))
+                except queue.Empty:
+                    # A failed job never sends its sentinel
+                    if self.job.future.done() and self.job.future.exception() is not None:
+                        raise self.job.future.exception()
+                    continue
+                if batch is None:
+                    break
+                for event in batch:
+                    yield event
+            self.result = await asyncio.wait_for(asyncio.wrap_future(self.job.future),
+                                                 max(deadline - loop.time(), 0.1))
+            finished = True
+        finally:
+            if not finished:
+                self.job.cancel()
@@ -0,0 +1,131 @@
+import backtrader as bt
+import pandas as pd
+
+from backtest_engine import equity_event, summarize_backtest, trade_event
+
+
+class RSIStrategy(bt.Strategy):
+    params = (
+        ("rsi_period", 14),
+        ("rsi_buy", 30),
+        ("rsi_sell", 70),
+    )
+
+    def __init__(self):
+        self.rsi = bt.indicators.RSI_SMA(self.data.close, period=self.params.rsi_period)
+        self.trade_count = 0
+        self.winning_trades = 0
+        self.losing_trades = 0
+
+    def next(self):
+        if not self.position:
+            # Buy signal: RSI below buy threshold
+            if self.rsi < self.params.rsi_buy:
+                self.buy(size=None)  # Sized by the cerebro's sizer
+        else:
+            # Sell signal: RSI above sell threshold
+            if self.rsi > self.params.rsi_sell:
+                self.sell(size=self.position.size)
+
+    def notify_trade(self, trade):
+        if trade.isclosed:
+            self.trade_count += 1
+            if trade.pnl > 0:
+                self.winning_trades += 1
+            else:
+                self.losing_trades += 1
+
+
+class ProgressAnalyzer(bt.Analyzer):
+    """Report bars processed to a callback every ``every`` bars"""
+    params = (
+        ("callback", None),
+        ("every", 100),
+    )
+
+    def next(self):
+        done = len(self.strategy)
+        if done % self.p.every == 0:
+            self.p.callback(done, self.strategy.data.buflen())
+
+
+class EventAnalyzer(bt.Analyzer):
+    """Pass each bar's portfolio value and each closed trade to a callback"""
+    params = (
+        ("callback", None),
+    )
+
+    def start(self):
+        self._sizes = {}
+
+    def notify_trade(self, trade):
+        if trade.justopened:
+            self._sizes[trade.ref] = trade.size
+        elif trade.isclosed:
+            size = self._sizes.pop(trade.ref, 0.0)
+            exit_price = trade.price + trade.pnl / size if size else trade.price
+            self.p.callback(trade_event(bt.num2date(trade.dtopen), bt.num2date(trade.dtclose),
+                                        size, trade.price, exit_price, trade.pnl))
+
+    def next(self):
+        self.p.callback(equity_event(self.strategy.datetime.date(0), self.strategy.broker.getvalue()))
+
+
+def run_cerebro_backtest(bars, rsi_period, rsi_buy, rsi_sell, initial_cash, progress=None, events=None,
+                         sizer="fixed"):
+    """Run RSIStrategy bar by bar through bt.Cerebro.
+
+    bars is a Bars or a frame with Date, Open, High, Low, Close and Volume
+    columns. If given, progress(bars_done, total_bars) is called
+    periodically during the run; an exception raised from it aborts the
+    backtest. events, if given, is called with each equity point and closed
+    trade as they happen. sizer="all_in" buys with all available cash
+    instead of the default one share.
+    """
+    cerebro = bt.Cerebro()
+    cerebro.addstrategy(
+        RSIStrategy,
+        rsi_period=rsi_period,
+        rsi_buy=rsi_buy,
+        rsi_sell=rsi_sell
+    )
+    if sizer == "all_in":
+        cerebro.addsizer(bt.sizers.AllInSizer)
+
+    data_feed = bt.feeds.PandasData(
+        dataname=bars if isinstance(bars, pd.DataFrame) else bars.to_frame(date_column=True),
+        datetime='Date',
+        open='Open',
+        high='High',
+        low='Low',
+        close='Close',
+        volume='Volume',
+        openinterest=None
+    )
+    cerebro.adddata(data_feed)
+
+    cerebro.broker.set_cash(initial_cash)
+    initial_value = cerebro.broker.getvalue()
+
+    cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name="trades")
+    cerebro.addanalyzer(bt.analyzers.DrawDown, _name="drawdown")
+    if progress is not None:
+        cerebro.addanalyzer(ProgressAnalyzer, callback=progress)
+    if events is not None:
+        cerebro.addanalyzer(EventAnalyzer, callback=events)
+
+    results = cerebro.run()
+    final_value = cerebro.broker.getvalue()
+
+    strategy = results[0]
+    trade_analyzer = strategy.analyzers.trades.get_analysis()
+    drawdown_analyzer = strategy.analyzers.drawdown.get_analysis()
+
+    return summarize_backtest(
+        initial_value,
+        final_value,
+        trade_analyzer.get('total', {}).get('total', 0),
+        trade_analyzer.get('won', {}).get('total', 0),
+        trade_analyzer.get('lost', {}).get('total', 0),
+        drawdown_analyzer.get('max', {}).get('drawdown', 0),
+    )
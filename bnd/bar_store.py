@@ -0,0 +1,417 @@
+import os
+import json
+import threading
+from collections import defaultdict
+from contextlib import ExitStack
+from datetime import datetime, date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from bars import Bars
+
+# Default location for the on-disk bar store (override with BAR_STORE_DIR)
+BAR_STORE_DIR = os.environ.get(
+    "BAR_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".bar_store"),
+)
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Already stored days re-fetched on either side of each gap. Upstream serves
+# split- and dividend-adjusted prices, so if those days come back priced
+# differently an adjustment has been applied since they were stored
+ADJUSTMENT_OVERLAP = timedelta(days=int(os.environ.get("BAR_ADJUSTMENT_OVERLAP_DAYS", 7)))
+
+
+def _to_day(value, ceil=False):
+    """Normalize a date string, date or datetime to a calendar date.
+
+    With ceil=True a datetime past midnight rounds up to the next day, so an
+    exclusive end of datetime.now() still includes today's bar.
+    """
+    if isinstance(value, str):
+        value = datetime.strptime(value, '%Y-%m-%d')
+    if isinstance(value, datetime):
+        day = value.date()
+        if ceil and value.time() != datetime.min.time():
+            day += timedelta(days=1)
+        return day
+    return value
+
+
+def normalize_range(start, end):
+    """Return the [start, end) calendar-day range a bar request resolves to"""
+    return _to_day(start), _to_day(end, ceil=True)
+
+
+def _clean_bars(df):
+    """Flatten a yfinance frame to BAR_COLUMNS on a tz-naive Date index"""
+    # Handle multi-level columns
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = [col[0] if isinstance(col, tuple) else col for col in df.columns]
+
+    df = df[BAR_COLUMNS].dropna(subset=['Close'])
+    if df.index.tz is not None:
+        df.index = df.index.tz_localize(None)
+    df.index.name = 'Date'
+    return df
+
+
+def download_bars(symbol, start, end, interval='1d'):
+    """Download OHLCV bars from Yahoo for [start, end) as a flat DataFrame"""
+    import yfinance as yf  # slow to import; only needed once we go upstream
+    df = yf.download(symbol, start=start, end=end, interval=interval, progress=False)
+    if df is None or df.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    return _clean_bars(df)
+
+
+def download_bars_many(symbols, start, end, interval='1d'):
+    """Download bars for several symbols in one multi-ticker request.
+
+    Returns a dict of symbol -> flat DataFrame; symbols Yahoo returned
+    nothing for are left out.
+    """
+    import yfinance as yf
+    df = yf.download(list(symbols), start=start, end=end, interval=interval,
+                     group_by='ticker', progress=False)
+    if df is None or df.empty or not isinstance(df.columns, pd.MultiIndex):
+        return {}
+
+    result = {}
+    tickers = set(df.columns.get_level_values(0))
+    for symbol in symbols:
+        if symbol in tickers:
+            bars = _clean_bars(df[symbol].copy())
+            if not bars.empty:
+                result[symbol] = bars
+    return result
+
+
+class BarStore:
+    """Persistent OHLCV bar store keyed by (symbol, interval).
+
+    Each key is kept as a single (6, n) float64 ``.npy`` array - one contiguous
+    row per column, epoch seconds first - that is memory-mapped on read, plus a
+    ``meta.json`` recording the calendar ranges already fetched from upstream.
+    Requests only download the parts of their range the store has not seen,
+    each widened by ADJUSTMENT_OVERLAP into the stored days around it; if
+    those come back priced differently, the stored bars predate a split or
+    dividend adjustment and the whole history is downloaded again. Fetchers
+    raise when upstream fails, so an empty answer means there are no bars
+    (before a listing, or only holidays) and the range is covered all the
+    same. forming_day() names the first day whose bar may still change;
+    coverage never extends past it, so that day is re-fetched until it
+    settles. When a fetch fails with one of ``serve_stale_on`` the bars
+    already stored for the range are returned instead, if there are any.
+    """
+
+    def __init__(self, root=BAR_STORE_DIR, fetcher=download_bars, bulk_fetcher=download_bars_many,
+                 forming_day=date.today, serve_stale_on=()):
+        self.root = root
+        self.fetcher = fetcher
+        self.bulk_fetcher = bulk_fetcher
+        self.forming_day = forming_day
+        self.serve_stale_on = tuple(serve_stale_on)
+        self.stale = 0
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lock(self, symbol, interval):
+        with self._locks_guard:
+            return self._locks.setdefault((symbol, interval), threading.Lock())
+
+    def _dir(self, symbol, interval):
+        safe_symbol = symbol.replace('/', '_').replace(os.sep, '_')
+        return os.path.join(self.root, interval, safe_symbol)
+
+    def _load(self, symbol, interval):
+        """Return (memory-mapped columns, coverage) or (None, []) if absent.
+
+        coverage is a sorted list of disjoint [start, end) day ranges.
+        """
+        path = self._dir(symbol, interval)
+        try:
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+            columns = np.load(os.path.join(path, 'bars.npy'), mmap_mode='r')
+        except (OSError, ValueError):
+            return None, []
+        # Stores written before coverage could have holes record one span
+        ranges = meta['ranges'] if 'ranges' in meta else [(meta['start'], meta['end'])]
+        coverage = [(date.fromisoformat(start), date.fromisoformat(end)) for start, end in ranges]
+        return columns, coverage
+
+    def _save(self, symbol, interval, columns, coverage):
+        path = self._dir(symbol, interval)
+        os.makedirs(path, exist_ok=True)
+
+        # Write to temp files and rename so readers never see a partial file
+        tmp_bars = os.path.join(path, 'bars.tmp.npy')
+        np.save(tmp_bars, np.ascontiguousarray(columns, dtype=np.float64))
+        os.replace(tmp_bars, os.path.join(path, 'bars.npy'))
+
+        tmp_meta = os.path.join(path, 'meta.tmp.json')
+        with open(tmp_meta, 'w') as f:
+            json.dump({'ranges': [(start.isoformat(), end.isoformat()) for start, end in coverage]}, f)
+        os.replace(tmp_meta, os.path.join(path, 'meta.json'))
+
+    def uncover(self, symbol, day, interval='1d'):
+        """Forget having fetched day and later, so the next request fetches them again"""
+        with self._lock(symbol, interval):
+            columns, coverage = self._load(symbol, interval)
+            if all(end <= day for _, end in coverage):
+                return
+            self._save(symbol, interval, columns, [(start, min(end, day)) for start, end in coverage if start < day])
+
+    def load_sidecar(self, symbol, interval, name):
+        """Read a JSON document stored next to a key's bars, or None"""
+        try:
+            with open(os.path.join(self._dir(symbol, interval), f'{name}.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_sidecar(self, symbol, interval, name, payload):
+        """Persist a JSON document (e.g. indicator state) next to a key's bars"""
+        path = self._dir(symbol, interval)
+        os.makedirs(path, exist_ok=True)
+        tmp = os.path.join(path, f'{name}.tmp.json')
+        with open(tmp, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp, os.path.join(path, f'{name}.json'))
+
+    @staticmethod
+    def _frame_to_columns(df):
+        ts = df.index.values.astype('datetime64[s]').astype(np.int64).astype(np.float64)
+        return np.vstack([ts] + [df[col].to_numpy(dtype=np.float64) for col in BAR_COLUMNS])
+
+    @staticmethod
+    def _columns_to_frame(columns):
+        index = pd.DatetimeIndex(columns[0].astype('datetime64[s]'), name='Date')
+        return pd.DataFrame(np.asarray(columns[1:]).T, index=index, columns=BAR_COLUMNS)
+
+    @staticmethod
+    def missing_ranges(coverage, start, end):
+        """List the [start, end) day ranges not already covered by the store"""
+        ranges = []
+        for covered_start, covered_end in coverage:
+            if covered_end <= start:
+                continue
+            if covered_start >= end:
+                break
+            if covered_start > start:
+                ranges.append((start, covered_start))
+            start = covered_end
+        if start < end:
+            ranges.append((start, end))
+        return ranges
+
+    @staticmethod
+    def fetch_ranges(coverage, missing):
+        """The missing ranges, each widened by up to ADJUSTMENT_OVERLAP into the covered ranges it borders"""
+        ranges = []
+        for start, end in missing:
+            for covered_start, covered_end in coverage:
+                if covered_end == start:
+                    start = max(covered_start, start - ADJUSTMENT_OVERLAP)
+                if covered_start == end:
+                    end = min(covered_end, end + ADJUSTMENT_OVERLAP)
+            ranges.append((start, end))
+        return ranges
+
+    @staticmethod
+    def _cover(coverage, start, end):
+        """coverage plus [start, end), with ranges that overlap or touch joined"""
+        merged = []
+        for range_start, range_end in sorted(coverage + [(start, end)]):
+            if merged and range_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(range_end, merged[-1][1]))
+            else:
+                merged.append((range_start, range_end))
+        return merged
+
+    def _adjusted(self, columns, coverage, fetched):
+        """Whether fetched (range, frame) pairs price covered, stored bars differently"""
+        if columns is None:
+            return False
+        for (fetch_start, fetch_end), frame in fetched:
+            if frame.empty:
+                continue
+            days = frame.index.values.astype('datetime64[s]').astype(np.int64).astype(np.float64)
+            close = frame['Close'].to_numpy(dtype=np.float64)
+            for covered_start, covered_end in coverage:
+                span = self._span(columns, max(fetch_start, covered_start), min(fetch_end, covered_end))
+                _, stored, fresh = np.intersect1d(span[0], days, return_indices=True)
+                if not np.allclose(span[4, stored], close[fresh], rtol=1e-6):
+                    return True
+        return False
+
+    def _fetch(self, symbol, interval, columns, coverage, start, end, fetched=None):
+        """Fetch what [start, end) lacks; returns (columns, coverage, fetched) to merge.
+
+        fetched, if given, holds the (range, frame) pairs a bulk fetch
+        already returned for the symbol. When they show a new adjustment the
+        stored bars are dropped and the span from the first covered day to
+        the last is fetched again in one range.
+        """
+        if fetched is None:
+            ranges = self.fetch_ranges(coverage, self.missing_ranges(coverage, start, end))
+            fetched = [(gap, self.fetcher(symbol, *gap, interval)) for gap in ranges]
+        if not self._adjusted(columns, coverage, fetched):
+            return columns, coverage, fetched
+        span = (min(start, coverage[0][0]), max(end, coverage[-1][1]))
+        return None, [], [(span, self.fetcher(symbol, *span, interval))]
+
+    def _merge(self, symbol, interval, columns, coverage, fetched):
+        """Fold freshly fetched (range, frame) pairs into the stored columns and persist them"""
+        # The forming day's bar may still change, so never mark it as covered
+        limit = self.forming_day()
+        new_coverage = coverage
+        for (fetch_start, fetch_end), _ in fetched:
+            fetch_end = min(fetch_end, limit)
+            if fetch_end > fetch_start:
+                new_coverage = self._cover(new_coverage, fetch_start, fetch_end)
+
+        frames = [frame[BAR_COLUMNS] for _, frame in fetched if not frame.empty]
+        if frames:
+            if columns is not None:
+                frames.insert(0, self._columns_to_frame(columns))
+            merged = pd.concat(frames)
+            merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+            columns = self._frame_to_columns(merged)
+        elif new_coverage == coverage:
+            return columns
+
+        if columns is None:
+            columns = np.empty((len(BAR_COLUMNS) + 1, 0))
+        self._save(symbol, interval, columns, new_coverage)
+        return columns
+
+    def _span(self, columns, start, end):
+        """The stored columns for [start, end), as a view"""
+        if columns is None:
+            return np.empty((len(BAR_COLUMNS) + 1, 0))
+        lo = np.searchsorted(columns[0], _epoch(start), side='left')
+        hi = np.searchsorted(columns[0], _epoch(end), side='left')
+        return columns[:, lo:hi]
+
+    def _frame(self, span):
+        if span.shape[1] == 0:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        return self._columns_to_frame(span)
+
+    def _all_stored(self, stored, symbols, start, end):
+        """Whether every one of symbols has stored bars in [start, end)"""
+        return all(self._span(stored[symbol][0], start, end).shape[1] > 0 for symbol in symbols)
+
+    def _count(self, missing):
+        with self._locks_guard:
+            if missing:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+    def _count_stale(self):
+        with self._locks_guard:
+            self.stale += 1
+
+    def get_bars(self, symbol, start, end, interval='1d'):
+        """Return bars for [start, end), fetching only what the store lacks"""
+        start, end = normalize_range(start, end)
+        return self._frame(self._read(symbol, start, end, interval))
+
+    def get_columns(self, symbol, start, end, interval='1d', dtype=np.float64):
+        """Like get_bars, but as Bars viewing the memory-mapped store (float64 prices
+        are not copied at all)"""
+        start, end = normalize_range(start, end)
+        return Bars.from_columns(self._read(symbol, start, end, interval), dtype)
+
+    def _read(self, symbol, start, end, interval):
+        """Stored columns for [start, end), after fetching whatever is missing"""
+        with self._lock(symbol, interval):
+            columns, coverage = self._load(symbol, interval)
+            missing = self.missing_ranges(coverage, start, end)
+            self._count(missing)
+
+            if missing:
+                try:
+                    columns, coverage, fetched = self._fetch(symbol, interval, columns, coverage, start, end)
+                except self.serve_stale_on:
+                    stale = self._span(columns, start, end)
+                    if stale.shape[1] == 0:
+                        raise
+                    self._count_stale()
+                    return stale
+                columns = self._merge(symbol, interval, columns, coverage, fetched)
+
+            return self._span(columns, start, end)
+
+    def get_bars_many(self, symbols, start, end, interval='1d'):
+        """Return a dict of symbol -> bars for [start, end).
+
+        Symbols missing the same date ranges are fetched together through
+        bulk_fetcher, so a watchlist with a shared history costs one upstream
+        request per gap rather than one per symbol. A group whose fetch fails
+        with one of serve_stale_on is served from the store only if every
+        symbol in it has bars stored for the range; otherwise the error is
+        raised rather than leaving those symbols out. A symbol whose stored
+        bars turn out to predate an adjustment is fetched again on its own.
+        """
+        start, end = normalize_range(start, end)
+        symbols = sorted(set(symbols))
+
+        with ExitStack() as stack:
+            # Sorted acquisition keeps overlapping batches from deadlocking
+            for symbol in symbols:
+                stack.enter_context(self._lock(symbol, interval))
+
+            stored = {symbol: self._load(symbol, interval) for symbol in symbols}
+            groups = defaultdict(list)
+            for symbol, (columns, coverage) in stored.items():
+                missing = self.missing_ranges(coverage, start, end)
+                self._count(missing)
+                if missing:
+                    groups[tuple(self.fetch_ranges(coverage, missing))].append(symbol)
+
+            fetched = {}
+            empty = pd.DataFrame(columns=BAR_COLUMNS)
+            for ranges, group in groups.items():
+                try:
+                    frames = [self.bulk_fetcher(group, range_start, range_end, interval)
+                              for range_start, range_end in ranges]
+                except self.serve_stale_on:
+                    # Serve this group from the store, unless some of it has nothing stored
+                    if not self._all_stored(stored, group, start, end):
+                        raise
+                    self._count_stale()
+                    continue
+                for symbol in group:
+                    columns, coverage = stored[symbol]
+                    # A symbol left out of a bulk result has no bars in that range
+                    pieces = [(fetch_range, bars.get(symbol, empty)) for fetch_range, bars in zip(ranges, frames)]
+                    try:
+                        columns, coverage, fetched[symbol] = self._fetch(symbol, interval, columns, coverage,
+                                                                         start, end, pieces)
+                    except self.serve_stale_on:
+                        if not self._all_stored(stored, [symbol], start, end):
+                            raise
+                        self._count_stale()
+                        continue
+                    stored[symbol] = (columns, coverage)
+
+            result = {}
+            for symbol, (columns, coverage) in stored.items():
+                if symbol in fetched:
+                    columns = self._merge(symbol, interval, columns, coverage, fetched[symbol])
+                bars = self._frame(self._span(columns, start, end))
+                if not bars.empty:
+                    result[symbol] = bars
+            return result
+
+
+def _epoch(day):
+    return float((np.datetime64(day, 'D') - np.datetime64(0, 'D')) // np.timedelta64(1, 's'))
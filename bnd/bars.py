@@ -0,0 +1,131 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Price dtype of the bars handed to the backtest engines. float32 halves the
+# price columns' footprint (and the shared memory per backtest) at the cost
+# of about seven significant digits of price precision.
+BAR_PRICE_DTYPE = np.dtype(os.environ.get("BAR_PRICE_DTYPE", "float64"))
+
+PRICE_COLUMNS = ('Open', 'High', 'Low', 'Close')
+
+
+class Bars:
+    """OHLCV bars as contiguous NumPy columns.
+
+    ``dates`` holds int64 epoch seconds; open, high, low and close share one
+    float dtype (float64, or float32 to save memory); volume always stays
+    float64, since share counts lose precision in float32. Columns are
+    usually views - of the bar store's memory-mapped file, or of a backtest's
+    shared memory block - so slicing and passing bars around copies nothing.
+
+    ``bars['Close']`` and ``bars['Date']`` mirror a frame with a Date column,
+    so code reading columns through np.asarray works on either.
+    """
+
+    __slots__ = ('dates', 'open', 'high', 'low', 'close', 'volume')
+
+    def __init__(self, dates, open_, high, low, close, volume):
+        self.dates = dates
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    @classmethod
+    def from_columns(cls, columns, dtype=np.float64):
+        """Bars over the bar store's (6, n) float64 layout, viewing it where dtype allows"""
+        columns = np.asarray(columns)
+        dates = columns[0].astype(np.int64)
+        prices = [np.asarray(columns[row], dtype=dtype) for row in range(1, 5)]
+        return cls(dates, *prices, columns[5])
+
+    @classmethod
+    def from_frame(cls, df, dtype=np.float64):
+        """Bars from a frame on a Date index or with a Date column"""
+        dates = df['Date'].values if 'Date' in df.columns else df.index.values
+        return cls(
+            np.ascontiguousarray(dates.astype('datetime64[s]').astype(np.int64)),
+            *[np.ascontiguousarray(df[name].to_numpy(dtype=dtype)) for name in PRICE_COLUMNS],
+            np.ascontiguousarray(df['Volume'].to_numpy(dtype=np.float64)),
+        )
+
+    def __len__(self):
+        return self.dates.size
+
+    @property
+    def empty(self):
+        return self.dates.size == 0
+
+    @property
+    def dtype(self):
+        """Dtype of the price columns"""
+        return self.close.dtype
+
+    @property
+    def nbytes(self):
+        """Bytes held by the columns (shared with whatever they view)"""
+        return sum(column.nbytes for column in self.columns())
+
+    def columns(self):
+        return (self.dates, self.open, self.high, self.low, self.close, self.volume)
+
+    def __getitem__(self, name):
+        if name == 'Date':
+            return self.dates.view('datetime64[s]')
+        if name == 'Volume':
+            return self.volume
+        if name in PRICE_COLUMNS:
+            return getattr(self, name.lower())
+        raise KeyError(name)
+
+    @property
+    def index(self):
+        return pd.DatetimeIndex(self['Date'], name='Date')
+
+    def slice(self, lo, hi):
+        """Bars lo:hi by position, as views"""
+        return Bars(*(column[lo:hi] for column in self.columns()))
+
+    def astype(self, dtype):
+        """These bars with prices in dtype; self if they already are"""
+        if np.dtype(dtype) == self.dtype:
+            return self
+        prices = [np.ascontiguousarray(column, dtype=dtype) for column in (self.open, self.high, self.low, self.close)]
+        return Bars(self.dates, *prices, self.volume)
+
+    def to_frame(self, date_column=False):
+        """A (copied) OHLCV frame on a Date index, or with a Date column"""
+        data = {name: self[name] for name in PRICE_COLUMNS + ('Volume',)}
+        if date_column:
+            return pd.DataFrame({'Date': self['Date'], **data})
+        return pd.DataFrame(data, index=self.index)
+
+    # Shared memory layout: dates and volume (8-byte columns) first, so the
+    # price columns that follow stay aligned for either float dtype
+
+    @staticmethod
+    def buffer_size(n_rows, dtype):
+        return n_rows * (16 + 4 * np.dtype(dtype).itemsize)
+
+    @classmethod
+    def from_buffer(cls, buffer, n_rows, dtype, offset=0):
+        """Bars viewing buffer at offset, in the layout written by copy_into"""
+        dtype = np.dtype(dtype)
+        dates = np.ndarray((n_rows,), dtype=np.int64, buffer=buffer, offset=offset)
+        volume = np.ndarray((n_rows,), dtype=np.float64, buffer=buffer, offset=offset + 8 * n_rows)
+        offset += 16 * n_rows
+        prices = []
+        for _ in PRICE_COLUMNS:
+            prices.append(np.ndarray((n_rows,), dtype=dtype, buffer=buffer, offset=offset))
+            offset += dtype.itemsize * n_rows
+        return cls(dates, *prices, volume)
+
+    def copy_into(self, buffer, offset=0):
+        """Copy the columns into buffer at offset; returns Bars viewing the copy"""
+        target = Bars.from_buffer(buffer, len(self), self.dtype, offset)
+        for source, column in zip(self.columns(), target.columns()):
+            column[:] = source
+        return target
@@ -0,0 +1,50 @@
+"""Microbenchmark: fused indicator kernel vs the per-indicator pandas functions.
+
+Run from bnd/:  python benchmarks/bench_indicators.py [--repeat N]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from reference_indicators import calculate_technical_indicators, calculate_support_resistance, calculate_fibonacci_levels
+from indicators import compute_indicators
+from fixtures import synthetic_bars
+
+
+def pandas_levels(df):
+    levels = calculate_technical_indicators(df)
+    support, resistance = calculate_support_resistance(df)
+    levels['support_level'] = float(support)
+    levels['resistance_level'] = float(resistance)
+    levels.update(calculate_fibonacci_levels(df))
+    return levels
+
+
+def fused_levels(df):
+    return compute_indicators(df['High'].values, df['Low'].values, df['Close'].values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[60, 250, 2500, 25000])
+    args = parser.parse_args()
+
+    print(f"{'bars':>8} {'pandas us':>12} {'fused us':>12} {'speedup':>9} {'max abs diff':>14}")
+    for n in args.sizes:
+        df = synthetic_bars(n)
+        expected, actual = pandas_levels(df), fused_levels(df)
+        diff = max(abs(float(expected[k]) - actual[k]) for k in expected)
+
+        repeat = max(1, args.repeat * 250 // max(n, 250))
+        pandas_us = min(timeit.repeat(lambda: pandas_levels(df), number=repeat, repeat=3)) / repeat * 1e6
+        fused_us = min(timeit.repeat(lambda: fused_levels(df), number=repeat, repeat=3)) / repeat * 1e6
+        print(f"{n:>8} {pandas_us:>12.1f} {fused_us:>12.1f} {pandas_us / fused_us:>8.1f}x {diff:>14.2e}")
+
+
+if __name__ == '__main__':
+    main()
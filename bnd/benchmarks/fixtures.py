@@ -0,0 +1,143 @@
+"""Deterministic synthetic market data and a stub of the Yahoo data provider.
+
+Every symbol has one fixed business-day history, derived from the symbol
+name alone, so any [start, end) slice is identical across calls and runs.
+"""
+import csv
+import functools
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from bar_store import normalize_range
+from providers import MarketDataProvider, save_replay
+
+HISTORY_START = '1995-01-02'
+HISTORY_END = '2035-01-01'
+
+# Symbols with these prefixes get the corresponding quirks
+GAPPY_PREFIX = 'GAP'       # ~5% of sessions missing plus a two-week halt
+UNKNOWN_PREFIX = 'NOPE'    # the provider has no data or metadata at all
+
+
+def _seed(*parts):
+    return zlib.crc32('|'.join(map(str, parts)).encode())
+
+
+@functools.lru_cache(maxsize=None)
+def _calendar():
+    # bdate_range is slow enough to dominate a cold request, so build it once
+    return pd.bdate_range(HISTORY_START, HISTORY_END, name='Date')
+
+
+@functools.lru_cache(maxsize=None)
+def symbol_history(symbol):
+    """The full synthetic OHLCV history of one symbol"""
+    index = _calendar()
+    rng = np.random.default_rng(_seed(symbol))
+    n = index.size
+    close = 20 + 180 * rng.random() * np.exp(np.cumsum(rng.normal(0.0003, 0.018, n)))
+    open_ = close * (1 + rng.normal(0, 0.006, n))
+    spread = np.abs(rng.normal(0, 0.01, n))
+    df = pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) * (1 + spread),
+        'Low': np.minimum(open_, close) * (1 - spread),
+        'Close': close,
+        'Volume': rng.integers(100_000, 10_000_000, n).astype(float),
+    }, index=index)
+
+    if symbol.startswith(GAPPY_PREFIX):
+        keep = rng.random(n) > 0.05
+        halt = rng.integers(0, n - 10)
+        keep[halt:halt + 10] = False
+        df = df[keep]
+    return df
+
+
+def synthetic_bars(n, seed=0, start='2000-01-03'):
+    """n random-walk OHLCV bars on business days, for microbenchmarks"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, n)))
+    spread = np.abs(rng.normal(0, 0.01, n)) * close
+    return pd.DataFrame({
+        'Open': close + rng.normal(0, 0.3, n),
+        'High': close + spread,
+        'Low': close - spread,
+        'Close': close,
+        'Volume': rng.integers(1_000_000, 5_000_000, n).astype(float),
+    }, index=pd.bdate_range(start, periods=n, name='Date'))
+
+
+def write_listing(path, n_symbols=10000, extra=()):
+    """Write a symbol listing CSV of n synthetic symbols plus extra (symbol, name) rows"""
+    rng = np.random.default_rng(_seed('listing', n_symbols))
+    letters = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+    syllables = ['ka', 'ro', 'mi', 'tel', 'con', 'gen', 'tra', 'vo', 'lux', 'pha', 'syn', 'dyn', 'ex', 'or']
+    suffixes = ['Inc.', 'Corporation', 'Holdings', 'Group', 'Ltd', 'Technologies', 'Bancorp', 'Therapeutics']
+    rows = dict(extra)
+    while len(rows) < n_symbols + len(extra):
+        symbol = ''.join(rng.choice(letters, rng.integers(1, 6)))
+        words = [''.join(rng.choice(syllables, rng.integers(2, 4))).capitalize() for _ in range(rng.integers(1, 3))]
+        rows.setdefault(symbol, f"{' '.join(words)} {rng.choice(suffixes)}")
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Symbol', 'Security Name'])
+        writer.writerows(rows.items())
+    return path
+
+
+class StubProvider(MarketDataProvider):
+    """Offline MarketDataProvider serving symbol_history() slices.
+
+    An optional latency (seconds) is slept per call to mimic the network,
+    and calls are counted so runs can report how often the caches missed.
+    """
+
+    name = "stub"
+    remote = False
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = {'bars': 0, 'metadata': 0}
+
+    def _wait(self, call):
+        self.calls[call] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _slice(self, symbol, start, end):
+        df = symbol_history(symbol)
+        start, end = normalize_range(start, end)
+        return df.loc[pd.Timestamp(start):pd.Timestamp(end) - pd.Timedelta(nanoseconds=1)].copy()
+
+    def fetch_bars(self, symbols, start, end, interval='1d'):
+        self._wait('bars')
+        frames = {symbol: self._slice(symbol, start, end)
+                  for symbol in symbols if not symbol.startswith(UNKNOWN_PREFIX)}
+        return {symbol: df for symbol, df in frames.items() if not df.empty}
+
+    def fetch_metadata(self, symbols):
+        self._wait('metadata')
+        return {symbol: synthetic_info(symbol) for symbol in symbols if not symbol.startswith(UNKNOWN_PREFIX)}
+
+
+def synthetic_info(symbol):
+    """Ticker.info-style metadata for a synthetic symbol"""
+    rng = np.random.default_rng(_seed('info', symbol))
+    return {
+        'longName': f"{symbol.title()} Synthetic Corporation",
+        'sector': str(rng.choice(['Technology', 'Healthcare', 'Financial Services', 'Energy'])),
+        'marketCap': float(rng.integers(1, 3000)) * 1e9,
+        'trailingPE': float(rng.uniform(5, 60)),
+    }
+
+
+def write_replay(root, symbols, end=None):
+    """Record symbols' synthetic histories up to end (default today) for ReplayProvider"""
+    end = pd.Timestamp(end or pd.Timestamp.today().normalize() + pd.Timedelta(days=1))
+    bars = {symbol: symbol_history(symbol).loc[:end - pd.Timedelta(nanoseconds=1)] for symbol in symbols}
+    save_replay(root, bars, {symbol: synthetic_info(symbol) for symbol in symbols})
+    return root
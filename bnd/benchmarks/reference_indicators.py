@@ -0,0 +1,125 @@
+"""The original per-indicator pandas implementations behind /stock-info.
+
+The service computes these with indicators.compute_indicators (and the
+incremental state for live quotes); they are kept here, unchanged, as the
+reference the fused kernel is benchmarked and checked against.
+"""
+import pandas as pd
+
+
+def calculate_rsi(prices, window=14):
+    """Calculate RSI manually without TA-Lib"""
+    try:
+        delta = pd.Series(prices).diff()
+        gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
+        loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
+        rs = gain / loss
+        rsi = 100 - (100 / (1 + rs))
+        return float(rsi.iloc[-1]) if not pd.isna(rsi.iloc[-1]) else 50.0
+    except:
+        return 50.0
+
+
+def calculate_macd(prices, fast=12, slow=26, signal=9):
+    """Calculate MACD manually without TA-Lib"""
+    try:
+        prices_series = pd.Series(prices)
+        exp1 = prices_series.ewm(span=fast).mean()
+        exp2 = prices_series.ewm(span=slow).mean()
+        macd = exp1 - exp2
+        return float(macd.iloc[-1]) if not pd.isna(macd.iloc[-1]) else 0.0
+    except:
+        return 0.0
+
+
+def calculate_stochastic(high, low, close, k_period=14, d_period=3):
+    """Calculate Stochastic Oscillator manually without TA-Lib"""
+    try:
+        high_series = pd.Series(high)
+        low_series = pd.Series(low)
+        close_series = pd.Series(close)
+        
+        lowest_low = low_series.rolling(window=k_period).min()
+        highest_high = high_series.rolling(window=k_period).max()
+        
+        k_percent = 100 * ((close_series - lowest_low) / (highest_high - lowest_low))
+        d_percent = k_percent.rolling(window=d_period).mean()
+        
+        k_val = float(k_percent.iloc[-1]) if not pd.isna(k_percent.iloc[-1]) else 50.0
+        d_val = float(d_percent.iloc[-1]) if not pd.isna(d_percent.iloc[-1]) else 50.0
+        
+        return k_val, d_val
+    except:
+        return 50.0, 50.0
+
+
+def calculate_support_resistance(df, window=20):
+    """Calculate support and resistance levels using pivot points"""
+    try:
+        high_prices = df['High'].rolling(window=window).max()
+        low_prices = df['Low'].rolling(window=window).min()
+        
+        # Recent support and resistance
+        recent_high = high_prices.iloc[-1] if len(high_prices) > 0 else df['Close'].iloc[-1]
+        recent_low = low_prices.iloc[-1] if len(low_prices) > 0 else df['Close'].iloc[-1]
+        
+        return recent_low, recent_high
+    except:
+        current_price = df['Close'].iloc[-1]
+        return current_price * 0.95, current_price * 1.05
+
+
+def calculate_fibonacci_levels(df, periods=50):
+    """Calculate Fibonacci retracement levels"""
+    try:
+        recent_data = df.tail(periods)
+        high = recent_data['High'].max()
+        low = recent_data['Low'].min()
+        diff = high - low
+        
+        return {
+            'fib_236': high - (diff * 0.236),
+            'fib_382': high - (diff * 0.382),
+            'fib_500': high - (diff * 0.500),
+            'fib_618': high - (diff * 0.618),
+        }
+    except:
+        current_price = df['Close'].iloc[-1]
+        return {
+            'fib_236': current_price * 0.98,
+            'fib_382': current_price * 0.95,
+            'fib_500': current_price * 0.92,
+            'fib_618': current_price * 0.90,
+        }
+
+
+def calculate_technical_indicators(df):
+    """Calculate various technical indicators using manual calculations"""
+    try:
+        close_prices = df['Close'].values
+        high_prices = df['High'].values
+        low_prices = df['Low'].values
+        
+        # RSI
+        rsi = calculate_rsi(close_prices, window=14)
+        
+        # MACD
+        macd_value = calculate_macd(close_prices)
+        
+        # Stochastic
+        stoch_k, stoch_d = calculate_stochastic(high_prices, low_prices, close_prices)
+        
+        return {
+            'rsi': rsi,
+            'macd': macd_value,
+            'stochastic_k': stoch_k,
+            'stochastic_d': stoch_d,
+        }
+    except Exception as e:
+        print(f"Error calculating indicators: {e}")
+        return {
+            'rsi': 50.0,
+            'macd': 0.0,
+            'stochastic_k': 50.0,
+            'stochastic_d': 50.0,
+        }
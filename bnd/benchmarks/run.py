@@ -0,0 +1,245 @@
+"""Offline benchmark suite: endpoint latency/throughput and calculate_* microbenchmarks.
+
+Everything runs in-process against synthetic bars from benchmarks/fixtures.py,
+so no network access is needed and runs are comparable across machines and
+commits. Run from bnd/:
+
+    python benchmarks/run.py --output bench.json
+    python benchmarks/run.py --baseline bench.json     # compare against an earlier run
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+
+BND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Backtests end on a fixed date so every run replays the same bars
+BACKTEST_END = '2025-12-31'
+BACKTEST_YEARS = (1, 5, 10)
+MICRO_SIZES = (60, 250, 2500)
+
+SUGGESTION_QUERIES = ['A', 'AA', 'AAPL', 'MSF', 'apple', 'micro', 'bank', 'corp', 'holdings tech',
+                      'aple', 'mircosoft', 'therapeutcs', 'ZZZZ', 'kar', 'synth gro']
+
+
+def percentiles(samples):
+    """Summary statistics of a list of durations in seconds, in milliseconds"""
+    ms = np.asarray(samples) * 1000.0
+    return {
+        'requests': int(ms.size),
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+    }
+
+
+def drive(client, requests, concurrency):
+    """Issue (method, url, json) requests; returns latency stats plus throughput"""
+    def one(request):
+        method, url, body = request
+        start = time.perf_counter()
+        response = client.request(method, url, json=body)
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 400 and response.status_code != 404:
+            raise RuntimeError(f"{method} {url} returned {response.status_code}: {response.text[:200]}")
+        return elapsed
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as executor:
+            samples = list(executor.map(one, requests))
+    else:
+        samples = [one(request) for request in requests]
+    wall = time.perf_counter() - start
+
+    stats = percentiles(samples)
+    stats['throughput_rps'] = round(len(samples) / wall, 2)
+    return stats
+
+
+def endpoint_benchmarks(client, args):
+    results = {}
+
+    queries = [('GET', f"/stock-suggestions?q={q}", None) for q in SUGGESTION_QUERIES]
+    drive(client, queries, 1)  # warm up the metadata fallback for unknown symbols
+    results['stock_suggestions'] = drive(client, queries * args.rounds, args.concurrency)
+
+    # Cold: bars and metadata come from the (stubbed) provider; warm: from the caches
+    symbols = [f"BENCH{i}" for i in range(args.symbols)]
+    stock_info = [('GET', f"/stock-info/{symbol}", None) for symbol in symbols]
+    results['stock_info_cold'] = drive(client, stock_info, args.concurrency)
+    results['stock_info_warm'] = drive(client, stock_info * args.rounds, args.concurrency)
+
+    # Start the pool's worker processes before timing anything on them
+    end = datetime.strptime(BACKTEST_END, '%Y-%m-%d')
+    warm_up = end.replace(year=end.year - 1).strftime('%Y-%m-%d')
+    drive(client, [('POST', '/backtest', {
+        'ticker': symbols[0], 'start_date': warm_up, 'end_date': BACKTEST_END, 'engine': engine,
+        'initial_cash': 1000.5,
+    }) for engine in ('vectorized', 'backtrader')], args.concurrency)
+
+    for engine in ('vectorized', 'backtrader'):
+        for years in BACKTEST_YEARS:
+            start = end.replace(year=end.year - years).strftime('%Y-%m-%d')
+            count = args.backtests if engine == 'vectorized' else max(1, args.backtests // years)
+            # A distinct initial_cash per request keeps the result cache out of the timings
+            requests = [('POST', '/backtest', {
+                'ticker': symbols[i % len(symbols)], 'start_date': start, 'end_date': BACKTEST_END,
+                'engine': engine, 'initial_cash': 100000.0 + i + years * 1e4,
+            }) for i in range(count)]
+            results[f"backtest_{engine}_{years}y"] = drive(client, requests, args.concurrency)
+
+    # The last case again, now answered from the result cache
+    results['backtest_cached'] = drive(client, requests, args.concurrency)
+    return results
+
+
+def micro_benchmarks(args):
+    import main
+    import reference_indicators as reference
+    from backtest_engine import rsi_sma
+    from bars import Bars
+    from fixtures import synthetic_bars
+    from indicators import compute_indicators
+
+    results = {}
+    for n in MICRO_SIZES:
+        df = synthetic_bars(n)
+        high, low, close = df['High'].values, df['Low'].values, df['Close'].values
+        bars = Bars.from_frame(df)
+        watchlist = [Bars.from_frame(synthetic_bars(n, seed=i)) for i in range(10)]
+        cases = {
+            'calculate_rsi': lambda: reference.calculate_rsi(df['Close']),
+            'calculate_macd': lambda: reference.calculate_macd(df['Close']),
+            'calculate_stochastic': lambda: reference.calculate_stochastic(df['High'], df['Low'], df['Close']),
+            'calculate_support_resistance': lambda: reference.calculate_support_resistance(df),
+            'calculate_fibonacci_levels': lambda: reference.calculate_fibonacci_levels(df),
+            'calculate_technical_indicators': lambda: reference.calculate_technical_indicators(df),
+            'calculate_stock_levels': lambda: main.calculate_stock_levels(bars),
+            'compute_indicators': lambda: compute_indicators(high, low, close),
+            'calculate_stock_levels_x10': lambda: [main.calculate_stock_levels(b) for b in watchlist],
+            'rsi_sma': lambda: rsi_sma(close, 14),
+        }
+        for name, fn in cases.items():
+            fn()
+            samples = []
+            deadline = time.perf_counter() + args.micro_seconds
+            while len(samples) < 10 or time.perf_counter() < deadline:
+                start = time.perf_counter()
+                fn()
+                samples.append(time.perf_counter() - start)
+            results[f"{name}[{n}]"] = percentiles(samples)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, baseline=None):
+    for section in ('endpoints', 'micro'):
+        print(f"\n{section}")
+        print(f"{'name':<44} {'n':>6} {'rps':>9} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'p50 vs base':>12}")
+        for name, stats in report[section].items():
+            rps = stats.get('throughput_rps')
+            line = (f"{name:<44} {stats['requests']:>6} {rps if rps is not None else '':>9} "
+                    f"{stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} {stats['p99_ms']:>10.3f}")
+            base = (baseline or {}).get(section, {}).get(name)
+            if base and base['p50_ms'] > 0:
+                line += f" {(stats['p50_ms'] / base['p50_ms'] - 1) * 100:>+11.1f}%"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help="Write the results as JSON to this path")
+    parser.add_argument('--baseline', help="Earlier --output file to compare p50 latencies against")
+    parser.add_argument('--rounds', type=int, default=20, help="Repetitions of the warm request sets")
+    parser.add_argument('--symbols', type=int, default=20, help="Distinct symbols for /stock-info and /backtest")
+    parser.add_argument('--backtests', type=int, default=10, help="Requests per vectorized backtest case")
+    parser.add_argument('--provider', choices=('stub', 'replay'), default='stub',
+                        help="Serve synthetic bars directly, or recorded to disk through ReplayProvider")
+    parser.add_argument('--concurrency', type=int, default=1, help="Client threads issuing requests")
+    parser.add_argument('--listing-size', type=int, default=10000, help="Synthetic symbols in the search index")
+    parser.add_argument('--micro-seconds', type=float, default=0.5, help="Time spent per microbenchmark case")
+    parser.add_argument('--skip-endpoints', action='store_true')
+    parser.add_argument('--skip-micro', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='bnd-bench-') as tmp:
+        # Point every on-disk cache and the symbol listing at scratch space
+        # before main (or anything importing bar_store) is imported, since
+        # they are configured at import time
+        os.environ['BAR_STORE_DIR'] = os.path.join(tmp, 'bars')
+        os.environ['RESULT_CACHE_DIR'] = os.path.join(tmp, 'results')
+        os.environ['SYMBOL_LIST_PATH'] = os.path.join(tmp, 'symbols.csv')
+        from fixtures import write_listing
+        write_listing(os.environ['SYMBOL_LIST_PATH'], args.listing_size)
+
+        import main as app_main
+        from fastapi.testclient import TestClient
+        from fixtures import StubProvider, write_replay
+        from providers import ReplayProvider
+
+        stub = StubProvider()
+        if args.provider == 'replay':
+            symbols = [f"BENCH{i}" for i in range(args.symbols)]
+            app_main.use_provider(ReplayProvider(write_replay(os.path.join(tmp, 'replay'), symbols)))
+        else:
+            app_main.use_provider(stub)
+
+        report = {
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'cpus': os.cpu_count(),
+                'args': vars(args),
+            },
+            'endpoints': {},
+            'micro': {},
+        }
+        try:
+            if not args.skip_endpoints:
+                with TestClient(app_main.app) as client:
+                    # Let the startup warm-up finish so it does not compete with the timings
+                    app_main.warmed_up.wait()
+                    report['endpoints'] = endpoint_benchmarks(client, args)
+                report['meta']['provider'] = app_main.market_data.name
+                report['meta']['provider_calls'] = dict(stub.calls)
+            if not args.skip_micro:
+                report['micro'] = micro_benchmarks(args)
+        finally:
+            app_main.backtest_pool.shutdown()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,258 @@
+import threading
+from collections import deque
+
+import numpy as np
+
+from bars import Bars
+
+
+class IncrementalRSI:
+    """RSI over simple rolling means of gains and losses, updated per bar.
+
+    Matches calculate_rsi in benchmarks/reference_indicators.py: the first
+    bar contributes a zero gain and loss, a window without losses reads 100
+    and an undefined value reads 50.
+    """
+    __slots__ = ('window', 'prev_close', 'gains', 'losses')
+
+    def __init__(self, window=14):
+        self.window = window
+        self.prev_close = None
+        self.gains = deque(maxlen=window)
+        self.losses = deque(maxlen=window)
+
+    def update(self, close):
+        delta = 0.0 if self.prev_close is None else close - self.prev_close
+        self.gains.append(delta if delta > 0 else 0.0)
+        self.losses.append(-delta if delta < 0 else 0.0)
+        self.prev_close = close
+
+    @property
+    def value(self):
+        if len(self.gains) < self.window:
+            return 50.0
+        gain = sum(self.gains) / self.window
+        loss = sum(self.losses) / self.window
+        if loss == 0:
+            return 100.0 if gain > 0 else 50.0
+        return 100 - (100 / (1 + gain / loss))
+
+    def to_dict(self):
+        return {'window': self.window, 'prev_close': self.prev_close,
+                'gains': list(self.gains), 'losses': list(self.losses)}
+
+    @classmethod
+    def from_dict(cls, d):
+        state = cls(d['window'])
+        state.prev_close = d['prev_close']
+        state.gains.extend(d['gains'])
+        state.losses.extend(d['losses'])
+        return state
+
+
+class IncrementalEWM:
+    """Exponentially weighted mean matching pandas ewm(span=..., adjust=True)"""
+    __slots__ = ('span', 'decay', 'num', 'den')
+
+    def __init__(self, span):
+        self.span = span
+        self.decay = 1.0 - 2.0 / (span + 1.0)
+        self.num = 0.0
+        self.den = 0.0
+
+    def update(self, x):
+        self.num = x + self.decay * self.num
+        self.den = 1.0 + self.decay * self.den
+
+    @property
+    def value(self):
+        return self.num / self.den if self.den else float('nan')
+
+    def to_dict(self):
+        return {'span': self.span, 'num': self.num, 'den': self.den}
+
+    @classmethod
+    def from_dict(cls, d):
+        state = cls(d['span'])
+        state.num = d['num']
+        state.den = d['den']
+        return state
+
+
+class IncrementalMACD:
+    """MACD line (fast EMA - slow EMA) and its signal line, updated per bar"""
+    __slots__ = ('fast', 'slow', 'signal')
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast = IncrementalEWM(fast)
+        self.slow = IncrementalEWM(slow)
+        self.signal = IncrementalEWM(signal)
+
+    def update(self, close):
+        self.fast.update(close)
+        self.slow.update(close)
+        self.signal.update(self.value)
+
+    @property
+    def value(self):
+        macd = self.fast.value - self.slow.value
+        return macd if not np.isnan(macd) else 0.0
+
+    @property
+    def signal_value(self):
+        signal = self.signal.value
+        return signal if not np.isnan(signal) else 0.0
+
+    def to_dict(self):
+        return {'fast': self.fast.to_dict(), 'slow': self.slow.to_dict(), 'signal': self.signal.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d):
+        state = cls.__new__(cls)
+        state.fast = IncrementalEWM.from_dict(d['fast'])
+        state.slow = IncrementalEWM.from_dict(d['slow'])
+        state.signal = IncrementalEWM.from_dict(d['signal'])
+        return state
+
+
+class IncrementalStochastic:
+    """Stochastic %K over a rolling high/low window and %D as its rolling mean"""
+    __slots__ = ('k_period', 'd_period', 'highs', 'lows', 'k_values')
+
+    def __init__(self, k_period=14, d_period=3):
+        self.k_period = k_period
+        self.d_period = d_period
+        self.highs = deque(maxlen=k_period)
+        self.lows = deque(maxlen=k_period)
+        self.k_values = deque(maxlen=d_period)
+
+    def update(self, high, low, close):
+        self.highs.append(high)
+        self.lows.append(low)
+        k = float('nan')
+        if len(self.highs) == self.k_period:
+            lowest, highest = min(self.lows), max(self.highs)
+            if highest != lowest:
+                k = 100 * (close - lowest) / (highest - lowest)
+        self.k_values.append(k)
+
+    @property
+    def value(self):
+        """Return (%K, %D), with 50 standing in for undefined values"""
+        k = self.k_values[-1] if self.k_values else float('nan')
+        d = float('nan')
+        if len(self.k_values) == self.d_period:
+            d = sum(self.k_values) / self.d_period
+        return (k if not np.isnan(k) else 50.0), (d if not np.isnan(d) else 50.0)
+
+    def to_dict(self):
+        return {'k_period': self.k_period, 'd_period': self.d_period, 'highs': list(self.highs),
+                'lows': list(self.lows), 'k_values': list(self.k_values)}
+
+    @classmethod
+    def from_dict(cls, d):
+        state = cls(d['k_period'], d['d_period'])
+        state.highs.extend(d['highs'])
+        state.lows.extend(d['lows'])
+        state.k_values.extend(d['k_values'])
+        return state
+
+
+class IndicatorState:
+    """RSI, MACD and stochastic state for one symbol, committed up to a bar.
+
+    Only bars strictly before the latest one are committed, since the latest
+    daily bar may still be forming; values() previews it on a copy instead.
+    """
+    __slots__ = ('last_ts', 'rsi', 'macd', 'stochastic')
+
+    def __init__(self):
+        self.last_ts = None
+        self.rsi = IncrementalRSI()
+        self.macd = IncrementalMACD()
+        self.stochastic = IncrementalStochastic()
+
+    def update(self, ts, high, low, close):
+        self.rsi.update(close)
+        self.macd.update(close)
+        self.stochastic.update(high, low, close)
+        self.last_ts = ts
+
+    def advance(self, ts, high, low, close):
+        """Commit every bar newer than last_ts except the latest one.
+
+        Returns False when the bars start after last_ts (a gap this state
+        cannot bridge) or end at or before it; either way it must be reseeded.
+        """
+        if self.last_ts is not None and (ts[0] > self.last_ts or ts[-1] <= self.last_ts):
+            return False
+        start = 0 if self.last_ts is None else int(np.searchsorted(ts, self.last_ts, side='right'))
+        for i in range(start, ts.size - 1):
+            self.update(int(ts[i]), float(high[i]), float(low[i]), float(close[i]))
+        return True
+
+    def values(self, high, low, close):
+        """Indicator values as if the given (provisional) bar were appended"""
+        preview = IndicatorState.from_dict(self.to_dict())
+        preview.update(self.last_ts, high, low, close)
+        k, d = preview.stochastic.value
+        return {
+            'rsi': float(preview.rsi.value),
+            'macd': float(preview.macd.value),
+            'macd_signal': float(preview.macd.signal_value),
+            'stochastic_k': float(k),
+            'stochastic_d': float(d),
+        }
+
+    def to_dict(self):
+        return {'last_ts': self.last_ts, 'rsi': self.rsi.to_dict(),
+                'macd': self.macd.to_dict(), 'stochastic': self.stochastic.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d):
+        state = cls.__new__(cls)
+        state.last_ts = d['last_ts']
+        state.rsi = IncrementalRSI.from_dict(d['rsi'])
+        state.macd = IncrementalMACD.from_dict(d['macd'])
+        state.stochastic = IncrementalStochastic.from_dict(d['stochastic'])
+        return state
+
+
+class IndicatorStateCache:
+    """Per-symbol IndicatorState kept in memory and persisted with the bars.
+
+    The first request for a symbol seeds the state from its history; later
+    requests only fold in the bars that arrived since, so refreshing the
+    indicators no longer rescans the lookback window.
+    """
+
+    SIDECAR = 'indicators'
+
+    def __init__(self, bar_store, interval='1d'):
+        self.bar_store = bar_store
+        self.interval = interval
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def indicators(self, symbol, bars):
+        """Return rsi/macd/stochastic values for the latest bar of bars (Bars or a bars frame)"""
+        if not isinstance(bars, Bars):
+            bars = Bars.from_frame(bars)
+        ts, high, low, close = bars.dates, bars.high, bars.low, bars.close
+
+        with self._lock:
+            state = self._states.get(symbol)
+            if state is None:
+                saved = self.bar_store.load_sidecar(symbol, self.interval, self.SIDECAR)
+                state = IndicatorState.from_dict(saved) if saved else None
+
+            last_ts = state.last_ts if state else None
+            if state is None or not state.advance(ts, high, low, close):
+                state = IndicatorState()
+                state.advance(ts, high, low, close)
+
+            self._states[symbol] = state
+            if state.last_ts != last_ts:
+                self.bar_store.save_sidecar(symbol, self.interval, self.SIDECAR, state.to_dict())
+
+            return state.values(float(high[-1]), float(low[-1]), float(close[-1]))
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def _or_default(value, default):
+    return float(value) if not pd.isna(value) else default
+
+
+_EWM_BLOCK = 32
+
+
+def _ewm_mean(x, span, out):
+    """pandas ewm(span=span, adjust=True).mean() of x, written into out.
+
+    The bars are cut into blocks of _EWM_BLOCK; within a block the weighted
+    sums are a scaled cumulative sum (all blocks at once), and only the
+    running totals carried between blocks are chained sequentially. The
+    short blocks keep the scale factors far from overflow.
+    """
+    n = x.size
+    decay = 1.0 - 2.0 / (span + 1.0)
+    powers = decay ** np.arange(_EWM_BLOCK, dtype=np.float64)
+    weights = np.cumsum(powers)
+    blocks = -(-n // _EWM_BLOCK)
+
+    padded = np.zeros(blocks * _EWM_BLOCK)
+    padded[:n] = x
+    num = padded.reshape(blocks, _EWM_BLOCK)
+    num /= powers
+    np.cumsum(num, axis=1, out=num)
+    num *= powers
+
+    # Totals carried into each block from everything before it
+    carry_decay = decay ** _EWM_BLOCK
+    carry_num = np.empty(blocks)
+    carry_den = np.empty(blocks)
+    total_num = total_den = 0.0
+    for k, block_total in enumerate(num[:, -1].tolist()):
+        carry_num[k], carry_den[k] = total_num, total_den
+        total_num = block_total + carry_decay * total_num
+        total_den = weights[-1] + carry_decay * total_den
+
+    tail = decay * powers
+    num += carry_num[:, None] * tail
+    den = weights + carry_den[:, None] * tail
+    np.divide(num.ravel()[:n], den.ravel()[:n], out=out)
+    return out
+
+
+def _rolling(values, window, reducer, partial=False):
+    """Rolling np.maximum/np.minimum over values in O(n) (van Herk/Gil-Werman).
+
+    NaN until the window fills, unless partial, in which case the leading
+    bars reduce over however many bars exist so far.
+    """
+    n = values.size
+    out = np.full(n, np.nan)
+    fill = -np.inf if reducer is np.maximum else np.inf
+    lead = window - 1 if partial else 0
+    if n + lead < window:
+        return out
+
+    # Prefix and suffix extremes within window-sized blocks; any window
+    # spans at most two blocks, so it is the suffix of one and prefix of the next
+    blocks = -(-(n + lead) // window)
+    padded = np.full(blocks * window, fill)
+    padded[lead:lead + n] = values
+    grid = padded.reshape(blocks, window)
+    prefix = reducer.accumulate(grid, axis=1).ravel()
+    suffix = reducer.accumulate(grid[:, ::-1], axis=1)[:, ::-1].ravel()
+    count = n + lead - window + 1
+    reducer(suffix[:count], prefix[window - 1:window - 1 + count], out=out[n - count:])
+    return out
+
+
+def compute_indicators(high, low, close, full=False, rsi_window=14, k_period=14,
+                       d_period=3, sr_window=20, fib_periods=50):
+    """Fused RSI, MACD + signal, stochastic, support/resistance and Fibonacci kernel.
+
+    Works directly on contiguous float64 arrays and shares intermediates
+    (one price diff, one cumulative sum per RSI leg, one rolling high/low per
+    window) instead of a separate pandas pass per indicator. Latest values
+    follow the calculate_* functions in benchmarks/reference_indicators.py,
+    including their NaN fallbacks; with full=True the whole series is
+    returned as well under 'series'.
+    """
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    n = close.size
+
+    # RSI from rolling means of gains and losses, via one cumsum each
+    delta = np.empty(n)
+    delta[0] = 0.0
+    np.subtract(close[1:], close[:-1], out=delta[1:])
+    gain = np.cumsum(np.maximum(delta, 0.0))
+    loss = np.cumsum(np.maximum(-delta, 0.0))
+    rsi = np.full(n, np.nan)
+    if n >= rsi_window:
+        gain[rsi_window:] -= gain[:-rsi_window].copy()
+        loss[rsi_window:] -= loss[:-rsi_window].copy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = gain[rsi_window - 1:] / loss[rsi_window - 1:]
+        rsi[rsi_window - 1:] = 100.0 - 100.0 / (1.0 + rs)
+
+    # MACD line and its signal line
+    macd = _ewm_mean(close, 12, np.empty(n))
+    macd -= _ewm_mean(close, 26, np.empty(n))
+    macd_signal = _ewm_mean(macd, 9, np.empty(n))
+
+    # Stochastic %K / %D
+    lowest_low = _rolling(low, k_period, np.minimum)
+    highest_high = _rolling(high, k_period, np.maximum)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stochastic_k = 100.0 * (close - lowest_low) / (highest_high - lowest_low)
+    stochastic_d = np.full(n, np.nan)
+    if n >= d_period:
+        np.mean(sliding_window_view(stochastic_k, d_period), axis=1, out=stochastic_d[d_period - 1:])
+
+    # Support / resistance and Fibonacci bands
+    support = _rolling(low, sr_window, np.minimum)
+    resistance = _rolling(high, sr_window, np.maximum)
+    fib_high = _rolling(high, fib_periods, np.maximum, partial=True)
+    fib_range = fib_high - _rolling(low, fib_periods, np.minimum, partial=True)
+    fibs = {name: fib_high - fib_range * ratio for name, ratio in
+            (('fib_236', 0.236), ('fib_382', 0.382), ('fib_500', 0.500), ('fib_618', 0.618))}
+
+    result = {
+        'rsi': _or_default(rsi[-1], 50.0),
+        'macd': _or_default(macd[-1], 0.0),
+        'macd_signal': _or_default(macd_signal[-1], 0.0),
+        'stochastic_k': _or_default(stochastic_k[-1], 50.0),
+        'stochastic_d': _or_default(stochastic_d[-1], 50.0),
+        'support_level': float(support[-1]),
+        'resistance_level': float(resistance[-1]),
+    }
+    result.update({name: float(values[-1]) for name, values in fibs.items()})
+
+    if full:
+        result['series'] = {
+            'rsi': rsi,
+            'macd': macd,
+            'macd_signal': macd_signal,
+            'stochastic_k': stochastic_k,
+            'stochastic_d': stochastic_d,
+            'support_level': support,
+            'resistance_level': resistance,
+            **fibs,
+        }
+    return result
@@ -1,15 +1,47 @@
-from fastapi import FastAPI, HTTPException, Query
+import time
+# Taken before the imports below, for the startup_duration_seconds metric
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Header, HTTPException, Query, WebSocket, WebSocketDisconnect
+import asyncio
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field, validator
-import backtrader as bt
-import yfinance as yf
 import traceback
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Optional, List
-import requests
+from typing import Dict, Optional, List
+from concurrent.futures import ThreadPoolExecutor
+import importlib
 import json
+import math
+import os
+import secrets
+import zlib
+import threading
+from bar_store import BAR_COLUMNS, BAR_STORE_DIR, BarStore, normalize_range
+from bars import BAR_PRICE_DTYPE, Bars
+from coalesce import SingleFlight
+from metadata_cache import MetadataCache
+from providers import provider_from_env
+from prefetch import PrefetchScheduler, forming_day
+from quotes import QuoteHub
+from upstream import UpstreamGovernor, UpstreamUnavailable
+from backtest_engine import (BACKTEST_ENGINES, BACKTEST_SIZERS, run_backtest_engine, run_rsi_sweep,
+                             run_walk_forward, summarize_walk_forward, walk_forward_windows)
+from montecarlo import MONTE_CARLO_METHODS, run_monte_carlo, summarize_monte_carlo
+from backtest_pool import BacktestPool, BacktestTimeout, PoolSaturated
+from backtest_jobs import BacktestJobQueue, JobQueueFull
+from indicators import compute_indicators
+from incremental import IndicatorStateCache
+from symbol_index import SymbolIndex
+from portfolio_engine import REBALANCE_FREQUENCIES, align_bars, run_portfolio_backtest
+from result_cache import ResultCache, fingerprint_bars, result_key
+from snapshots import SnapshotCache, etag_matches
+import metrics
+from metrics import MetricsMiddleware, instrument_upstream, stage
 
 app = FastAPI(title="Stock Analysis & Backtest API", version="1.0.0")
 
@@ -22,25 +54,228 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route and per-stage latency, served at /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Where bars and company metadata come from (MARKET_DATA_PROVIDER); callers
+# look it up at call time, so use_provider() can swap it for load tests
+market_data = provider_from_env()
+
+# Rate limit, concurrency cap and backoff shared by all remote provider calls
+upstream = UpstreamGovernor()
+
+def governed(fn):
+    """Route calls through the upstream governor unless the provider is local"""
+    def wrapper(*args, **kwargs):
+        if not market_data.remote:
+            return fn(*args, **kwargs)
+        return upstream.call(fn, *args, **kwargs)
+    return wrapper
+
+def fetch_bars(symbol, start, end, interval='1d'):
+    bars = market_data.fetch_bars([symbol], start, end, interval)
+    return bars.get(symbol, pd.DataFrame(columns=BAR_COLUMNS))
+
+def fetch_bars_many(symbols, start, end, interval='1d'):
+    return market_data.fetch_bars(symbols, start, end, interval)
+
+# Local OHLCV store so repeat requests only download bars we have not seen;
+# while upstream is throttled it serves what it already has. Each provider
+# stores under its own directory, so a replay never serves live bars
+bar_store = BarStore(
+    root=os.path.join(BAR_STORE_DIR, market_data.name),
+    fetcher=governed(instrument_upstream('download', fetch_bars)),
+    bulk_fetcher=governed(instrument_upstream('download_many', fetch_bars_many)),
+    forming_day=forming_day,
+    serve_stale_on=(UpstreamUnavailable,),
+)
+
+def use_provider(provider):
+    """Serve bars and metadata from provider, stored apart from other providers'.
+
+    Meant for before requests are served: caches kept in memory are not
+    cleared.
+    """
+    global market_data
+    market_data = provider
+    bar_store.root = os.path.join(BAR_STORE_DIR, provider.name)
+
+# Concurrent requests for the same upstream data share one fetch in flight
+upstream_flight = SingleFlight()
+
+def load_bar_columns(symbol, start, end, dtype=np.float64):
+    """Read bars from the store as Bars, sharing the fetch with concurrent callers;
+    float64 columns view the store's file"""
+    start_day, end_day = normalize_range(start, end)
+    key = ('columns', symbol, start_day, end_day, np.dtype(dtype).str)
+    return upstream_flight.do(key, bar_store.get_columns, symbol, start_day, end_day, dtype=dtype)
+
+def load_bars_many(symbols, start, end):
+    """Read bars for several symbols, bulk-fetching whatever the store lacks"""
+    start_day, end_day = normalize_range(start, end)
+    key = ('bars-many', tuple(sorted(set(symbols))), start_day, end_day)
+    return upstream_flight.do(key, bar_store.get_bars_many, symbols, start_day, end_day)
+
+fetch_ticker_info = governed(instrument_upstream(
+    'ticker_info', lambda symbol: market_data.fetch_metadata([symbol]).get(symbol, {})))
+
+def load_ticker_info(symbol):
+    """Fetch Ticker.info, sharing the call with concurrent callers"""
+    return upstream_flight.do(('info', symbol), fetch_ticker_info, symbol)
+
+# Company metadata changes at most daily, so keep it in a TTL + LRU cache
+metadata_cache = MetadataCache(load_ticker_info, serve_stale_on=(UpstreamUnavailable,))
+
+# Streaming RSI/MACD/stochastic state, so /stock-info only folds in new bars
+indicator_states = IndicatorStateCache(bar_store)
+
+# CPU-bound backtests run in worker processes so they cannot starve the
+# lightweight endpoints of the GIL
+backtest_pool = BacktestPool()
+
+# Finished backtests, addressed by request and bar content
+result_cache = ResultCache()
+
+# Serialized /stock-info responses per (symbol, trading day)
+stock_info_snapshots = SnapshotCache()
+
+# Cache and pool counters are kept by their owners and read at scrape time
+metrics.registry.add_collector(
+    "cache_requests_total", "counter", "Cache lookups by cache and result",
+    lambda: {
+        ('bars', 'hit'): bar_store.hits,
+        ('bars', 'miss'): bar_store.misses,
+        ('metadata', 'hit'): metadata_cache.hits,
+        ('metadata', 'miss'): metadata_cache.misses,
+        ('backtest_results', 'hit'): result_cache.hits,
+        ('backtest_results', 'disk_hit'): result_cache.disk_hits,
+        ('backtest_results', 'miss'): result_cache.misses,
+        ('stock_info_snapshots', 'hit'): stock_info_snapshots.hits,
+        ('stock_info_snapshots', 'miss'): stock_info_snapshots.misses,
+    },
+    ("cache", "result"),
+)
+metrics.registry.add_collector(
+    "stale_responses_total", "counter", "Cached data served because upstream was throttled",
+    lambda: {('bars',): bar_store.stale, ('metadata',): metadata_cache.stale},
+    ("cache",),
+)
+metrics.registry.add_collector(
+    "upstream_queue_depth", "gauge", "Upstream calls waiting for a rate limit token or a slot",
+    lambda: {(): upstream.waiting},
+)
+metrics.registry.add_collector(
+    "upstream_in_flight", "gauge", "Upstream calls in progress",
+    lambda: {(): upstream.in_flight},
+)
+metrics.registry.add_collector(
+    "upstream_throttled_total", "counter", "Upstream calls refused by the governor or rate limited by upstream",
+    lambda: {(reason,): count for reason, count in upstream.throttled.items()},
+    ("reason",),
+)
+metrics.registry.add_collector(
+    "upstream_retries_total", "counter", "Upstream calls retried after a transient error",
+    lambda: {(): upstream.retried},
+)
+metrics.registry.add_collector(
+    "upstream_coalesced_total", "counter", "Upstream calls served by joining one already in flight",
+    lambda: {(): upstream_flight.coalesced},
+)
+metrics.registry.add_collector(
+    "backtest_pool_in_flight", "gauge", "Backtests queued or running in the process pool",
+    lambda: {(): backtest_pool.in_flight()},
+)
+metrics.registry.add_collector(
+    "backtest_shared_bar_bytes", "gauge", "Bar data held in shared memory for queued and running backtests",
+    lambda: {(): backtest_pool.shared_bytes},
+)
+
+@app.on_event("shutdown")
+def shutdown_backtest_pool():
+    backtest_pool.shutdown()
+
+# After startup a background thread loads what first requests would
+# otherwise wait for: slow imports, the search index and the backtest
+# workers. PREWARM_POPULAR_STOCKS=1 also loads bars, metadata and
+# indicator state for POPULAR_STOCKS
+WARM_UP_MODULES = ('backtrader_engine', 'yfinance')
+WARM_UP_BACKTEST_POOL = os.environ.get("WARM_UP_BACKTEST_POOL", "1") == "1"
+PREWARM_POPULAR_STOCKS = os.environ.get("PREWARM_POPULAR_STOCKS", "0") == "1"
+
+# Seconds taken by each startup phase
+startup_seconds = {}
+warmed_up = threading.Event()
+
+metrics.registry.add_collector(
+    "startup_duration_seconds", "gauge",
+    "Time to import the app, to start serving, and to finish warm-up and prewarming",
+    lambda: {(phase,): seconds for phase, seconds in startup_seconds.items()},
+    ("phase",),
+)
+
+@app.on_event("startup")
+def start_warm_up():
+    startup_seconds['ready'] = time.perf_counter() - IMPORT_STARTED
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+def warm_up():
+    started = time.perf_counter()
+    try:
+        with stage('warm_up'):
+            get_symbol_index()
+            for module in WARM_UP_MODULES:
+                importlib.import_module(module)
+            if WARM_UP_BACKTEST_POOL:
+                backtest_pool.warm_up(('backtest_engine', 'backtrader_engine'))
+        startup_seconds['warm_up'] = time.perf_counter() - started
+
+        if PREWARM_POPULAR_STOCKS:
+            with stage('prewarm'):
+                prewarm_popular_stocks()
+            startup_seconds['prewarm'] = time.perf_counter() - started
+    except Exception as e:
+        print(f"Error warming up: {str(e)}")
+        print(traceback.format_exc())
+    finally:
+        warmed_up.set()
+
+def prewarm_popular_stocks():
+    """Load the /stock-info inputs of every popular stock into the caches"""
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=STOCK_INFO_LOOKBACK_DAYS)
+    bars = load_bars_many(list(POPULAR_STOCKS), start_date, end_date)
+
+    with ThreadPoolExecutor(max_workers=METADATA_FETCH_WORKERS) as executor:
+        list(executor.map(metadata_cache.get, bars))
+    for symbol, df in bars.items():
+        indicator_states.indicators(symbol, df)
+    print(f"Prewarmed {len(bars)} of {len(POPULAR_STOCKS)} popular stocks")
+
+# Ranking options for /backtest/sweep; drawdown ranks lowest first
+SWEEP_SORT_FIELDS = ('total_return_pct', 'final_value', 'win_rate', 'max_drawdown', 'total_trades')
+MAX_SWEEP_COMBINATIONS = 20000
+MAX_WALK_FORWARD_WINDOWS = 1000
+WALK_FORWARD_WINDOWS_PER_JOB = 25
+MAX_MONTE_CARLO_SIMULATIONS = 10000
+# Fewest bootstrap paths worth a pool job of their own
+MONTE_CARLO_MIN_PATHS_PER_JOB = 100
+MAX_PORTFOLIO_SYMBOLS = 100
+
+# /stock-info analyses the last three months of bars
+STOCK_INFO_LOOKBACK_DAYS = 90
+MAX_BATCH_SYMBOLS = 50
+METADATA_FETCH_WORKERS = 8
+MAX_SERIES_DAYS = 3650
+
 # Pydantic models
 class StockSuggestion(BaseModel):
     symbol: str
     company_name: str
     match_type: str = "symbol"
 
-class StrategyInput(BaseModel):
-    ticker: str = Field(..., min_length=1, max_length=10, description="Stock ticker symbol")
+class DateRange(BaseModel):
     start_date: str = Field(..., description="Start date in YYYY-MM-DD format")
     end_date: str = Field(..., description="End date in YYYY-MM-DD format")
-    strategy: str = Field(default="RSI", description="Strategy type")
-    rsi_period: int = Field(default=14, ge=5, le=50, description="RSI calculation period")
-    rsi_buy: int = Field(default=30, ge=0, le=100, description="RSI buy threshold")
-    rsi_sell: int = Field(default=70, ge=0, le=100, description="RSI sell threshold")
-    initial_cash: float = Field(default=100000.0, ge=1000, description="Initial portfolio value")
-
-    @validator('ticker')
-    def ticker_must_be_uppercase(cls, v):
-        return v.upper().strip()
 
     @validator('start_date', 'end_date')
     def validate_date_format(cls, v):
@@ -50,12 +285,40 @@ class StrategyInput(BaseModel):
         except ValueError:
             raise ValueError('Date must be in YYYY-MM-DD format')
 
+class BacktestPeriod(DateRange):
+    ticker: str = Field(..., min_length=1, max_length=10, description="Stock ticker symbol")
+
+    @validator('ticker')
+    def ticker_must_be_uppercase(cls, v):
+        return v.upper().strip()
+
+class StrategyInput(BacktestPeriod):
+    strategy: str = Field(default="RSI", description="Strategy type")
+    rsi_period: int = Field(default=14, ge=5, le=50, description="RSI calculation period")
+    rsi_buy: int = Field(default=30, ge=0, le=100, description="RSI buy threshold")
+    rsi_sell: int = Field(default=70, ge=0, le=100, description="RSI sell threshold")
+    initial_cash: float = Field(default=100000.0, ge=1000, description="Initial portfolio value")
+    engine: str = Field(default="backtrader", description="Backtest engine: backtrader or vectorized")
+    sizer: str = Field(default="fixed", description="Position sizing: fixed (one share per trade) or all_in (all available cash)")
+
     @validator('rsi_sell')
     def rsi_sell_must_be_greater_than_buy(cls, v, values):
         if 'rsi_buy' in values and v <= values['rsi_buy']:
             raise ValueError('RSI sell threshold must be greater than buy threshold')
         return v
 
+    @validator('engine')
+    def engine_must_be_known(cls, v):
+        if v not in BACKTEST_ENGINES:
+            raise ValueError(f"Engine must be one of: {', '.join(BACKTEST_ENGINES)}")
+        return v
+
+    @validator('sizer')
+    def sizer_must_be_known(cls, v):
+        if v not in BACKTEST_SIZERS:
+            raise ValueError(f"Sizer must be one of: {', '.join(BACKTEST_SIZERS)}")
+        return v
+
 class BacktestResult(BaseModel):
     final_value: float
     initial_value: float
@@ -67,6 +330,260 @@ class BacktestResult(BaseModel):
     win_rate: float
     max_drawdown: float
 
+class ParameterRange(BaseModel):
+    start: int = Field(..., description="First value")
+    stop: int = Field(..., description="Last value (inclusive)")
+    step: int = Field(default=1, ge=1, description="Increment between values")
+
+    @validator('stop')
+    def stop_must_not_precede_start(cls, v, values):
+        if 'start' in values and v < values['start']:
+            raise ValueError('Range stop must be greater than or equal to start')
+        return v
+
+    def values(self):
+        return list(range(self.start, self.stop + 1, self.step))
+
+class SweepInput(BacktestPeriod):
+    rsi_period: ParameterRange = Field(..., description="RSI periods to try")
+    rsi_buy: ParameterRange = Field(..., description="RSI buy thresholds to try")
+    rsi_sell: ParameterRange = Field(..., description="RSI sell thresholds to try")
+    initial_cash: float = Field(default=100000.0, ge=1000, description="Initial portfolio value")
+    sizer: str = Field(default="fixed", description="Position sizing: fixed (one share per trade) or all_in (all available cash)")
+    sort_by: str = Field(default="total_return_pct", description="BacktestResult field to rank by")
+    top_n: int = Field(default=20, ge=1, le=1000, description="Number of ranked results to return")
+
+    @validator('rsi_period')
+    def rsi_periods_in_bounds(cls, v):
+        if v.start < 5 or v.stop > 50:
+            raise ValueError('RSI periods must be between 5 and 50')
+        return v
+
+    @validator('rsi_buy', 'rsi_sell')
+    def thresholds_in_bounds(cls, v):
+        if v.start < 0 or v.stop > 100:
+            raise ValueError('RSI thresholds must be between 0 and 100')
+        return v
+
+    @validator('sizer')
+    def sizer_must_be_known(cls, v):
+        if v not in BACKTEST_SIZERS:
+            raise ValueError(f"Sizer must be one of: {', '.join(BACKTEST_SIZERS)}")
+        return v
+
+    @validator('sort_by')
+    def sort_by_must_be_metric(cls, v):
+        if v not in SWEEP_SORT_FIELDS:
+            raise ValueError(f"sort_by must be one of: {', '.join(SWEEP_SORT_FIELDS)}")
+        return v
+
+class SweepResultRow(BacktestResult):
+    rsi_period: int
+    rsi_buy: int
+    rsi_sell: int
+
+class SweepResult(BaseModel):
+    ticker: str
+    combinations: int
+    results: List[SweepResultRow]
+
+class WalkForwardInput(BacktestPeriod):
+    rsi_period: int = Field(default=14, ge=5, le=50, description="RSI calculation period")
+    rsi_buy: ParameterRange = Field(default_factory=lambda: ParameterRange(start=30, stop=30),
+                                    description="RSI buy thresholds to optimize over on each train window")
+    rsi_sell: ParameterRange = Field(default_factory=lambda: ParameterRange(start=70, stop=70),
+                                     description="RSI sell thresholds to optimize over on each train window")
+    train_months: int = Field(default=12, ge=1, le=120, description="Train window length in months")
+    test_months: int = Field(default=3, ge=1, le=60, description="Test window length in months")
+    step_months: int = Field(default=1, ge=1, le=60, description="Months between consecutive windows")
+    anchored: bool = Field(default=False, description="Grow train windows from the first bar instead of rolling them")
+    optimize_by: str = Field(default="total_return_pct", description="BacktestResult field to optimize on train windows")
+    initial_cash: float = Field(default=100000.0, ge=1000, description="Initial portfolio value per window")
+
+    @validator('rsi_buy', 'rsi_sell')
+    def thresholds_in_bounds(cls, v):
+        if v.start < 0 or v.stop > 100:
+            raise ValueError('RSI thresholds must be between 0 and 100')
+        return v
+
+    @validator('optimize_by')
+    def optimize_by_must_be_metric(cls, v):
+        if v not in SWEEP_SORT_FIELDS:
+            raise ValueError(f"optimize_by must be one of: {', '.join(SWEEP_SORT_FIELDS)}")
+        return v
+
+class WalkForwardWindow(BacktestResult):
+    train_start: str
+    train_end: str
+    test_start: str
+    test_end: str
+    rsi_buy: int
+    rsi_sell: int
+    train_return_pct: float
+
+class WalkForwardSummary(BaseModel):
+    windows: int
+    mean_return_pct: float
+    median_return_pct: float
+    std_return_pct: float
+    positive_windows_pct: float
+    chained_return_pct: float
+    mean_train_return_pct: float
+    total_trades: int
+    win_rate: float
+    worst_drawdown: float
+
+class WalkForwardResult(BaseModel):
+    ticker: str
+    summary: WalkForwardSummary
+    windows: List[WalkForwardWindow]
+
+class MonteCarloInput(BacktestPeriod):
+    rsi_period: int = Field(default=14, ge=5, le=50, description="RSI calculation period")
+    rsi_buy: int = Field(default=30, ge=0, le=100, description="RSI buy threshold")
+    rsi_sell: int = Field(default=70, ge=0, le=100, description="RSI sell threshold")
+    initial_cash: float = Field(default=100000.0, ge=1000, description="Initial portfolio value")
+    simulations: int = Field(default=1000, ge=10, le=MAX_MONTE_CARLO_SIMULATIONS, description="Simulations per method")
+    methods: List[str] = Field(default_factory=lambda: list(MONTE_CARLO_METHODS),
+                               description="Any of bootstrap (resampled returns), trades (shuffled trade order) and costs (random slippage and commission)")
+    block_size: int = Field(default=20, ge=1, le=250, description="Bars per bootstrap block")
+    slippage_bps: float = Field(default=10.0, ge=0, le=500, description="Largest slippage per fill, in basis points")
+    commission_pct: float = Field(default=0.1, ge=0, le=5, description="Largest commission per fill, in percent of notional")
+    seed: Optional[int] = Field(default=None, ge=0, description="RNG seed; a random one is used (and returned) if omitted")
+
+    @validator('rsi_sell')
+    def rsi_sell_must_be_greater_than_buy(cls, v, values):
+        if 'rsi_buy' in values and v <= values['rsi_buy']:
+            raise ValueError('RSI sell threshold must be greater than buy threshold')
+        return v
+
+    @validator('methods')
+    def methods_must_be_known(cls, v):
+        if not v:
+            raise ValueError('At least one method is required')
+        unknown = [m for m in v if m not in MONTE_CARLO_METHODS]
+        if unknown:
+            raise ValueError(f"Methods must be among: {', '.join(MONTE_CARLO_METHODS)}")
+        return list(dict.fromkeys(v))
+
+class Distribution(BaseModel):
+    mean: float
+    std: float
+    min: float
+    p5: float
+    p25: float
+    median: float
+    p75: float
+    p95: float
+    max: float
+
+class MonteCarloMethodResult(BaseModel):
+    simulations: int
+    final_value: Distribution
+    total_return_pct: Distribution
+    max_drawdown: Distribution
+    win_rate: Distribution
+    loss_probability: float
+
+class MonteCarloResult(BaseModel):
+    ticker: str
+    seed: int
+    baseline: BacktestResult
+    methods: Dict[str, MonteCarloMethodResult]
+
+class PortfolioAsset(BaseModel):
+    symbol: str = Field(..., min_length=1, max_length=10, description="Stock ticker symbol")
+    weight: float = Field(..., gt=0, description="Relative allocation; weights are normalized to sum to 1")
+
+    @validator('symbol')
+    def symbol_must_be_uppercase(cls, v):
+        return v.upper().strip()
+
+class PortfolioBacktestInput(DateRange):
+    assets: List[PortfolioAsset] = Field(..., min_items=1, max_items=MAX_PORTFOLIO_SYMBOLS)
+    rsi_period: int = Field(default=14, ge=5, le=50, description="RSI calculation period")
+    rsi_buy: int = Field(default=30, ge=0, le=100, description="RSI buy threshold")
+    rsi_sell: int = Field(default=70, ge=0, le=100, description="RSI sell threshold")
+    initial_cash: float = Field(default=100000.0, ge=1000, description="Initial portfolio value")
+    rebalance: str = Field(default="none", description="Reset sleeves to target weights: none, monthly, quarterly or yearly")
+
+    @validator('assets')
+    def symbols_must_be_unique(cls, v):
+        symbols = [asset.symbol for asset in v]
+        if len(set(symbols)) != len(symbols):
+            raise ValueError('Each symbol may appear only once')
+        return v
+
+    @validator('rsi_sell')
+    def rsi_sell_must_be_greater_than_buy(cls, v, values):
+        if 'rsi_buy' in values and v <= values['rsi_buy']:
+            raise ValueError('RSI sell threshold must be greater than buy threshold')
+        return v
+
+    @validator('rebalance')
+    def rebalance_must_be_known(cls, v):
+        if v not in REBALANCE_FREQUENCIES:
+            raise ValueError(f"Rebalance must be one of: {', '.join(REBALANCE_FREQUENCIES)}")
+        return v
+
+class PortfolioAssetResult(BaseModel):
+    symbol: str
+    weight: float
+    final_value: float
+    total_trades: int
+    held_pct: float
+
+class EquityPoint(BaseModel):
+    date: str
+    value: float
+
+class PortfolioBacktestResult(BacktestResult):
+    volatility: float
+    sharpe_ratio: float
+    assets: List[PortfolioAssetResult]
+    equity_curve: List[EquityPoint]
+
+class JobProgress(BaseModel):
+    bars_processed: int
+    total_bars: int
+
+class BacktestJobStatus(BaseModel):
+    job_id: str
+    status: str
+    progress: JobProgress
+    created_at: str
+    finished_at: Optional[str] = None
+    result: Optional[BacktestResult] = None
+    error: Optional[str] = None
+
+class StockInfoBatchRequest(BaseModel):
+    symbols: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_SYMBOLS, description="Ticker symbols")
+
+    @validator('symbols', each_item=True)
+    def symbols_must_be_uppercase(cls, v):
+        v = v.upper().strip()
+        if not v:
+            raise ValueError('Symbols must not be empty')
+        return v
+
+class IndicatorSeries(BaseModel):
+    symbol: str
+    dates: List[str]
+    close: List[float]
+    
+    # Full indicator series for charting; null until a window fills
+    rsi: List[Optional[float]]
+    macd: List[Optional[float]]
+    macd_signal: List[Optional[float]]
+    stochastic_k: List[Optional[float]]
+    stochastic_d: List[Optional[float]]
+    support_level: List[Optional[float]]
+    resistance_level: List[Optional[float]]
+    fib_236: List[Optional[float]]
+    fib_382: List[Optional[float]]
+    fib_500: List[Optional[float]]
+    fib_618: List[Optional[float]]
+
 class StockInfo(BaseModel):
     symbol: str
     company_name: str
@@ -189,148 +706,45 @@ POPULAR_STOCKS = {
     'CCI': 'Crown Castle International Corp.',
 }
 
-class RSIStrategy(bt.Strategy):
-    params = (
-        ("rsi_period", 14),
-        ("rsi_buy", 30),
-        ("rsi_sell", 70),
-    )
+# Search index over the full listing (SYMBOL_LIST_PATH), or POPULAR_STOCKS
+# alone; built by the warm-up or the first search, whichever comes first
+_symbol_index = None
+_symbol_index_lock = threading.Lock()
 
-    def __init__(self):
-        self.rsi = bt.indicators.RSI_SMA(self.data.close, period=self.params.rsi_period)
-        self.trade_count = 0
-        self.winning_trades = 0
-        self.losing_trades = 0
-
-    def next(self):
-        if not self.position:
-            # Buy signal: RSI below buy threshold
-            if self.rsi < self.params.rsi_buy:
-                self.buy(size=None)  # Buy with all available cash
-        else:
-            # Sell signal: RSI above sell threshold
-            if self.rsi > self.params.rsi_sell:
-                self.sell(size=self.position.size)
-
-    def notify_trade(self, trade):
-        if trade.isclosed:
-            self.trade_count += 1
-            if trade.pnl > 0:
-                self.winning_trades += 1
-            else:
-                self.losing_trades += 1
+def get_symbol_index():
+    global _symbol_index
+    with _symbol_index_lock:
+        if _symbol_index is None:
+            _symbol_index = SymbolIndex.from_csv(fallback=POPULAR_STOCKS, popular=POPULAR_STOCKS)
+        return _symbol_index
 
-def calculate_rsi(prices, window=14):
-    """Calculate RSI manually without TA-Lib"""
-    try:
-        delta = pd.Series(prices).diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=window).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=window).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return float(rsi.iloc[-1]) if not pd.isna(rsi.iloc[-1]) else 50.0
-    except:
-        return 50.0
+# After each session close, load the new daily bar for the popular universe
+# (or PREFETCH_SYMBOLS) and refresh its indicator state ahead of requests
+PREFETCH_ENABLED = os.environ.get("PREFETCH_ENABLED", "1") == "1"
+PREFETCH_SYMBOLS = [s.strip().upper() for s in os.environ.get("PREFETCH_SYMBOLS", "").split(",") if s.strip()]
 
-def calculate_macd(prices, fast=12, slow=26, signal=9):
-    """Calculate MACD manually without TA-Lib"""
-    try:
-        prices_series = pd.Series(prices)
-        exp1 = prices_series.ewm(span=fast).mean()
-        exp2 = prices_series.ewm(span=slow).mean()
-        macd = exp1 - exp2
-        return float(macd.iloc[-1]) if not pd.isna(macd.iloc[-1]) else 0.0
-    except:
-        return 0.0
-
-def calculate_stochastic(high, low, close, k_period=14, d_period=3):
-    """Calculate Stochastic Oscillator manually without TA-Lib"""
-    try:
-        high_series = pd.Series(high)
-        low_series = pd.Series(low)
-        close_series = pd.Series(close)
-        
-        lowest_low = low_series.rolling(window=k_period).min()
-        highest_high = high_series.rolling(window=k_period).max()
-        
-        k_percent = 100 * ((close_series - lowest_low) / (highest_high - lowest_low))
-        d_percent = k_percent.rolling(window=d_period).mean()
-        
-        k_val = float(k_percent.iloc[-1]) if not pd.isna(k_percent.iloc[-1]) else 50.0
-        d_val = float(d_percent.iloc[-1]) if not pd.isna(d_percent.iloc[-1]) else 50.0
-        
-        return k_val, d_val
-    except:
-        return 50.0, 50.0
+prefetch_scheduler = PrefetchScheduler(
+    PREFETCH_SYMBOLS or list(POPULAR_STOCKS),
+    load_bars_many,
+    refresh=indicator_states.indicators,
+    uncover=bar_store.uncover,
+    lookback=timedelta(days=STOCK_INFO_LOOKBACK_DAYS),
+)
 
-def calculate_support_resistance(df, window=20):
-    """Calculate support and resistance levels using pivot points"""
-    try:
-        high_prices = df['High'].rolling(window=window).max()
-        low_prices = df['Low'].rolling(window=window).min()
-        
-        # Recent support and resistance
-        recent_high = high_prices.iloc[-1] if len(high_prices) > 0 else df['Close'].iloc[-1]
-        recent_low = low_prices.iloc[-1] if len(low_prices) > 0 else df['Close'].iloc[-1]
-        
-        return recent_low, recent_high
-    except:
-        current_price = df['Close'].iloc[-1]
-        return current_price * 0.95, current_price * 1.05
+metrics.registry.add_collector(
+    "prefetch_symbols_total", "counter", "Symbols loaded or given up on by the after-close prefetch",
+    lambda: {('refreshed',): prefetch_scheduler.refreshed, ('failed',): prefetch_scheduler.failed},
+    ("outcome",),
+)
 
-def calculate_fibonacci_levels(df, periods=50):
-    """Calculate Fibonacci retracement levels"""
-    try:
-        recent_data = df.tail(periods)
-        high = recent_data['High'].max()
-        low = recent_data['Low'].min()
-        diff = high - low
-        
-        return {
-            'fib_236': high - (diff * 0.236),
-            'fib_382': high - (diff * 0.382),
-            'fib_500': high - (diff * 0.500),
-            'fib_618': high - (diff * 0.618),
-        }
-    except:
-        current_price = df['Close'].iloc[-1]
-        return {
-            'fib_236': current_price * 0.98,
-            'fib_382': current_price * 0.95,
-            'fib_500': current_price * 0.92,
-            'fib_618': current_price * 0.90,
-        }
+@app.on_event("startup")
+def start_prefetch():
+    if PREFETCH_ENABLED:
+        prefetch_scheduler.start()
 
-def calculate_technical_indicators(df):
-    """Calculate various technical indicators using manual calculations"""
-    try:
-        close_prices = df['Close'].values
-        high_prices = df['High'].values
-        low_prices = df['Low'].values
-        
-        # RSI
-        rsi = calculate_rsi(close_prices, window=14)
-        
-        # MACD
-        macd_value = calculate_macd(close_prices)
-        
-        # Stochastic
-        stoch_k, stoch_d = calculate_stochastic(high_prices, low_prices, close_prices)
-        
-        return {
-            'rsi': rsi,
-            'macd': macd_value,
-            'stochastic_k': stoch_k,
-            'stochastic_d': stoch_d,
-        }
-    except Exception as e:
-        print(f"Error calculating indicators: {e}")
-        return {
-            'rsi': 50.0,
-            'macd': 0.0,
-            'stochastic_k': 50.0,
-            'stochastic_d': 50.0,
-        }
+@app.on_event("shutdown")
+def stop_prefetch():
+    prefetch_scheduler.stop()
 
 def generate_sentiment_data(symbol, current_price, change_percent):
     """Generate mock sentiment data based on price movement"""
@@ -382,47 +796,23 @@ def generate_sentiment_data(symbol, current_price, change_percent):
 
 def search_stock_suggestions(query: str, limit: int = 10) -> List[StockSuggestion]:
     """Search for stock suggestions based on query"""
-    suggestions = []
     query_upper = query.upper().strip()
-    query_lower = query.lower().strip()
     
     if not query_upper:
         return []
     
-    # First, search by exact symbol match
-    for symbol, name in POPULAR_STOCKS.items():
-        if symbol == query_upper:
-            suggestions.append(StockSuggestion(
-                symbol=symbol,
-                company_name=name,
-                match_type="symbol"
-            ))
-    
-    # Then, search by symbol prefix
-    for symbol, name in POPULAR_STOCKS.items():
-        if symbol != query_upper and symbol.startswith(query_upper):
-            suggestions.append(StockSuggestion(
-                symbol=symbol,
-                company_name=name,
-                match_type="symbol"
-            ))
+    # Exact symbol, symbol prefix, then company name matches
+    index = get_symbol_index()
+    suggestions = [
+        StockSuggestion(symbol=symbol, company_name=name, match_type=match_type)
+        for symbol, name, match_type in index.search(query, limit=limit, fuzzy=False)
+    ]
     
-    # Then, search by company name
-    for symbol, name in POPULAR_STOCKS.items():
-        if (symbol not in [s.symbol for s in suggestions] and 
-            query_lower in name.lower()):
-            suggestions.append(StockSuggestion(
-                symbol=symbol,
-                company_name=name,
-                match_type="company"
-            ))
-    
-    # Try to validate with yfinance for unknown symbols
+    # Try to validate with the data provider for unknown symbols
     if len(suggestions) == 0 and len(query_upper) <= 5:
         try:
-            # Quick validation with yfinance
-            ticker = yf.Ticker(query_upper)
-            info = ticker.info
+            # Quick validation against the provider's metadata
+            info = metadata_cache.get(query_upper, fields=['longName'])
             if info and 'longName' in info:
                 suggestions.append(StockSuggestion(
                     symbol=query_upper,
@@ -432,206 +822,671 @@ def search_stock_suggestions(query: str, limit: int = 10) -> List[StockSuggestio
         except:
             pass  # If validation fails, just return empty list
     
+    # Pad with misspelt company name matches
+    if len(suggestions) < limit:
+        known = {s.symbol for s in suggestions}
+        suggestions.extend(
+            StockSuggestion(symbol=symbol, company_name=name, match_type=match_type)
+            for symbol, name, match_type in index.fuzzy_search(query, limit=limit)
+            if symbol not in known
+        )
+    
     return suggestions[:limit]
 
 @app.get("/")
 def read_root():
     return {"message": "Stock Analysis & Backtest API is running"}
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Prometheus text exposition of request, stage, upstream and cache metrics"""
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {"status": "healthy", "warmed_up": warmed_up.is_set(), "timestamp": datetime.now().isoformat()}
 
 @app.get("/stock-suggestions", response_model=List[StockSuggestion])
 def get_stock_suggestions(q: str = Query(..., min_length=1, description="Search query for stock symbols or company names")):
     """Get stock suggestions based on search query"""
     try:
-        suggestions = search_stock_suggestions(q, limit=10)
+        with stage('search'):
+            suggestions = search_stock_suggestions(q, limit=10)
         return suggestions
     except Exception as e:
         print(f"Error in stock suggestions: {str(e)}")
         # Return empty list instead of error to prevent Flutter app crashes
         return []
 
+def calculate_stock_levels(bars, indicators=None):
+    """Indicators, support/resistance and Fibonacci levels for one symbol's Bars
+
+    Pass precomputed rsi/macd/stochastic values as indicators to skip
+    recalculating them from the bars.
+    """
+    levels = compute_indicators(bars.high, bars.low, bars.close)
+    if indicators is not None:
+        levels.update(indicators)
+    return levels
+
+def analyst_rng(symbol, day):
+    """Random source for the mock analyst fields, fixed per symbol and trading day"""
+    return np.random.default_rng(zlib.crc32(f"{symbol}|{day:%Y-%m-%d}".encode()))
+
+def stock_info_version(bars, info):
+    """What a /stock-info snapshot depends on beyond (symbol, last bar date):
+    the last two bars, which may still be forming or revised, and the metadata
+    """
+    last_bars = b''.join(column[-2:].tobytes() for column in bars.columns())
+    return last_bars, json.dumps(info, sort_keys=True, default=str)
+
+def build_stock_info(symbol, bars, info, levels):
+    """Assemble a StockInfo from Bars, company metadata and computed levels"""
+    current_price = bars.close[-1]
+    previous_close = bars.close[-2] if len(bars) > 1 else current_price
+    change = current_price - previous_close
+    change_percent = (change / previous_close) * 100
+    
+    sentiment_data = generate_sentiment_data(symbol, current_price, change_percent)
+    rng = analyst_rng(symbol, pd.Timestamp(bars['Date'][-1]))
+    
+    return StockInfo(
+        symbol=symbol,
+        company_name=info.get('longName', f"{symbol} Corporation"),
+        sector=info.get('sector', 'Technology'),
+        current_price=float(current_price),
+        change=float(change),
+        change_percent=float(change_percent),
+        volume=int(bars.volume[-1]),
+        market_cap=float(info.get('marketCap', 0)),
+        pe_ratio=float(info.get('trailingPE', 0)) if info.get('trailingPE') else 0.0,
+        
+        # Technical levels
+        support_level=levels['support_level'],
+        resistance_level=levels['resistance_level'],
+        rsi=levels['rsi'],
+        macd=levels['macd'],
+        stochastic_k=levels['stochastic_k'],
+        stochastic_d=levels['stochastic_d'],
+        
+        # Fibonacci levels
+        fib_236=levels['fib_236'],
+        fib_382=levels['fib_382'],
+        fib_500=levels['fib_500'],
+        fib_618=levels['fib_618'],
+        
+        # Sentiment data
+        overall_sentiment=sentiment_data['overall_sentiment'],
+        sentiment_score=sentiment_data['sentiment_score'],
+        short_term_sentiment=sentiment_data['short_term_sentiment'],
+        short_term_score=sentiment_data['short_term_score'],
+        long_term_sentiment=sentiment_data['long_term_sentiment'],
+        long_term_score=sentiment_data['long_term_score'],
+        sentiment_factors=sentiment_data['sentiment_factors'],
+        
+        # Mock analyst data based on sentiment and price movement
+        analyst_buy=max(1, int(5 + (change_percent * 0.5) + rng.normal(0, 1))),
+        analyst_hold=max(1, int(3 + rng.normal(0, 0.5))),
+        analyst_sell=max(0, int(2 - (change_percent * 0.3) + rng.normal(0, 0.5))),
+        target_price=float(current_price * rng.uniform(1.05, 1.15)),
+    )
+
+def upstream_unavailable(e):
+    """503 for a request that needed upstream data we are not allowed to fetch right now"""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(upstream.max_wait))})
+
 @app.get("/stock-info/{symbol}", response_model=StockInfo)
-def get_stock_info(symbol: str):
+def get_stock_info(symbol: str, if_none_match: Optional[str] = Header(None)):
+    """StockInfo for one symbol, with an ETag; If-None-Match answers 304 when unchanged"""
     try:
         symbol = symbol.upper().strip()
         
         # Download recent stock data (last 3 months for analysis)
         end_date = datetime.now()
-        start_date = end_date - timedelta(days=90)
+        start_date = end_date - timedelta(days=STOCK_INFO_LOOKBACK_DAYS)
         
-        stock = yf.Ticker(symbol)
-        df = yf.download(symbol, start=start_date, end=end_date, progress=False)
+        with stage('bars'):
+            bars = load_bar_columns(symbol, start_date, end_date)
         
-        if df.empty:
+        if bars.empty:
             raise HTTPException(status_code=404, detail=f"Stock symbol '{symbol}' not found")
         
-        # Handle multi-level columns
-        if isinstance(df.columns, pd.MultiIndex):
-            df.columns = [col[0] if isinstance(col, tuple) else col for col in df.columns]
-        
         # Get stock info
-        info = stock.info
-        current_price = df['Close'].iloc[-1]
-        previous_close = df['Close'].iloc[-2] if len(df) > 1 else current_price
-        change = current_price - previous_close
-        change_percent = (change / previous_close) * 100
-        
-        # Calculate technical indicators
-        support, resistance = calculate_support_resistance(df)
-        fib_levels = calculate_fibonacci_levels(df)
-        tech_indicators = calculate_technical_indicators(df)
-        sentiment_data = generate_sentiment_data(symbol, current_price, change_percent)
+        with stage('metadata'):
+            info = metadata_cache.get(symbol) or {}
         
-        return StockInfo(
-            symbol=symbol,
-            company_name=info.get('longName', f"{symbol} Corporation"),
-            sector=info.get('sector', 'Technology'),
-            current_price=float(current_price),
-            change=float(change),
-            change_percent=float(change_percent),
-            volume=int(df['Volume'].iloc[-1]),
-            market_cap=float(info.get('marketCap', 0)),
-            pe_ratio=float(info.get('trailingPE', 0)) if info.get('trailingPE') else 0.0,
-            
-            # Technical levels
-            support_level=float(support),
-            resistance_level=float(resistance),
-            rsi=tech_indicators['rsi'],
-            macd=tech_indicators['macd'],
-            stochastic_k=tech_indicators['stochastic_k'],
-            stochastic_d=tech_indicators['stochastic_d'],
-            
-            # Fibonacci levels
-            fib_236=float(fib_levels['fib_236']),
-            fib_382=float(fib_levels['fib_382']),
-            fib_500=float(fib_levels['fib_500']),
-            fib_618=float(fib_levels['fib_618']),
-            
-            # Sentiment data
-            overall_sentiment=sentiment_data['overall_sentiment'],
-            sentiment_score=sentiment_data['sentiment_score'],
-            short_term_sentiment=sentiment_data['short_term_sentiment'],
-            short_term_score=sentiment_data['short_term_score'],
-            long_term_sentiment=sentiment_data['long_term_sentiment'],
-            long_term_score=sentiment_data['long_term_score'],
-            sentiment_factors=sentiment_data['sentiment_factors'],
+        # Reuse the serialized response while its inputs are unchanged
+        day = int(bars.dates[-1])
+        version = stock_info_version(bars, info)
+        snapshot = stock_info_snapshots.get(symbol, day, version)
+        if snapshot is None:
+            # Calculate technical indicators, refreshing RSI/MACD/stochastic
+            # incrementally from the persisted state
+            with stage('indicators'):
+                levels = calculate_stock_levels(bars, indicator_states.indicators(symbol, bars))
             
-            # Mock analyst data based on sentiment and price movement
-            analyst_buy=max(1, int(5 + (change_percent * 0.5) + np.random.normal(0, 1))),
-            analyst_hold=max(1, int(3 + np.random.normal(0, 0.5))),
-            analyst_sell=max(0, int(2 - (change_percent * 0.3) + np.random.normal(0, 0.5))),
-            target_price=float(current_price * np.random.uniform(1.05, 1.15)),
-        )
+            with stage('response_model'):
+                body = build_stock_info(symbol, bars, info, levels).json().encode()
+            snapshot = stock_info_snapshots.put(symbol, day, version, body)
+        
+        if etag_matches(if_none_match, snapshot.etag):
+            return Response(status_code=304, headers=snapshot.headers)
+        return Response(snapshot.body, media_type="application/json", headers=snapshot.headers)
         
     except HTTPException:
         raise
+    except UpstreamUnavailable as e:
+        raise upstream_unavailable(e)
     except Exception as e:
         print(f"Error fetching stock info: {str(e)}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Failed to fetch stock information: {str(e)}")
 
-@app.post("/backtest", response_model=BacktestResult)
-def run_backtest(data: StrategyInput):
+@app.get("/stock-info/{symbol}/indicators", response_model=IndicatorSeries)
+def get_indicator_series(symbol: str, days: int = Query(STOCK_INFO_LOOKBACK_DAYS, ge=1, le=MAX_SERIES_DAYS)):
+    """Full indicator series over the last ``days`` calendar days for charting"""
     try:
-        # Validate date range
-        start_dt = datetime.strptime(data.start_date, '%Y-%m-%d')
-        end_dt = datetime.strptime(data.end_date, '%Y-%m-%d')
+        symbol = symbol.upper().strip()
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days)
         
-        if start_dt >= end_dt:
-            raise HTTPException(status_code=400, detail="Start date must be before end date")
+        with stage('bars'):
+            bars = load_bar_columns(symbol, start_date, end_date)
+        if bars.empty:
+            raise HTTPException(status_code=404, detail=f"Stock symbol '{symbol}' not found")
+        
+        with stage('indicators'):
+            series = compute_indicators(bars.high, bars.low, bars.close, full=True)['series']
+        
+        # JSON has no NaN, so warm-up bars go out as null
+        with stage('response_model'):
+            return IndicatorSeries(
+                symbol=symbol,
+                dates=np.datetime_as_string(bars['Date'], unit='D').tolist(),
+                close=bars.close.tolist(),
+                **{name: [None if np.isnan(v) else float(v) for v in values]
+                   for name, values in series.items()}
+            )
         
-        if end_dt > datetime.now():
-            raise HTTPException(status_code=400, detail="End date cannot be in the future")
+    except HTTPException:
+        raise
+    except UpstreamUnavailable as e:
+        raise upstream_unavailable(e)
+    except Exception as e:
+        print(f"Error computing indicator series: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Failed to compute indicators: {str(e)}")
 
-        # Create Cerebro engine
-        cerebro = bt.Cerebro()
+@app.post("/stock-info/batch", response_model=List[StockInfo])
+def get_stock_info_batch(data: StockInfoBatchRequest):
+    """StockInfo for a watchlist with one bulk bar download and the /stock-info indicators"""
+    try:
+        symbols = list(dict.fromkeys(data.symbols))
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=STOCK_INFO_LOOKBACK_DAYS)
+        
+        with stage('bars'):
+            loaded = {symbol: Bars.from_frame(df) for symbol, df in load_bars_many(symbols, start_date, end_date).items()}
+        if not loaded:
+            raise HTTPException(status_code=404, detail="None of the requested symbols were found")
         
-        # Add strategy
-        cerebro.addstrategy(
-            RSIStrategy,
+        # Metadata lookups are independent, so fetch cache misses concurrently
+        with stage('metadata'), ThreadPoolExecutor(max_workers=METADATA_FETCH_WORKERS) as executor:
+            infos = dict(zip(loaded, executor.map(lambda s: metadata_cache.get(s) or {}, loaded)))
+        
+        with stage('indicators'):
+            levels = {symbol: calculate_stock_levels(bars, indicator_states.indicators(symbol, bars))
+                      for symbol, bars in loaded.items()}
+        
+        # Keep the caller's ordering; symbols without data are skipped
+        with stage('response_model'):
+            return [build_stock_info(symbol, loaded[symbol], infos[symbol], levels[symbol])
+                    for symbol in symbols if symbol in loaded]
+        
+    except HTTPException:
+        raise
+    except UpstreamUnavailable as e:
+        raise upstream_unavailable(e)
+    except Exception as e:
+        print(f"Error fetching batch stock info: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Failed to fetch stock information: {str(e)}")
+
+def compute_quotes(symbols):
+    """Price, daily change and RSI/MACD/stochastic for each symbol that has bars"""
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=STOCK_INFO_LOOKBACK_DAYS)
+    quotes = {}
+    for symbol, df in load_bars_many(symbols, start_date, end_date).items():
+        current_price = float(df['Close'].iloc[-1])
+        previous_close = float(df['Close'].iloc[-2]) if len(df) > 1 else current_price
+        change = current_price - previous_close
+        quotes[symbol] = {
+            'price': current_price,
+            'change': change,
+            'change_percent': change / previous_close * 100,
+            **indicator_states.indicators(symbol, df),
+        }
+    return quotes
+
+# Live quotes for /ws/quotes, computed once per symbol for all its subscribers
+quote_hub = QuoteHub(compute_quotes)
+
+metrics.registry.add_collector(
+    "quote_connections", "gauge", "Open /ws/quotes connections",
+    lambda: {(): quote_hub.connections},
+)
+metrics.registry.add_collector(
+    "quote_symbols", "gauge", "Symbols with at least one /ws/quotes subscriber",
+    lambda: {(): quote_hub.symbols},
+)
+metrics.registry.add_collector(
+    "quote_updates_total", "counter", "Quote refreshes that changed a symbol's pushed fields",
+    lambda: {(): quote_hub.updates},
+)
+metrics.registry.add_collector(
+    "quote_messages_total", "counter", "Messages queued for /ws/quotes clients, and those replaced before sending",
+    lambda: {('queued',): quote_hub.messages, ('superseded',): quote_hub.superseded},
+    ("outcome",),
+)
+
+@app.on_event("shutdown")
+async def stop_quote_hub():
+    await quote_hub.stop()
+
+@app.websocket("/ws/quotes")
+async def quotes_socket(websocket: WebSocket):
+    """Live quote deltas for subscribed symbols.
+
+    Clients send {"action": "subscribe" | "unsubscribe", "symbols": [...]}.
+    Each subscribed symbol first gets a "snapshot" message with every field,
+    then "quote" messages carrying only the fields that changed.
+    """
+    await websocket.accept()
+    subscriber = quote_hub.connect()
+
+    async def pump():
+        try:
+            while True:
+                for message in await subscriber.next_batch():
+                    await websocket.send_text(message)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+
+    sender = asyncio.create_task(pump())
+    try:
+        while True:
+            try:
+                request = json.loads(await websocket.receive_text())
+                action = request['action']
+                symbols = request['symbols']
+                # A bare string would otherwise subscribe to each of its letters
+                if not isinstance(symbols, list) or not all(isinstance(s, str) for s in symbols):
+                    raise TypeError("symbols must be a list of strings")
+                symbols = list(dict.fromkeys(s.upper().strip() for s in symbols))
+            except (ValueError, KeyError, TypeError):
+                subscriber.send_error('Expected {"action": "subscribe" or "unsubscribe", "symbols": ["AAPL", ...]}')
+                continue
+            if action == 'subscribe':
+                for symbol in quote_hub.subscribe(subscriber, symbols):
+                    subscriber.send_error(f"At most {quote_hub.max_symbols} symbols per connection", symbol)
+            elif action == 'unsubscribe':
+                quote_hub.unsubscribe(subscriber, symbols)
+            else:
+                subscriber.send_error(f"Unknown action '{action}'")
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        quote_hub.disconnect(subscriber)
+
+def load_backtest_bars(ticker, start_date, end_date):
+    """Validate a backtest date range and load its bars as Bars in BAR_PRICE_DTYPE"""
+    start_dt = datetime.strptime(start_date, '%Y-%m-%d')
+    end_dt = datetime.strptime(end_date, '%Y-%m-%d')
+    
+    if start_dt >= end_dt:
+        raise HTTPException(status_code=400, detail="Start date must be before end date")
+    
+    if end_dt > datetime.now():
+        raise HTTPException(status_code=400, detail="End date cannot be in the future")
+
+    # Download stock data
+    try:
+        bars = load_bar_columns(ticker, start_date, end_date, dtype=BAR_PRICE_DTYPE)
+    except UpstreamUnavailable as e:
+        raise upstream_unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to download data for {ticker}: {str(e)}")
+
+    if bars.empty:
+        raise HTTPException(status_code=404, detail=f"No data found for {ticker} in the specified date range")
+
+    return bars
+
+def load_cached_backtest(kind, params, ticker, start_date, end_date):
+    """Load a backtest's bars and look up its result; returns (bars, cache key, result or None)"""
+    bars = load_backtest_bars(ticker, start_date, end_date)
+    key = result_key(kind, params, fingerprint_bars(bars))
+    return bars, key, result_cache.get(key)
+
+@app.post("/backtest", response_model=BacktestResult)
+async def run_backtest(data: StrategyInput):
+    try:
+        with stage('bars'):
+            bars, key, result = await run_in_threadpool(
+                load_cached_backtest, 'backtest', data.dict(), data.ticker, data.start_date, data.end_date
+            )
+        if result is not None:
+            return BacktestResult(**result)
+
+        # Run backtest
+        with stage('backtest'):
+            result = await backtest_pool.run(
+                run_backtest_engine,
+                bars,
+                engine=data.engine,
+                rsi_period=data.rsi_period,
+                rsi_buy=data.rsi_buy,
+                rsi_sell=data.rsi_sell,
+                initial_cash=data.initial_cash,
+                sizer=data.sizer
+            )
+        with stage('cache_write'):
+            await run_in_threadpool(result_cache.put, key, result)
+
+        return BacktestResult(**result)
+
+    except HTTPException:
+        raise
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except BacktestTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        print(f"Unexpected error: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+STREAM_MEDIA_TYPES = {'ndjson': 'application/x-ndjson', 'sse': 'text/event-stream'}
+
+def encode_stream_event(event, fmt):
+    """One event as an NDJSON line or a Server-Sent Events message"""
+    payload = json.dumps(event)
+    if fmt == 'sse':
+        return f"event: {event['type']}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+@app.post("/backtest/stream")
+async def stream_backtest(data: StrategyInput,
+                          fmt: str = Query("ndjson", alias="format", description="ndjson or sse")):
+    """Run a backtest, streaming equity points and closed trades, then a summary record"""
+    if fmt not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Format must be one of: ndjson, sse")
+    try:
+        bars, key, _ = await run_in_threadpool(
+            load_cached_backtest, 'backtest', data.dict(), data.ticker, data.start_date, data.end_date
+        )
+        stream = backtest_pool.stream(
+            run_backtest_engine,
+            bars,
+            engine=data.engine,
             rsi_period=data.rsi_period,
             rsi_buy=data.rsi_buy,
-            rsi_sell=data.rsi_sell
+            rsi_sell=data.rsi_sell,
+            initial_cash=data.initial_cash,
+            sizer=data.sizer
         )
+    except HTTPException:
+        raise
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        print(f"Unexpected error: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-        # Download stock data
+    async def events():
+        # The status line is already sent, so failures become an error record
         try:
-            df = yf.download(data.ticker, start=data.start_date, end=data.end_date, progress=False)
+            async for event in stream.events():
+                yield encode_stream_event(event, fmt)
+            await run_in_threadpool(result_cache.put, key, stream.result)
+            yield encode_stream_event({'type': 'summary', **BacktestResult(**stream.result).dict()}, fmt)
+        except BacktestTimeout as e:
+            yield encode_stream_event({'type': 'error', 'detail': str(e)}, fmt)
         except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Failed to download data for {data.ticker}: {str(e)}")
-
-        # Handle multi-level columns if present
-        if isinstance(df.columns, pd.MultiIndex):
-            df.columns = [col[0] if isinstance(col, tuple) else col for col in df.columns]
-
-        if df is None or df.empty:
-            raise HTTPException(status_code=404, detail=f"No data found for {data.ticker} in the specified date range")
-
-        # Reset index to make Date a column
-        df.reset_index(inplace=True)
-
-        # Ensure required columns exist
-        required_columns = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise HTTPException(status_code=400, detail=f"Missing required columns: {missing_columns}")
-
-        # Create data feed
-        data_feed = bt.feeds.PandasData(
-            dataname=df,
-            datetime='Date',
-            open='Open',
-            high='High',
-            low='Low',
-            close='Close',
-            volume='Volume',
-            openinterest=None
+            print(f"Error streaming backtest: {str(e)}")
+            print(traceback.format_exc())
+            yield encode_stream_event({'type': 'error', 'detail': f"Internal server error: {str(e)}"}, fmt)
+
+    return StreamingResponse(events(), media_type=STREAM_MEDIA_TYPES[fmt])
+
+@app.post("/backtest/sweep", response_model=SweepResult)
+async def run_backtest_sweep(data: SweepInput):
+    """Backtest every RSI period / threshold combination and rank the results"""
+    try:
+        periods = data.rsi_period.values()
+        pairs = [(buy, sell) for buy in data.rsi_buy.values()
+                 for sell in data.rsi_sell.values() if sell > buy]
+        combinations = len(periods) * len(pairs)
+
+        if combinations == 0:
+            raise HTTPException(status_code=400, detail="No valid combinations: sell thresholds must exceed buy thresholds")
+        if combinations > MAX_SWEEP_COMBINATIONS:
+            raise HTTPException(status_code=400, detail=f"Sweep has {combinations} combinations, maximum is {MAX_SWEEP_COMBINATIONS}")
+
+        # Bars are loaded once for the whole sweep; ranking options do not change the rows
+        with stage('bars'):
+            bars, key, rows = await run_in_threadpool(
+                load_cached_backtest, 'sweep', data.dict(exclude={'sort_by', 'top_n'}),
+                data.ticker, data.start_date, data.end_date
+            )
+        if rows is None:
+            with stage('backtest'):
+                rows = await backtest_pool.run(
+                    run_rsi_sweep,
+                    bars,
+                    rsi_periods=periods,
+                    threshold_pairs=pairs,
+                    initial_cash=data.initial_cash,
+                    sizer=data.sizer
+                )
+            with stage('cache_write'):
+                await run_in_threadpool(result_cache.put, key, rows)
+
+        # rows may be the cache's shared list, so rank a copy
+        rows = sorted(rows, key=lambda row: row[data.sort_by], reverse=data.sort_by != 'max_drawdown')
+
+        return SweepResult(
+            ticker=data.ticker,
+            combinations=combinations,
+            results=[SweepResultRow(**row) for row in rows[:data.top_n]]
         )
 
-        cerebro.adddata(data_feed)
-        
-        # Set initial cash
-        cerebro.broker.set_cash(data.initial_cash)
-        initial_value = cerebro.broker.getvalue()
+    except HTTPException:
+        raise
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except BacktestTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        print(f"Unexpected error: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-        # Add analyzers
-        cerebro.addanalyzer(bt.analyzers.TradeAnalyzer, _name="trades")
-        cerebro.addanalyzer(bt.analyzers.DrawDown, _name="drawdown")
+@app.post("/backtest/walk-forward", response_model=WalkForwardResult)
+async def run_backtest_walk_forward(data: WalkForwardInput):
+    """Optimize on rolling or anchored train windows and backtest each following test window"""
+    try:
+        pairs = [(buy, sell) for buy in data.rsi_buy.values()
+                 for sell in data.rsi_sell.values() if sell > buy]
+        if not pairs:
+            raise HTTPException(status_code=400, detail="No valid combinations: sell thresholds must exceed buy thresholds")
+        if len(pairs) > MAX_SWEEP_COMBINATIONS:
+            raise HTTPException(status_code=400, detail=f"Walk-forward has {len(pairs)} threshold pairs, maximum is {MAX_SWEEP_COMBINATIONS}")
 
-        # Run backtest
-        results = cerebro.run()
-        final_value = cerebro.broker.getvalue()
+        # Bars are loaded once for every window
+        with stage('bars'):
+            bars, key, result = await run_in_threadpool(
+                load_cached_backtest, 'walk_forward', data.dict(), data.ticker, data.start_date, data.end_date
+            )
+        if result is None:
+            windows = walk_forward_windows(bars['Date'], data.train_months, data.test_months,
+                                             data.step_months, anchored=data.anchored)
+            if not windows:
+                raise HTTPException(status_code=400, detail="Date range is too short for one train and test window")
+            if len(windows) > MAX_WALK_FORWARD_WINDOWS:
+                raise HTTPException(status_code=400, detail=f"Walk-forward has {len(windows)} windows, maximum is {MAX_WALK_FORWARD_WINDOWS}")
 
-        # Extract strategy and analyzers
-        strategy = results[0]
-        trade_analyzer = strategy.analyzers.trades.get_analysis()
-        drawdown_analyzer = strategy.analyzers.drawdown.get_analysis()
+            # Spread the windows over the pool's workers in contiguous chunks
+            jobs = min(backtest_pool.workers, -(-len(windows) // WALK_FORWARD_WINDOWS_PER_JOB))
+            chunk = -(-len(windows) // jobs)
+            with stage('backtest'):
+                chunks = await backtest_pool.run_all(
+                    [(run_walk_forward, dict(windows=windows[i:i + chunk],
+                                             rsi_period=data.rsi_period,
+                                             threshold_pairs=pairs,
+                                             optimize_by=data.optimize_by,
+                                             initial_cash=data.initial_cash))
+                     for i in range(0, len(windows), chunk)],
+                    bars
+                )
+            rows = [row for rows in chunks for row in rows]
+            result = {'summary': summarize_walk_forward(rows), 'windows': rows}
+            with stage('cache_write'):
+                await run_in_threadpool(result_cache.put, key, result)
 
-        # Calculate metrics
-        total_return = final_value - initial_value
-        total_return_pct = (total_return / initial_value) * 100
-        
-        total_trades = trade_analyzer.get('total', {}).get('total', 0)
-        won_trades = trade_analyzer.get('won', {}).get('total', 0)
-        lost_trades = trade_analyzer.get('lost', {}).get('total', 0)
-        win_rate = (won_trades / total_trades * 100) if total_trades > 0 else 0
-        max_drawdown = drawdown_analyzer.get('max', {}).get('drawdown', 0)
-
-        return BacktestResult(
-            final_value=round(final_value, 2),
-            initial_value=round(initial_value, 2),
-            total_return=round(total_return, 2),
-            total_return_pct=round(total_return_pct, 2),
-            total_trades=total_trades,
-            winning_trades=won_trades,
-            losing_trades=lost_trades,
-            win_rate=round(win_rate, 2),
-            max_drawdown=round(max_drawdown, 2)
+        return WalkForwardResult(ticker=data.ticker, **result)
+
+    except HTTPException:
+        raise
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except BacktestTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        print(f"Unexpected error: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.post("/backtest/montecarlo", response_model=MonteCarloResult)
+async def run_backtest_monte_carlo(data: MonteCarloInput):
+    """Distributions of RSIStrategy results over resampled prices, trade orders and trading costs"""
+    try:
+        # A drawn seed could never be asked for again, so only seeded runs
+        # are cached
+        seed = data.seed if data.seed is not None else secrets.randbits(32)
+        with stage('bars'):
+            if data.seed is None:
+                bars = await run_in_threadpool(load_backtest_bars, data.ticker, data.start_date, data.end_date)
+                key = result = None
+            else:
+                bars, key, result = await run_in_threadpool(
+                    load_cached_backtest, 'montecarlo', data.dict(), data.ticker, data.start_date, data.end_date
+                )
+        if result is None:
+            strategy = dict(rsi_period=data.rsi_period, rsi_buy=data.rsi_buy, rsi_sell=data.rsi_sell,
+                            initial_cash=data.initial_cash)
+            options = dict(block_size=data.block_size, slippage_bps=data.slippage_bps,
+                           commission_pct=data.commission_pct)
+
+            # Bootstrap paths are spread over the pool's workers; the
+            # vectorized trade methods each take one job
+            calls = [(run_backtest_engine, dict(engine='vectorized', sizer='all_in', **strategy))]
+            jobs = {}
+            for method in data.methods:
+                if method == 'bootstrap':
+                    count = min(backtest_pool.workers, max(1, data.simulations // MONTE_CARLO_MIN_PATHS_PER_JOB))
+                    chunk = -(-data.simulations // count)
+                    splits = [(first, min(chunk, data.simulations - first)) for first in range(0, data.simulations, chunk)]
+                else:
+                    splits = [(0, data.simulations)]
+                jobs[method] = len(splits)
+                calls.extend((run_monte_carlo, dict(method=method, simulations=n, seed=seed, first=first,
+                                                    **strategy, **options))
+                             for first, n in splits)
+
+            with stage('backtest'):
+                baseline, *chunks = await backtest_pool.run_all(calls, bars)
+
+            chunks = iter(chunks)
+            methods = {}
+            for method, count in jobs.items():
+                samples = {'final_value': [], 'max_drawdown': [], 'win_rate': []}
+                for _ in range(count):
+                    for name, values in next(chunks).items():
+                        samples[name].extend(values)
+                methods[method] = summarize_monte_carlo(samples, data.initial_cash)
+
+            result = {'seed': seed, 'baseline': baseline, 'methods': methods}
+            if key is not None:
+                with stage('cache_write'):
+                    await run_in_threadpool(result_cache.put, key, result)
+
+        return MonteCarloResult(ticker=data.ticker, **result)
+
+    except HTTPException:
+        raise
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except BacktestTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        print(f"Unexpected error: {str(e)}")
+        print(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+def load_portfolio_backtest(data):
+    """Load and align a portfolio's bars, then run the backtest"""
+    start_dt = datetime.strptime(data.start_date, '%Y-%m-%d')
+    end_dt = datetime.strptime(data.end_date, '%Y-%m-%d')
+    
+    if start_dt >= end_dt:
+        raise HTTPException(status_code=400, detail="Start date must be before end date")
+    
+    if end_dt > datetime.now():
+        raise HTTPException(status_code=400, detail="End date cannot be in the future")
+    
+    symbols = [asset.symbol for asset in data.assets]
+    try:
+        with stage('bars'):
+            frames = load_bars_many(symbols, data.start_date, data.end_date)
+    except UpstreamUnavailable as e:
+        raise upstream_unavailable(e)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Failed to download data: {str(e)}")
+    
+    missing = [symbol for symbol in symbols if symbol not in frames]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"No data found for {', '.join(missing)} in the specified date range")
+    
+    with stage('backtest'):
+        dates, open_, close = align_bars({symbol: frames[symbol] for symbol in symbols})
+        result = run_portfolio_backtest(
+            dates, open_, close,
+            weights=[asset.weight for asset in data.assets],
+            rsi_period=data.rsi_period,
+            rsi_buy=data.rsi_buy,
+            rsi_sell=data.rsi_sell,
+            initial_cash=data.initial_cash,
+            rebalance=data.rebalance
         )
+    
+    for symbol, asset in zip(symbols, result['assets']):
+        asset['symbol'] = symbol
+    result['equity_curve'] = [
+        {'date': date, 'value': round(float(value), 2)}
+        for date, value in zip(dates.strftime('%Y-%m-%d'), result['equity_curve'])
+    ]
+    return result
 
+@app.post("/backtest/portfolio", response_model=PortfolioBacktestResult)
+def run_portfolio(data: PortfolioBacktestInput):
+    """Backtest RSIStrategy across a weighted multi-symbol portfolio on one shared clock"""
+    try:
+        return PortfolioBacktestResult(**load_portfolio_backtest(data))
+    
     except HTTPException:
         raise
     except Exception as e:
@@ -639,6 +1494,47 @@ def run_backtest(data: StrategyInput):
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+# Long backtests run as jobs the client polls, instead of holding the request open
+backtest_jobs = BacktestJobQueue(backtest_pool, load_cached_backtest, result_cache)
+
+def job_status(job):
+    bars_processed, total_bars = job.progress()
+    return BacktestJobStatus(
+        job_id=job.id,
+        status=job.status,
+        progress=JobProgress(bars_processed=bars_processed, total_bars=total_bars),
+        created_at=datetime.fromtimestamp(job.created_at).isoformat(),
+        finished_at=datetime.fromtimestamp(job.finished_at).isoformat() if job.finished_at else None,
+        result=BacktestResult(**job.result) if job.result else None,
+        error=job.error,
+    )
+
+@app.post("/backtest/jobs", response_model=BacktestJobStatus, status_code=202)
+def submit_backtest_job(data: StrategyInput):
+    """Queue a backtest and return its job id immediately"""
+    try:
+        return job_status(backtest_jobs.submit(data))
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/backtest/jobs/{job_id}", response_model=BacktestJobStatus)
+def get_backtest_job(job_id: str):
+    """Report a job's status, progress and, once finished, its result"""
+    job = backtest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Backtest job '{job_id}' not found")
+    return job_status(job)
+
+@app.delete("/backtest/jobs/{job_id}", response_model=BacktestJobStatus)
+def cancel_backtest_job(job_id: str):
+    """Cancel a queued or running backtest job"""
+    job = backtest_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Backtest job '{job_id}' not found")
+    return job_status(job)
+
+startup_seconds['import'] = time.perf_counter() - IMPORT_STARTED
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+
+# How long each Ticker.info field stays fresh, in seconds
+FIELD_TTLS = {
+    'longName': 24 * 3600,
+    'sector': 24 * 3600,
+    'marketCap': 15 * 60,
+    'trailingPE': 60 * 60,
+}
+
+# Past its TTL a field may still be served for this long while a refresh runs
+STALE_TTL = 24 * 3600
+
+# Symbols whose info had no longName are remembered as misses for this long
+NEGATIVE_TTL = 60 * 60
+
+
+class _Entry:
+    __slots__ = ('fields', 'fetched_at', 'negative')
+
+    def __init__(self, fields, fetched_at, negative):
+        self.fields = fields
+        self.fetched_at = fetched_at
+        self.negative = negative
+
+
+class MetadataCache:
+    """Bounded LRU cache of company metadata with per-field TTLs.
+
+    Only the fields listed in ``field_ttls`` are kept. A lookup whose fields
+    are all fresh is served from memory; if any field is past its TTL but
+    still inside the stale window the cached values are returned and a single
+    background refresh is started (stale-while-revalidate). Symbols whose info
+    carried no ``longName`` are negatively cached so typos stop hitting Yahoo.
+    If a fetch fails with one of ``serve_stale_on``, any expired entry is
+    served rather than the error.
+    """
+
+    def __init__(self, loader, max_entries=2048, field_ttls=FIELD_TTLS,
+                 stale_ttl=STALE_TTL, negative_ttl=NEGATIVE_TTL, clock=time.monotonic, serve_stale_on=()):
+        self.loader = loader
+        self.serve_stale_on = tuple(serve_stale_on)
+        self.stale = 0
+        self.max_entries = max_entries
+        self.field_ttls = field_ttls
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, symbol, fields=None):
+        """Return a dict of cached fields for symbol, or None for unknown symbols"""
+        fields = fields or list(self.field_ttls)
+        now = self.clock()
+
+        with self._lock:
+            entry = self._entries.get(symbol)
+            if entry is not None:
+                self._entries.move_to_end(symbol)
+                age = now - entry.fetched_at
+                if entry.negative:
+                    if age < self.negative_ttl:
+                        self.hits += 1
+                        return None
+                else:
+                    ttl = min(self.field_ttls.get(f, self.stale_ttl) for f in fields)
+                    if age < ttl:
+                        self.hits += 1
+                        return dict(entry.fields)
+                    if age < ttl + self.stale_ttl:
+                        self.hits += 1
+                        self._refresh_in_background(symbol)
+                        return dict(entry.fields)
+            self.misses += 1
+
+        try:
+            entry = self._fetch(symbol)
+        except self.serve_stale_on:
+            # Past even the stale window, an old answer still beats none
+            if entry is None:
+                raise
+            with self._lock:
+                self.stale += 1
+        return None if entry.negative else dict(entry.fields)
+
+    def invalidate(self, symbol):
+        with self._lock:
+            self._entries.pop(symbol, None)
+
+    def _fetch(self, symbol):
+        info = self.loader(symbol) or {}
+        negative = not info.get('longName')
+        fields = {} if negative else {f: info.get(f) for f in self.field_ttls if f in info}
+        entry = _Entry(fields, self.clock(), negative)
+
+        with self._lock:
+            self._entries[symbol] = entry
+            self._entries.move_to_end(symbol)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _refresh_in_background(self, symbol):
+        # Called with the lock held; at most one refresh per symbol at a time
+        if symbol in self._refreshing:
+            return
+        self._refreshing.add(symbol)
+        threading.Thread(target=self._refresh, args=(symbol,), daemon=True).start()
+
+    def _refresh(self, symbol):
+        try:
+            self._fetch(symbol)
+        except Exception as e:
+            print(f"Error refreshing metadata for {symbol}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(symbol)
@@ -0,0 +1,266 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Latency buckets in seconds, from cache hits up to long backtests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """The child for these label values, created on first use"""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, values))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def render(self, name, labelnames, values):
+        return [f"{name}{_format_labels(labelnames, values)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def render(self, name, labelnames, values):
+        with self.lock:
+            counts, total = list(self.counts), self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            labels = _format_labels(labelnames, values, [('le', _format_value(bound))])
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(labelnames, values)
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+class Registry:
+    """Metrics plus collectors that read counters kept elsewhere at scrape time"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, name, kind, documentation, collect, labelnames=()):
+        """Expose values read by collect() -> {label values tuple: number} on each scrape"""
+        with self._lock:
+            self._collectors.append((name, kind, documentation, collect, tuple(labelnames)))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, kind, documentation, collect, labelnames in self._collectors:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for values, value in sorted(collect().items()):
+                lines.append(f"{name}{_format_labels(labelnames, values)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+STAGE_SECONDS = registry.histogram(
+    "stage_duration_seconds", "Time spent in each stage of a request", ("route", "stage"))
+UPSTREAM_CALLS = registry.counter(
+    "upstream_calls_total", "Calls made to the market data provider", ("call", "outcome"))
+UPSTREAM_SECONDS = registry.histogram(
+    "upstream_call_duration_seconds", "Market data provider call latency", ("call",))
+
+# The request being served and the time its stages have used so far
+_current = ContextVar("metrics_request", default=None)
+
+
+class _RequestStages:
+    __slots__ = ('scope', 'accounted', 'depth')
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.accounted = 0.0
+        self.depth = 0
+
+    @property
+    def route(self):
+        return route_of(self.scope)
+
+
+def route_of(scope):
+    """Route template of a request (not its raw path, which is unbounded)"""
+    route = scope.get('route')
+    return getattr(route, 'path', None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each HTTP request by method, route and status.
+
+    Whatever part of a request no stage() claimed - routing, request
+    validation and response serialization - is recorded as the 'framework'
+    stage.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        stages = _RequestStages(scope)
+        token = _current.set(stages)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            route = stages.route
+            REQUEST_SECONDS.labels(scope['method'], route, str(status)).observe(elapsed)
+            STAGE_SECONDS.labels(route, "framework").observe(max(elapsed - stages.accounted, 0.0))
+
+
+@contextmanager
+def stage(name):
+    """Time a block as one stage of the current request.
+
+    Nested stages are recorded too, but only the outermost counts towards
+    the time subtracted from the request's 'framework' remainder.
+    """
+    stages = _current.get()
+    route = stages.route if stages is not None else "background"
+    if stages is not None:
+        stages.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(route, name).observe(elapsed)
+        if stages is not None:
+            stages.depth -= 1
+            if stages.depth == 0:
+                stages.accounted += elapsed
+
+
+def instrument_upstream(call, fn):
+    """Wrap an upstream fetch so every call is counted and timed"""
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            result = fn(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            UPSTREAM_SECONDS.labels(call).observe(time.perf_counter() - start)
+            UPSTREAM_CALLS.labels(call, outcome).inc()
+    wrapper.__name__ = getattr(fn, '__name__', call)
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
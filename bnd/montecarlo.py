@@ -0,0 +1,193 @@
+import numpy as np
+
+from backtest_engine import rsi_sma, simulate_rsi_strategy, summarize_simulation
+
+MONTE_CARLO_METHODS = ("bootstrap", "trades", "costs")
+
+# Bootstrapped paths simulated per progress report
+_PROGRESS_EVERY = 25
+
+
+def _samples(final_value, max_drawdown, win_rate):
+    return {
+        'final_value': np.asarray(final_value, dtype=np.float64).tolist(),
+        'max_drawdown': np.asarray(max_drawdown, dtype=np.float64).tolist(),
+        'win_rate': np.asarray(win_rate, dtype=np.float64).tolist(),
+    }
+
+
+def bootstrap_paths(open_, close, block_size, rngs):
+    """Resample a price path with a moving block bootstrap.
+
+    Each bar contributes its close-to-close return and its opening gap
+    (open over the previous close); blocks of block_size consecutive bars
+    are drawn with replacement and chained from the first bar, which keeps
+    short-range autocorrelation and the open/close relationship intact.
+    Each path draws from its own generator in rngs. Returns (open, close)
+    arrays of shape (bars, paths).
+    """
+    n, simulations = close.size, len(rngs)
+    if n < 2:
+        return np.repeat(open_[:, None], simulations, axis=1), np.repeat(close[:, None], simulations, axis=1)
+    returns = close[1:] / close[:-1]
+    gaps = open_[1:] / close[:-1]
+    block_size = min(block_size, n - 1)
+    blocks = -(-(n - 1) // block_size)
+    starts = np.stack([rng.integers(0, n - block_size, size=blocks) for rng in rngs])
+    idx = (starts[:, :, None] + np.arange(block_size)).reshape(simulations, -1)[:, :n - 1].T
+
+    paths_close = np.empty((n, simulations))
+    paths_close[0] = close[0]
+    np.cumprod(returns[idx], axis=0, out=paths_close[1:])
+    paths_close[1:] *= close[0]
+    paths_open = np.empty((n, simulations))
+    paths_open[0] = open_[0]
+    paths_open[1:] = paths_close[:-1] * gaps[idx]
+    return paths_open, paths_close
+
+
+def run_bootstrap(open_, close, rngs, rsi_period, rsi_buy, rsi_sell, initial_cash, block_size, progress=None):
+    """RSIStrategy over block-bootstrapped price paths, one per generator in rngs"""
+    simulations = len(rngs)
+    paths_open, paths_close = bootstrap_paths(open_, close, block_size, rngs)
+    rsi = rsi_sma(paths_close, rsi_period)
+    final_value = np.empty(simulations)
+    max_drawdown = np.empty(simulations)
+    win_rate = np.empty(simulations)
+    for j in range(simulations):
+        if progress is not None and j % _PROGRESS_EVERY == 0:
+            progress(j, simulations)
+        sim = simulate_rsi_strategy(paths_open[:, j], paths_close[:, j], rsi[:, j], rsi_buy, rsi_sell, initial_cash,
+                                    sizer="all_in")
+        row = summarize_simulation(sim, initial_cash)
+        final_value[j] = sim.final_value
+        max_drawdown[j] = row['max_drawdown']
+        win_rate[j] = row['win_rate']
+    return _samples(final_value, max_drawdown, win_rate)
+
+
+def trade_legs(sim, close):
+    """(signal close, entry price, exit price) per trade, the open one marked at the last close.
+
+    Buys are sized all-in on the signal bar's close, so a trade's return on
+    the account is (exit - entry) / signal close.
+    """
+    legs = [(close[entry - 1], entry_price, exit_price)
+            for entry, _, _, entry_price, exit_price, _ in sim.trades]
+    if sim.open_trade is not None:
+        entry, _, entry_price = sim.open_trade
+        legs.append((close[entry - 1], entry_price, close[-1]))
+    return np.array(legs, dtype=np.float64).reshape(-1, 3)
+
+
+def compound(factors, initial_cash, closed):
+    """Final value, max drawdown (%) and win rate (%) of per-trade equity factors.
+
+    factors has one row per simulation; the last column is the still-open
+    trade when closed is one less than the number of columns. Drawdown is
+    measured on the equity after each trade.
+    """
+    simulations = factors.shape[0]
+    equity = initial_cash * np.cumprod(factors, axis=1)
+    final_value = equity[:, -1] if equity.shape[1] else np.full(simulations, float(initial_cash))
+    peak = np.maximum.accumulate(np.maximum(equity, initial_cash), axis=1)
+    max_drawdown = (100.0 * (peak - equity) / peak).max(axis=1, initial=0.0)
+    # As TradeAnalyzer: an open position counts towards the total, not the wins
+    total = factors.shape[1]
+    wins = (factors[:, :closed] >= 1.0).sum(axis=1)
+    win_rate = 100.0 * wins / total if total else np.zeros(simulations)
+    return _samples(final_value, max_drawdown, win_rate)
+
+
+def run_trade_shuffle(legs, closed, simulations, rng, initial_cash):
+    """The baseline's closed trades replayed in random orders.
+
+    Final value and win rate do not depend on the order, so this is a view
+    on how deep the drawdowns of the same trades could have been.
+    """
+    signal, entry, exit_ = legs.T
+    factors = np.broadcast_to(1.0 + (exit_ - entry) / signal, (simulations, legs.shape[0])).copy()
+    if closed > 1:
+        order = np.argsort(rng.random((simulations, closed)), axis=1)
+        factors[:, :closed] = np.take_along_axis(factors[:, :closed], order, axis=1)
+    return compound(factors, initial_cash, closed)
+
+
+def run_random_costs(legs, closed, simulations, rng, initial_cash, slippage_bps, commission_pct):
+    """The baseline's trades with random slippage and commission.
+
+    Every fill slips against the trade by a uniform draw of up to
+    slippage_bps, and each simulation pays one commission rate, drawn up to
+    commission_pct, on both legs' notional. Signals and sizes are kept
+    from the baseline.
+    """
+    signal, entry, exit_ = legs.T
+    k = legs.shape[0]
+    slippage = slippage_bps / 1e4
+    entry = entry * (1.0 + rng.uniform(0.0, slippage, (simulations, k)))
+    exit_ = exit_ * (1.0 - rng.uniform(0.0, slippage, (simulations, k)))
+    commission = rng.uniform(0.0, commission_pct / 100.0, (simulations, 1))
+    factors = 1.0 + (exit_ - entry - commission * (entry + exit_)) / signal
+    return compound(factors, initial_cash, closed)
+
+
+def method_rng(seed, method, *key):
+    """Generator for one method (and optionally one simulation) of a seeded run"""
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(MONTE_CARLO_METHODS.index(method),) + key))
+
+
+def run_monte_carlo(bars, method, simulations, seed, rsi_period, rsi_buy, rsi_sell, initial_cash,
+                    block_size=20, slippage_bps=10.0, commission_pct=0.1, first=0, progress=None):
+    """Sample one robustness method; returns per-simulation final_value, max_drawdown and win_rate.
+
+    Bootstrap paths first to first + simulations each get their own
+    generator from seed, so a run split into chunks over several jobs draws
+    the same paths however it is split. The trade-based methods are
+    vectorized and run in one job.
+    """
+    if method not in MONTE_CARLO_METHODS:
+        raise ValueError(f"Unknown Monte Carlo method {method!r}")
+    open_ = np.asarray(bars['Open'], dtype=np.float64)
+    close = np.asarray(bars['Close'], dtype=np.float64)
+    if method == "bootstrap":
+        rngs = [method_rng(seed, method, j) for j in range(first, first + simulations)]
+        return run_bootstrap(open_, close, rngs, rsi_period, rsi_buy, rsi_sell, initial_cash,
+                             block_size, progress=progress)
+
+    rng = method_rng(seed, method)
+    sim = simulate_rsi_strategy(open_, close, rsi_sma(close, rsi_period), rsi_buy, rsi_sell, initial_cash,
+                                sizer="all_in")
+    legs = trade_legs(sim, close)
+    if method == "trades":
+        return run_trade_shuffle(legs, len(sim.trades), simulations, rng, initial_cash)
+    return run_random_costs(legs, len(sim.trades), simulations, rng, initial_cash, slippage_bps, commission_pct)
+
+
+def describe(values):
+    """Summary statistics of a sample"""
+    values = np.asarray(values, dtype=np.float64)
+    p5, p25, p50, p75, p95 = np.percentile(values, [5, 25, 50, 75, 95])
+    return {
+        'mean': round(float(values.mean()), 2),
+        'std': round(float(values.std()), 2),
+        'min': round(float(values.min()), 2),
+        'p5': round(float(p5), 2),
+        'p25': round(float(p25), 2),
+        'median': round(float(p50), 2),
+        'p75': round(float(p75), 2),
+        'p95': round(float(p95), 2),
+        'max': round(float(values.max()), 2),
+    }
+
+
+def summarize_monte_carlo(samples, initial_cash):
+    """Distributions of one method's samples, merged from however many jobs ran them"""
+    final_value = np.asarray(samples['final_value'])
+    return {
+        'simulations': int(final_value.size),
+        'final_value': describe(final_value),
+        'total_return_pct': describe((final_value - initial_cash) / initial_cash * 100),
+        'max_drawdown': describe(samples['max_drawdown']),
+        'win_rate': describe(samples['win_rate']),
+        'loss_probability': round(float((final_value < initial_cash).mean() * 100), 2),
+    }
@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+
+from backtest_engine import max_drawdown_pct, rsi_sma, summarize_backtest
+
+REBALANCE_FREQUENCIES = ("none", "monthly", "quarterly", "yearly")
+_PERIOD_CODES = {"monthly": "M", "quarterly": "Q", "yearly": "Y"}
+
+TRADING_DAYS = 252
+
+
+def align_bars(frames):
+    """Align several symbols' bars on one date index as (bars x assets) arrays.
+
+    Returns (dates, open, close). Gaps after a symbol's first bar are
+    forward-filled from its last close; bars before it lists stay NaN.
+    """
+    close = pd.concat({symbol: df['Close'] for symbol, df in frames.items()}, axis=1).sort_index()
+    open_ = pd.concat({symbol: df['Open'] for symbol, df in frames.items()}, axis=1).reindex(close.index)
+    close = close.ffill()
+    open_ = open_.fillna(close)
+    return close.index, open_.to_numpy(dtype=np.float64), close.to_numpy(dtype=np.float64)
+
+
+def _holding_mask(rsi, rsi_buy, rsi_sell):
+    """Bars on which each asset is held, for RSIStrategy run per asset.
+
+    With rsi_buy < rsi_sell a bar can signal at most one side, so the
+    position after a bar is whichever side signalled last; it is taken at
+    the next bar's open.
+    """
+    events = np.where(rsi < rsi_buy, 1, np.where(rsi > rsi_sell, -1, 0))
+    rows = np.arange(events.shape[0])[:, None]
+    last = np.maximum.accumulate(np.where(events != 0, rows, -1), axis=0)
+    signalled = np.take_along_axis(events, np.maximum(last, 0), axis=0)
+    position = (last >= 0) & (signalled == 1)
+    held = np.zeros_like(position)
+    held[1:] = position[:-1]
+    return held
+
+
+def _segment_starts(dates, rebalance):
+    """Start positions of the rebalancing periods"""
+    if rebalance == "none" or len(dates) == 0:
+        return np.array([0])
+    periods = pd.DatetimeIndex(dates).to_period(_PERIOD_CODES[rebalance]).asi8
+    return np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+
+
+def run_portfolio_backtest(dates, open_, close, weights, rsi_period, rsi_buy, rsi_sell,
+                           initial_cash, rebalance="none"):
+    """RSIStrategy per asset inside weighted sleeves of one portfolio.
+
+    Each asset's sleeve starts with its weight of the cash and goes all in
+    or to cash on its own RSI signals, filling at the next open without
+    commission. Sleeves are reset to the target weights at the start of
+    each rebalancing period. All assets are stepped on one clock and the
+    equity curve comes from cumulative log growth factors, so there is no
+    per-bar or per-asset Python loop.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    weights = weights / weights.sum()
+    n = close.shape[0]
+
+    rsi = rsi_sma(close, rsi_period)
+    held = _holding_mask(rsi, rsi_buy, rsi_sell)
+
+    # Per-bar growth of each sleeve: close-to-close while held, open-to-close
+    # on entry, close-to-open on exit and flat in cash
+    prev_close = np.empty_like(close)
+    prev_close[0] = close[0]
+    prev_close[1:] = close[:-1]
+    was_held = np.zeros_like(held)
+    was_held[1:] = held[:-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth = np.where(held & was_held, close / prev_close,
+                 np.where(held, close / open_,
+                 np.where(was_held, open_ / prev_close, 1.0)))
+    log_growth = np.log(growth)
+    log_growth[~np.isfinite(log_growth)] = 0.0
+    cum = np.cumsum(log_growth, axis=0)
+
+    # Sleeve growth within each rebalancing period, then chain the periods
+    starts = _segment_starts(dates, rebalance)
+    segment = np.searchsorted(starts, np.arange(n), side='right') - 1
+    base = np.zeros((starts.size, close.shape[1]))
+    base[1:] = cum[starts[1:] - 1]
+    sleeve_growth = np.exp(cum - base[segment])
+    factor = sleeve_growth @ weights
+    ends = np.r_[starts[1:] - 1, n - 1]
+    segment_value = initial_cash * np.cumprod(np.r_[1.0, factor[ends[:-1]]])
+    equity = segment_value[segment] * factor
+    sleeves = segment_value[segment][:, None] * sleeve_growth * weights
+
+    # Trades: entries are 0 -> 1 steps of the holding mask, exits 1 -> 0
+    steps = np.diff(held.astype(np.int8), axis=0, prepend=0)
+    entry_bar, entry_asset = np.nonzero(steps == 1)
+    exit_bar, exit_asset = np.nonzero(steps == -1)
+    entry_order = np.lexsort((entry_bar, entry_asset))
+    exit_order = np.lexsort((exit_bar, exit_asset))
+    entry_bar, entry_asset = entry_bar[entry_order], entry_asset[entry_order]
+    exit_bar, exit_asset = exit_bar[exit_order], exit_asset[exit_order]
+
+    # Every exit closes the entry before it; the rest are still open
+    closed = np.zeros(entry_bar.size, dtype=bool)
+    if exit_bar.size:
+        first_entry = np.searchsorted(entry_asset, np.arange(close.shape[1]))
+        nth = np.arange(exit_bar.size) - np.searchsorted(exit_asset, exit_asset)
+        closed[first_entry[exit_asset] + nth] = True
+    entry_cum = np.where(entry_bar > 0, cum[np.maximum(entry_bar - 1, 0), entry_asset], 0.0)
+    trade_log_return = cum[exit_bar, exit_asset] - entry_cum[closed]
+    won = int(np.count_nonzero(trade_log_return >= 0.0))
+
+    metrics = summarize_backtest(
+        initial_cash,
+        float(equity[-1]),
+        int(entry_bar.size),
+        won,
+        int(exit_bar.size) - won,
+        max_drawdown_pct(equity, initial_cash),
+    )
+
+    returns = equity[1:] / equity[:-1] - 1.0
+    volatility = float(returns.std() * np.sqrt(TRADING_DAYS)) if returns.size else 0.0
+    metrics['volatility'] = round(volatility * 100, 2)
+    metrics['sharpe_ratio'] = round(float(returns.mean() * TRADING_DAYS / volatility), 2) if volatility > 0 else 0.0
+
+    trades_per_asset = np.bincount(entry_asset, minlength=close.shape[1])
+    metrics['assets'] = [
+        {
+            'weight': round(float(weights[j]), 6),
+            'final_value': round(float(sleeves[-1, j]), 2),
+            'total_trades': int(trades_per_asset[j]),
+            'held_pct': round(float(held[:, j].mean() * 100), 2),
+        }
+        for j in range(close.shape[1])
+    ]
+    metrics['equity_curve'] = equity
+    return metrics
@@ -0,0 +1,232 @@
+import os
+import time
+import random
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as clock_time, timedelta
+from zoneinfo import ZoneInfo
+
+from pandas import DateOffset
+from pandas.tseries.holiday import (
+    MO, AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay, USMemorialDay, USPresidentsDay,
+    USThanksgivingDay, nearest_workday, sunday_to_monday,
+)
+
+# Simplified regular session, as in v1's /market/status: trading days 9:00-16:00
+# exchange time, whatever the server's own time zone
+MARKET_TZ = ZoneInfo(os.environ.get("MARKET_TIMEZONE", "America/New_York"))
+MARKET_OPEN_HOUR = 9
+MARKET_CLOSE_HOUR = 16
+
+# Upstream needs a while after the close to publish the final daily bar
+PREFETCH_DELAY = timedelta(minutes=int(os.environ.get("PREFETCH_DELAY_MINUTES", 30)))
+PREFETCH_BATCH_SIZE = int(os.environ.get("PREFETCH_BATCH_SIZE", 25))
+PREFETCH_CONCURRENCY = int(os.environ.get("PREFETCH_CONCURRENCY", 2))
+PREFETCH_RETRIES = int(os.environ.get("PREFETCH_RETRIES", 3))
+PREFETCH_BACKOFF = float(os.environ.get("PREFETCH_BACKOFF", 60))
+
+# Unscheduled closures (e.g. national days of mourning) as comma-separated
+# YYYY-MM-DD dates, on top of the regular holidays below
+MARKET_CLOSED_DAYS = frozenset(
+    date.fromisoformat(day.strip())
+    for day in os.environ.get("MARKET_CLOSED_DAYS", "").split(",") if day.strip()
+)
+
+
+class ExchangeHolidayCalendar(AbstractHolidayCalendar):
+    """Full-day NYSE/Nasdaq holidays; early closes are treated as full sessions"""
+    rules = [
+        # A Saturday New Year's Day is not observed on the Friday before
+        Holiday('New Years Day', month=1, day=1, observance=sunday_to_monday),
+        # Observed by the exchanges since 1998
+        Holiday('Martin Luther King Jr. Day', month=1, day=1, offset=DateOffset(weekday=MO(3)),
+                start_date='1998-01-01'),
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday('Juneteenth', month=6, day=19, observance=nearest_workday, start_date='2022-01-01'),
+        Holiday('Independence Day', month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Christmas', month=12, day=25, observance=nearest_workday),
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def _holidays(year):
+    days = ExchangeHolidayCalendar().holidays(date(year, 1, 1), date(year, 12, 31))
+    return frozenset(day.date() for day in days)
+
+
+def is_trading_day(day):
+    """Whether the exchange holds a session on day: a weekday that is not a holiday or closure"""
+    return day.weekday() < 5 and day not in _holidays(day.year) and day not in MARKET_CLOSED_DAYS
+
+
+def market_now(now=None):
+    """now (default: the current time) in exchange time; naive times are taken as server local"""
+    if now is None:
+        return datetime.now(MARKET_TZ)
+    return now.astimezone(MARKET_TZ)
+
+
+def is_market_open(now=None):
+    now = market_now(now)
+    return MARKET_OPEN_HOUR <= now.hour < MARKET_CLOSE_HOUR and is_trading_day(now.date())
+
+
+def session_close(day):
+    return datetime.combine(day, clock_time(MARKET_CLOSE_HOUR), tzinfo=MARKET_TZ)
+
+
+def forming_day(now=None, delay=PREFETCH_DELAY):
+    """First exchange day whose daily bar may still change.
+
+    That is today until the session has closed (plus delay for upstream to
+    settle) and tomorrow after that; days without a session never form a bar.
+    """
+    now = market_now(now)
+    today = now.date()
+    if not is_trading_day(today) or now >= session_close(today) + delay:
+        return today + timedelta(days=1)
+    return today
+
+
+def last_session(now):
+    """The most recent trading day whose session has closed"""
+    now = market_now(now)
+    day = now.date()
+    if now < session_close(day):
+        day -= timedelta(days=1)
+    while not is_trading_day(day):
+        day -= timedelta(days=1)
+    return day
+
+
+def next_prefetch_time(now, delay=PREFETCH_DELAY):
+    """The first trading day's session close plus delay strictly after now"""
+    now = market_now(now)
+    day = now.date()
+    while True:
+        at = session_close(day) + delay
+        if is_trading_day(day) and at > now:
+            return at
+        day += timedelta(days=1)
+
+
+class PrefetchScheduler:
+    """Fetch each session's final daily bar for a symbol universe after the close.
+
+    A daemon thread sleeps until the next trading day's close (plus delay), then
+    run_once() bulk-loads the universe's recent bars through load_many in
+    batches, at most ``concurrency`` batches at a time. Symbols whose bars
+    still lack the session's day are retried with jittered exponential
+    backoff, after uncover(symbol, day) makes the store forget it had
+    fetched that day. refresh(symbol, bars) is then called for each symbol so
+    derived state such as cached indicators is warm before the next request.
+    """
+
+    def __init__(self, symbols, load_many, refresh=None, uncover=None, lookback=timedelta(days=90),
+                 delay=PREFETCH_DELAY, batch_size=PREFETCH_BATCH_SIZE, concurrency=PREFETCH_CONCURRENCY,
+                 retries=PREFETCH_RETRIES, backoff=PREFETCH_BACKOFF, clock=market_now):
+        self.symbols = list(symbols)
+        self.load_many = load_many
+        self.refresh = refresh
+        self.uncover = uncover
+        self.lookback = lookback
+        self.delay = delay
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.clock = clock
+        self.runs = 0
+        self.refreshed = 0
+        self.failed = 0
+        self.last_run = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="prefetch", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            at = next_prefetch_time(self.clock(), self.delay)
+            if self._stop.wait(max((at - market_now(self.clock())).total_seconds(), 0.0)):
+                return
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Error prefetching bars: {str(e)}")
+
+    def run_once(self):
+        """Load and refresh the universe now; returns {symbol: bars} for what loaded.
+
+        Symbols given up on are still refreshed from whatever bars loaded.
+        """
+        now = market_now(self.clock())
+        session_day = last_session(now)
+        start = now - self.lookback
+        batches = [self.symbols[i:i + self.batch_size] for i in range(0, len(self.symbols), self.batch_size)]
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            results = list(executor.map(lambda batch: self._fetch_batch(batch, start, now, session_day), batches))
+
+        loaded = {}
+        missed = 0
+        for bars, pending in results:
+            loaded.update(bars)
+            missed += len(pending)
+        for symbol, df in loaded.items():
+            if self.refresh is not None:
+                try:
+                    self.refresh(symbol, df)
+                except Exception as e:
+                    print(f"Error refreshing {symbol} after prefetch: {str(e)}")
+
+        self.runs += 1
+        self.refreshed += len(self.symbols) - missed
+        self.failed += missed
+        self.last_run = time.time()
+        return loaded
+
+    def _fetch_batch(self, batch, start, end, session_day):
+        pending = list(batch)
+        loaded = {}
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._uncover(pending, session_day)
+                # Full jitter keeps retried batches from hitting upstream in step
+                if self._stop.wait(random.uniform(0, self.backoff * 2 ** (attempt - 1))):
+                    break
+            try:
+                bars = self.load_many(pending, start, end)
+            except Exception as e:
+                print(f"Error prefetching {len(pending)} symbols (attempt {attempt + 1}): {str(e)}")
+                continue
+            for symbol, df in bars.items():
+                loaded[symbol] = df
+            # Before the session's bar is published upstream the range can
+            # load without it; such symbols are tried again
+            pending = [s for s in pending
+                       if s not in loaded or loaded[s].index[-1].date() < session_day]
+            if not pending:
+                break
+        if pending:
+            # Leave the session's bar to be fetched by the next request
+            self._uncover(pending, session_day)
+            print(f"Prefetch gave up on {len(pending)} symbols: {', '.join(pending[:10])}")
+        return loaded, pending
+
+    def _uncover(self, symbols, day):
+        if self.uncover is None:
+            return
+        for symbol in symbols:
+            self.uncover(symbol, day)
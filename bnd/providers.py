@@ -0,0 +1,263 @@
+import os
+import json
+import logging
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BAR_COLUMNS, BarStore, _clean_bars, _epoch, download_bars, download_bars_many, normalize_range
+from prefetch import market_now
+from upstream import UpstreamEmpty
+
+# Which MarketDataProvider main serves from: "yfinance" or "replay"
+MARKET_DATA_PROVIDER = os.environ.get("MARKET_DATA_PROVIDER", "yfinance")
+REPLAY_DATA_DIR = os.environ.get(
+    "REPLAY_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "replay")
+)
+
+# Threads used to fetch Ticker.info for several symbols at once
+METADATA_FETCH_WORKERS = 8
+
+# How yfinance words Yahoo saying a symbol has no bars (unknown, delisted,
+# or nothing in the range), as opposed to failing to ask
+_NO_DATA_MESSAGES = ('possibly delisted', 'no price data found', 'no timezone found', "doesn't exist")
+
+
+class MarketDataProvider(ABC):
+    """A source of OHLCV bars and company metadata.
+
+    Subclasses implement the blocking fetch_bars / fetch_metadata, which the
+    bar store and metadata cache call from worker threads. fetch_bars takes
+    a [start, end) range and returns symbol -> flat BAR_COLUMNS frame on a
+    Date index. Symbols without data are left out, and a provider that
+    cannot tell whether a symbol has data raises.
+    """
+
+    name = None
+    # Remote providers have their calls budgeted by the upstream governor
+    remote = True
+
+    @abstractmethod
+    def fetch_bars(self, symbols, start, end, interval='1d'):
+        """Return symbol -> bars for [start, end); symbols without data are left out"""
+
+    @abstractmethod
+    def fetch_metadata(self, symbols):
+        """Return symbol -> Ticker.info-style dict; unknown symbols are left out"""
+
+
+class _ThreadErrors(logging.Handler):
+    """Collects the error messages the installing thread logs"""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.thread = threading.get_ident()
+        self.messages = []
+
+    def emit(self, record):
+        if record.thread == self.thread:
+            self.messages.append(record.getMessage())
+
+
+@contextmanager
+def _yfinance_errors():
+    """The errors yf.download logs on this thread while the block runs.
+
+    yf.download reports failed symbols only by logging them, after all
+    its own threads are done.
+    """
+    logger = logging.getLogger('yfinance')
+    handler = _ThreadErrors()
+    logger.addHandler(handler)
+    try:
+        yield handler.messages
+    finally:
+        logger.removeHandler(handler)
+
+
+def _no_data_symbols(errors, symbols):
+    """The symbols the logged errors say Yahoo has no bars for.
+
+    yf.download logs each error once, after the list of symbols it hit,
+    e.g. "['AAPL', 'MSFT']: YFPricesMissingError(...)".
+    """
+    return {symbol for symbol in symbols for error in errors
+            if repr(symbol) in error and any(m in error for m in _NO_DATA_MESSAGES)}
+
+
+def _has_sessions(start, end):
+    """Whether [start, end) holds a weekday before today's, whose bar must exist"""
+    start, end = normalize_range(start, end)
+    return np.busday_count(start, min(end, market_now().date())) > 0
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Live data from Yahoo Finance through yfinance.
+
+    yfinance answers throttling and network failures with empty frames and
+    only logs why. When a symbol comes back without bars for a range with
+    past sessions, and Yahoo did not say it has no data there, fetch_bars
+    raises UpstreamEmpty, so the call is retried or served stale. A symbol
+    that is left out therefore really has no bars in the range, and the bar
+    store records the range as fetched.
+    """
+
+    name = "yfinance"
+
+    def fetch_bars(self, symbols, start, end, interval='1d'):
+        symbols = list(symbols)
+        with _yfinance_errors() as errors:
+            if len(symbols) == 1:
+                df = download_bars(symbols[0], start, end, interval)
+                bars = {} if df.empty else {symbols[0]: df}
+            else:
+                bars = download_bars_many(symbols, start, end, interval)
+
+        no_data = _no_data_symbols(errors, symbols)
+        unexplained = [symbol for symbol in symbols if symbol not in bars and symbol not in no_data]
+        if unexplained and _has_sessions(start, end):
+            raise UpstreamEmpty(f"Upstream returned no bars for {', '.join(unexplained)}: "
+                                f"{'; '.join(e.strip() for e in errors) or 'no reason given'}")
+        return bars
+
+    def fetch_metadata(self, symbols):
+        import yfinance as yf
+        from concurrent.futures import ThreadPoolExecutor
+
+        def info(symbol):
+            return symbol, yf.Ticker(symbol).info or {}
+
+        symbols = list(symbols)
+        if len(symbols) == 1:
+            results = [info(symbols[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(METADATA_FETCH_WORKERS, len(symbols))) as executor:
+                results = list(executor.map(info, symbols))
+        return {symbol: data for symbol, data in results if data}
+
+
+class ReplayProvider(MarketDataProvider):
+    """Serves bars and metadata recorded under a local directory.
+
+    Bars are read from ``<root>/<SYMBOL>.parquet`` or ``<root>/<SYMBOL>.csv``
+    (``<root>/<interval>/<SYMBOL>.*`` for intervals other than 1d), in the
+    layout yfinance's DataFrame.to_csv writes. Each file is parsed once into
+    the bar store's (6, n) column layout under ``<root>/.columns`` and then
+    memory-mapped, so a request is two binary searches and a slice. Metadata
+    comes from ``<root>/metadata.json`` (symbol -> info dict).
+    """
+
+    name = "replay"
+    remote = False
+
+    def __init__(self, root=REPLAY_DATA_DIR):
+        self.root = root
+        self._columns = {}
+        self._metadata = None
+        self._lock = threading.Lock()
+
+    def _source(self, symbol, interval):
+        folder = self.root if interval == '1d' else os.path.join(self.root, interval)
+        for ext in ('.parquet', '.csv'):
+            path = os.path.join(folder, symbol + ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def _read_source(self, path):
+        if path.endswith('.parquet'):
+            df = pd.read_parquet(path, memory_map=True)
+            if 'Date' in df.columns:
+                df = df.set_index('Date')
+        else:
+            df = pd.read_csv(path, index_col=0, parse_dates=True)
+        df.index = pd.DatetimeIndex(df.index)
+        return _clean_bars(df).sort_index()
+
+    def _load(self, symbol, interval):
+        """Memory-mapped (6, n) columns for a symbol, or None if it has no file"""
+        key = (symbol, interval)
+        columns = self._columns.get(key)
+        if columns is not None:
+            return columns
+
+        with self._lock:
+            if key in self._columns:
+                return self._columns[key]
+            source = self._source(symbol, interval)
+            if source is None:
+                columns = None
+            else:
+                # The parsed copy is reused while it is newer than its source
+                cache = os.path.join(self.root, '.columns', interval, f"{symbol}.npy")
+                try:
+                    stale = os.path.getmtime(cache) < os.path.getmtime(source)
+                except OSError:
+                    stale = True
+                if stale:
+                    os.makedirs(os.path.dirname(cache), exist_ok=True)
+                    tmp = f"{cache}.{threading.get_ident()}.tmp.npy"
+                    np.save(tmp, BarStore._frame_to_columns(self._read_source(source)))
+                    os.replace(tmp, cache)
+                columns = np.load(cache, mmap_mode='r')
+            self._columns[key] = columns
+            return columns
+
+    def _slice(self, symbol, start, end, interval):
+        try:
+            columns = self._load(symbol, interval)
+        except (OSError, ValueError, ImportError) as e:
+            print(f"Error reading replay bars for {symbol}: {e}")
+            return None
+        if columns is None:
+            return None
+        start, end = normalize_range(start, end)
+        lo = np.searchsorted(columns[0], _epoch(start), side='left')
+        hi = np.searchsorted(columns[0], _epoch(end), side='left')
+        return BarStore._columns_to_frame(columns[:, lo:hi]) if hi > lo else None
+
+    def fetch_bars(self, symbols, start, end, interval='1d'):
+        result = {}
+        for symbol in symbols:
+            df = self._slice(symbol, start, end, interval)
+            if df is not None:
+                result[symbol] = df
+        return result
+
+    def fetch_metadata(self, symbols):
+        if self._metadata is None:
+            try:
+                with open(os.path.join(self.root, 'metadata.json')) as f:
+                    self._metadata = json.load(f)
+            except FileNotFoundError:
+                self._metadata = {}
+            except (OSError, ValueError) as e:
+                print(f"Error reading replay metadata: {e}")
+                self._metadata = {}
+        return {symbol: dict(self._metadata[symbol]) for symbol in symbols if symbol in self._metadata}
+
+
+def save_replay(root, bars, metadata=None):
+    """Record daily bars (symbol -> frame) and metadata as a ReplayProvider directory"""
+    os.makedirs(root, exist_ok=True)
+    for symbol, df in bars.items():
+        df[BAR_COLUMNS].to_csv(os.path.join(root, f"{symbol}.csv"), index_label='Date')
+    if metadata:
+        with open(os.path.join(root, 'metadata.json'), 'w') as f:
+            json.dump(metadata, f, indent=2, default=str)
+
+
+PROVIDERS = {
+    YFinanceProvider.name: YFinanceProvider,
+    ReplayProvider.name: ReplayProvider,
+}
+
+
+def provider_from_env(name=MARKET_DATA_PROVIDER):
+    """Build the provider selected by MARKET_DATA_PROVIDER"""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown market data provider {name!r}; expected one of: {', '.join(PROVIDERS)}")
+    return PROVIDERS[name]()
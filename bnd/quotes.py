@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import asyncio
+
+from prefetch import is_market_open
+
+# Seconds between quote refreshes while the market is open, and while it is
+# closed (when only late revisions to the last bar can change anything)
+QUOTE_INTERVAL = float(os.environ.get("QUOTE_INTERVAL", 15))
+QUOTE_CLOSED_INTERVAL = float(os.environ.get("QUOTE_CLOSED_INTERVAL", 300))
+QUOTE_MAX_SYMBOLS = int(os.environ.get("QUOTE_MAX_SYMBOLS", 50))
+
+# Fields pushed to clients and the decimals they are rounded to; a field is
+# only resent once its rounded value changes
+QUOTE_FIELDS = {
+    'price': 4,
+    'change': 4,
+    'change_percent': 2,
+    'rsi': 2,
+    'macd': 4,
+    'macd_signal': 4,
+    'stochastic_k': 2,
+    'stochastic_d': 2,
+}
+
+
+def quote_interval(now=None):
+    """Refresh interval for the exchange session at now (default: the current time)"""
+    return QUOTE_INTERVAL if is_market_open(now) else QUOTE_CLOSED_INTERVAL
+
+
+def round_quote(quote):
+    return {name: round(float(quote[name]), digits) for name, digits in QUOTE_FIELDS.items()}
+
+
+def encode(message):
+    return json.dumps(message, separators=(',', ':'))
+
+
+class Subscriber:
+    """One connection's subscriptions and the messages waiting to be sent to it.
+
+    Pending messages are keyed by symbol. An update arriving for a symbol
+    that still has one pending replaces it with the symbol's full snapshot,
+    so a slow client skips to the latest state instead of queueing deltas.
+    """
+
+    def __init__(self):
+        self.symbols = set()
+        self._pending = {}
+        self._ready = asyncio.Event()
+
+    def offer(self, symbol, delta, snapshot):
+        """Queue delta for symbol; returns True if it replaced an unsent message"""
+        superseded = symbol in self._pending
+        self._pending[symbol] = snapshot if superseded else delta
+        self._ready.set()
+        return superseded
+
+    def send_now(self, key, message):
+        self._pending[key] = message
+        self._ready.set()
+
+    def send_error(self, detail, symbol=None):
+        message = {'type': 'error', 'detail': detail}
+        if symbol is not None:
+            message['symbol'] = symbol
+        # Keyed apart from quotes, so a later update cannot replace the error
+        self.send_now(('error', symbol, detail), encode(message))
+
+    async def next_batch(self):
+        """Wait for pending messages and take them all"""
+        await self._ready.wait()
+        self._ready.clear()
+        batch = list(self._pending.values())
+        self._pending.clear()
+        return batch
+
+
+class QuoteHub:
+    """Computes live quotes once per symbol and fans them out to subscribers.
+
+    While any client subscribes to a symbol it is refreshed every
+    interval() seconds, all subscribed symbols in one compute(symbols) call
+    run on a worker thread. Each refresh is compared with the symbol's last
+    quote and only the changed fields are encoded - once, however many
+    clients receive them. New subscribers get the symbol's full snapshot.
+    Everything except compute runs on the event loop, so no locking is
+    needed.
+    """
+
+    def __init__(self, compute, interval=quote_interval, max_symbols=QUOTE_MAX_SYMBOLS):
+        self.compute = compute
+        self.interval = interval
+        self.max_symbols = max_symbols
+        self._subscribers = {}  # symbol -> set of Subscriber
+        self._quotes = {}  # symbol -> (rounded quote, encoded snapshot)
+        self._connections = set()
+        self._wake = None
+        self._task = None
+        self.refreshes = 0
+        self.updates = 0
+        self.messages = 0
+        self.superseded = 0
+        self.errors = 0
+
+    @property
+    def connections(self):
+        return len(self._connections)
+
+    @property
+    def symbols(self):
+        return len(self._subscribers)
+
+    def connect(self):
+        subscriber = Subscriber()
+        self._connections.add(subscriber)
+        return subscriber
+
+    def disconnect(self, subscriber):
+        self.unsubscribe(subscriber, list(subscriber.symbols))
+        self._connections.discard(subscriber)
+
+    def subscribe(self, subscriber, symbols):
+        """Add symbols to a subscription; returns the ones over the per-client limit"""
+        rejected = []
+        for symbol in symbols:
+            if symbol in subscriber.symbols:
+                continue
+            if len(subscriber.symbols) >= self.max_symbols:
+                rejected.append(symbol)
+                continue
+            subscriber.symbols.add(symbol)
+            self._subscribers.setdefault(symbol, set()).add(subscriber)
+            if symbol in self._quotes:
+                subscriber.send_now(symbol, self._quotes[symbol][1])
+                self.messages += 1
+            elif self._wake is not None:
+                # Compute a newly watched symbol now rather than at the next tick
+                self._wake.set()
+        self._ensure_running()
+        return rejected
+
+    def unsubscribe(self, subscriber, symbols):
+        for symbol in symbols:
+            subscriber.symbols.discard(symbol)
+            watchers = self._subscribers.get(symbol)
+            if watchers is None:
+                continue
+            watchers.discard(subscriber)
+            if not watchers:
+                del self._subscribers[symbol]
+                self._quotes.pop(symbol, None)
+
+    def _ensure_running(self):
+        if self._subscribers and (self._task is None or self._task.done()):
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while self._subscribers:
+            self._wake.clear()
+            await self.refresh()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval())
+            except asyncio.TimeoutError:
+                pass
+
+    async def refresh(self):
+        """Recompute every subscribed symbol once and publish what changed"""
+        symbols = sorted(self._subscribers)
+        if not symbols:
+            return
+        try:
+            quotes = await asyncio.to_thread(self.compute, symbols)
+        except Exception as e:
+            self.errors += 1
+            print(f"Error refreshing quotes: {e}")
+            return
+        self.refreshes += 1
+        ts = int(time.time())
+        for symbol in symbols:
+            if symbol not in self._subscribers:
+                continue  # unsubscribed while computing
+            quote = quotes.get(symbol)
+            if quote is None:
+                if symbol not in self._quotes:
+                    self._reject(symbol, f"No data found for '{symbol}'")
+                continue
+            self._publish(symbol, round_quote(quote), ts)
+
+    def _publish(self, symbol, quote, ts):
+        previous = self._quotes.get(symbol, (None,))[0]
+        changed = {name: value for name, value in quote.items() if previous is None or previous[name] != value}
+        if not changed:
+            return
+        snapshot = encode({'type': 'snapshot', 'symbol': symbol, 'ts': ts, **quote})
+        delta = snapshot if previous is None else encode({'type': 'quote', 'symbol': symbol, 'ts': ts, **changed})
+        self._quotes[symbol] = (quote, snapshot)
+        self.updates += 1
+        for subscriber in self._subscribers[symbol]:
+            if subscriber.offer(symbol, delta, snapshot):
+                self.superseded += 1
+            self.messages += 1
+
+    def _reject(self, symbol, detail):
+        for subscriber in list(self._subscribers[symbol]):
+            subscriber.send_error(detail, symbol)
+            self.messages += 1
+            self.unsubscribe(subscriber, [symbol])
@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+RESULT_CACHE_DIR = os.environ.get(
+    "RESULT_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".result_cache")
+)
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 1024))
+RESULT_CACHE_MAX_DISK_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_DISK_ENTRIES", 50000))
+
+# Bump when engine changes alter results, so older entries stop matching
+RESULT_CACHE_VERSION = 1
+
+_BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Check the disk tier's size every this many writes
+_PRUNE_EVERY = 256
+
+
+def fingerprint_bars(bars):
+    """sha256 over the bar timestamps and OHLCV values of Bars or a Date-column frame"""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(np.asarray(bars['Date'], dtype='datetime64[s]').view(np.int64)).tobytes())
+    for column in _BAR_COLUMNS:
+        digest.update(np.ascontiguousarray(bars[column], dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def result_key(kind, params, fingerprint):
+    """Content address for a result: the canonical params plus the bars it ran on"""
+    payload = json.dumps(
+        {'version': RESULT_CACHE_VERSION, 'kind': kind, 'params': params, 'bars': fingerprint},
+        sort_keys=True, separators=(',', ':'), default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """Content-addressed cache of backtest results, in memory and on disk.
+
+    Keys come from result_key(), so they change whenever the request or the
+    bars behind it change; revised bars simply address a new entry and the
+    old one ages out. Hot entries live in a bounded LRU, and every entry is
+    also written as JSON under ``root`` so results survive restarts.
+    """
+
+    def __init__(self, root=RESULT_CACHE_DIR, max_entries=RESULT_CACHE_MAX_ENTRIES,
+                 max_disk_entries=RESULT_CACHE_MAX_DISK_ENTRIES):
+        self.root = root
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached result for key, or None"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        try:
+            with open(self._path(key)) as f:
+                value = json.load(f)
+        except FileNotFoundError:
+            value = None
+        except (OSError, ValueError) as e:
+            print(f"Error reading cached result {key}: {e}")
+            value = None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            self._writes += 1
+            prune = self._writes % _PRUNE_EVERY == 0
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(value, f)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Error writing cached result {key}: {e}")
+
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Drop the least recently written files beyond max_disk_entries"""
+        try:
+            paths = [entry.path for shard in os.scandir(self.root) if shard.is_dir()
+                     for entry in os.scandir(shard.path) if entry.name.endswith('.json')]
+        except FileNotFoundError:
+            return
+        if len(paths) <= self.max_disk_entries:
+            return
+        paths.sort(key=lambda p: os.path.getmtime(p) if os.path.exists(p) else time.time())
+        for path in paths[:len(paths) - self.max_disk_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,81 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+SNAPSHOT_MAX_ENTRIES = 4096
+
+
+def make_etag(body):
+    """Strong entity tag for a serialized response body"""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header value lists etag (or is *).
+
+    If-None-Match uses the weak comparison, so a W/ prefix is ignored.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class Snapshot:
+    """A serialized response body with its ETag"""
+    __slots__ = ('body', 'etag')
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = make_etag(body)
+
+    @property
+    def headers(self):
+        # no-cache lets clients and proxies keep the body but revalidate each time
+        return {'ETag': self.etag, 'Cache-Control': 'no-cache'}
+
+
+class SnapshotCache:
+    """Bounded LRU of serialized responses per (symbol, trading day).
+
+    Each entry also remembers the version of the inputs it was built from
+    (e.g. the latest bars and metadata); get() only returns a snapshot whose
+    version still matches, so an intraday bar update or a metadata refresh
+    rebuilds it while repeat polls reuse the stored bytes.
+    """
+
+    def __init__(self, max_entries=SNAPSHOT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, symbol, day, version):
+        key = (symbol, day)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, symbol, day, version, body):
+        """Store body for (symbol, day) and return its Snapshot"""
+        snapshot = Snapshot(body)
+        key = (symbol, day)
+        with self._lock:
+            self._entries[key] = (version, snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return snapshot
@@ -0,0 +1,328 @@
+"""Symbol search index.
+
+Without an exchange listing at SYMBOL_LIST_PATH only the fallback names
+(main's POPULAR_STOCKS) are searchable. To download the NASDAQ Trader symbol directory (every NASDAQ,
+NYSE and other US-listed security), run from bnd/:
+
+    python symbol_index.py [path]
+"""
+import bisect
+import csv
+import difflib
+import io
+import os
+import re
+import sys
+import urllib.request
+from collections import defaultdict
+
+import numpy as np
+
+# Exchange listing to search; any CSV (or pipe/tab separated file) with a
+# symbol and a company name column, e.g. NASDAQ's nasdaqlisted.txt
+SYMBOL_LIST_PATH = os.environ.get(
+    "SYMBOL_LIST_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "symbols.csv")
+)
+
+_SYMBOL_COLUMNS = ('symbol', 'ticker', 'act symbol', 'nasdaq symbol')
+_NAME_COLUMNS = ('name', 'company name', 'security name', 'company', 'description')
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# NASDAQ Trader's symbol directory: NASDAQ listings, and everything else
+NASDAQ_LISTING_URLS = (
+    "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt",
+    "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt",
+)
+
+# Vocabulary tokens sharing this share of trigrams with a query word
+# (Dice coefficient) are shortlisted - at most FUZZY_SHORTLIST of them, the
+# most similar first - then kept if their edit similarity (difflib ratio)
+# reaches FUZZY_THRESHOLD. The cap bounds the Python-level edit distance
+# work per query word whatever the listing's size
+TRIGRAM_SHORTLIST = 0.3
+FUZZY_SHORTLIST = 16
+FUZZY_THRESHOLD = 0.7
+
+
+def load_symbol_listings(path):
+    """Read {symbol: company name} from a listing file; {} if it is missing"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        header = f.readline()
+        delimiter = max(',|\t', key=header.count)
+        f.seek(0)
+        reader = csv.DictReader(f, delimiter=delimiter)
+        columns = {name.strip().lower(): name for name in reader.fieldnames or ()}
+        symbol_col = next((columns[c] for c in _SYMBOL_COLUMNS if c in columns), None)
+        name_col = next((columns[c] for c in _NAME_COLUMNS if c in columns), None)
+        if symbol_col is None or name_col is None:
+            print(f"Symbol list {path} has no symbol/name columns, ignoring it")
+            return {}
+
+        listings = {}
+        for row in reader:
+            symbol = (row.get(symbol_col) or '').strip().upper()
+            name = (row.get(name_col) or '').strip()
+            # Skip blanks and trailer lines such as "File Creation Time: ..."
+            if symbol and name and ' ' not in symbol:
+                listings[symbol] = name
+        return listings
+
+
+def download_symbol_listings(path=SYMBOL_LIST_PATH, urls=NASDAQ_LISTING_URLS):
+    """Write the US symbol directory to path as a symbol,name CSV; returns the count"""
+    listings = {}
+    for url in urls:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            text = response.read().decode('utf-8-sig')
+        for row in csv.DictReader(io.StringIO(text), delimiter='|'):
+            symbol = (row.get('Symbol') or row.get('ACT Symbol') or '').strip().upper()
+            name = (row.get('Security Name') or '').strip()
+            if symbol and name and ' ' not in symbol and row.get('Test Issue') != 'Y':
+                listings.setdefault(symbol, name)
+
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['symbol', 'name'])
+        writer.writerows(sorted(listings.items()))
+    os.replace(tmp, path)
+    return len(listings)
+
+
+def _tokens(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _trigrams(word):
+    padded = f"${word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _TrieNode:
+    __slots__ = ('children', 'members')
+
+    def __init__(self):
+        self.children = {}
+        self.members = {}
+
+
+class PrefixTrie:
+    """Character trie whose nodes list every member under that prefix.
+
+    Members are kept in insertion order, so inserting in rank order makes a
+    prefix lookup return ranked results without sorting at query time.
+    """
+
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def insert(self, key, member):
+        node = self.root
+        for ch in key:
+            node = node.children.setdefault(ch, _TrieNode())
+            node.members.setdefault(member)
+
+    def lookup(self, prefix):
+        """Ordered members under prefix (a dict used as an ordered set)"""
+        node = self.root
+        for ch in prefix:
+            node = node.children.get(ch)
+            if node is None:
+                return {}
+        return node.members
+
+
+class SymbolIndex:
+    """Search index over a symbol universe for per-keystroke suggestions.
+
+    Holds a prefix trie over symbols, the lowercased company names joined
+    into one string for substring search, a prefix trie over company-name
+    tokens and a trigram index over the token vocabulary for fuzzy matches.
+    Results rank exact symbol first, then symbol prefixes, company names
+    containing the query, names with a token prefixed by every query word
+    (in any order) and finally fuzzy matches; within each group popular
+    symbols come first, then shorter symbols.
+    """
+
+    def __init__(self, listings, popular=()):
+        self.names = dict(listings)
+        popular = set(popular)
+        ranked = sorted(self.names, key=lambda s: (s not in popular, len(s), s))
+
+        # Names in rank order, so scanning the haystack finds them ranked
+        self._ranked = ranked
+        self._name_starts = []
+        offset = 0
+        for symbol in ranked:
+            self._name_starts.append(offset)
+            offset += len(self.names[symbol]) + 1
+        self._haystack = '\n'.join(self.names[symbol].lower() for symbol in ranked)
+        # Every three-character run in some name: a query with any other
+        # run is in no name, and skips the scan (typos mostly do)
+        self._name_runs = {self._haystack[i:i + 3] for i in range(len(self._haystack) - 2)}
+
+        # Name tokens map to symbols by their position in ranked, so fuzzy
+        # scores can be kept in arrays
+        self._symbols = PrefixTrie()
+        self._name_tokens = PrefixTrie()
+        token_symbols = defaultdict(dict)
+        for i, symbol in enumerate(ranked):
+            self._symbols.insert(symbol, symbol)
+            for token in _tokens(self.names[symbol]):
+                self._name_tokens.insert(token, i)
+                token_symbols[token].setdefault(i)
+            token_symbols[symbol.lower()].setdefault(i)
+
+        # Trigram postings over the vocabulary of name tokens and symbols
+        self._vocabulary = list(token_symbols)
+        self._vocabulary_symbols = [np.fromiter(token_symbols[t], dtype=np.int64, count=len(token_symbols[t]))
+                                    for t in self._vocabulary]
+        sizes = []
+        trigrams = defaultdict(list)
+        for i, token in enumerate(self._vocabulary):
+            grams = _trigrams(token)
+            sizes.append(len(grams))
+            for gram in grams:
+                trigrams[gram].append(i)
+        self._vocabulary_sizes = np.array(sizes, dtype=np.float64)
+        self._trigrams = {gram: np.array(ids, dtype=np.int64) for gram, ids in trigrams.items()}
+
+    @classmethod
+    def from_csv(cls, path=SYMBOL_LIST_PATH, fallback=None, popular=()):
+        """Index the listing at path, overlaid with fallback's names"""
+        listings = load_symbol_listings(path)
+        if not listings:
+            print(f"No symbol list at {path}; searching {len(fallback or {})} symbols only "
+                  f"(run python symbol_index.py to download one)")
+        listings.update(fallback or {})
+        return cls(listings, popular=popular)
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, query, limit=10, fuzzy=True):
+        """Return up to limit (symbol, company name, match type) tuples.
+
+        With fuzzy=False, misspelt-name matches are left out; fuzzy_search
+        returns them on their own.
+        """
+        query_upper = query.upper().strip()
+        if not query_upper:
+            return []
+        seen = {}
+
+        def take(symbols, match_type):
+            for symbol in symbols:
+                if len(seen) >= limit:
+                    return
+                if symbol not in seen:
+                    seen[symbol] = match_type
+
+        # Exact symbol, then symbol prefix
+        if query_upper in self.names:
+            take((query_upper,), "symbol")
+        take(self._symbols.lookup(query_upper), "symbol")
+
+        # Company names containing the query
+        if len(seen) < limit:
+            take(self._containing(query.lower().strip()), "company")
+
+        # Company names where every query word prefixes some name token
+        words = _tokens(query)
+        postings = [self._name_tokens.lookup(w) for w in words]
+        if words and len(seen) < limit:
+            ordered = sorted(postings, key=len)
+            common = ordered[0].keys()
+            for posting in ordered[1:]:
+                common = common & posting.keys()
+            take((self._ranked[i] for i in ordered[0] if i in common), "company")
+
+        # Fuzzy hits are reported as company matches; clients only know the two types
+        if fuzzy and words and len(seen) < limit:
+            take(self._fuzzy(words, postings), "company")
+
+        return [(symbol, self.names[symbol], match_type) for symbol, match_type in seen.items()]
+
+    def fuzzy_search(self, query, limit=10):
+        """Up to limit (symbol, company name, "company") tuples for misspelt name matches"""
+        words = _tokens(query)
+        if not words:
+            return []
+        postings = [self._name_tokens.lookup(w) for w in words]
+        matches = []
+        for symbol in self._fuzzy(words, postings):
+            if len(matches) >= limit:
+                break
+            matches.append((symbol, self.names[symbol], "company"))
+        return matches
+
+    def _containing(self, text):
+        """Symbols whose company name contains text, in rank order"""
+        if not text or '\n' in text:
+            return
+        if any(text[i:i + 3] not in self._name_runs for i in range(len(text) - 2)):
+            return
+        pos = self._haystack.find(text)
+        while pos != -1:
+            i = bisect.bisect_right(self._name_starts, pos) - 1
+            yield self._ranked[i]
+            if i + 1 == len(self._ranked):
+                return
+            pos = self._haystack.find(text, self._name_starts[i + 1])
+
+    def _similar(self, word):
+        """Per-symbol best edit similarity of a name token or symbol to word (0 below FUZZY_THRESHOLD)"""
+        grams = _trigrams(word)
+        hits = [self._trigrams[gram] for gram in grams if gram in self._trigrams]
+        scores = np.zeros(len(self._ranked))
+        if not hits:
+            return scores
+        shared = np.bincount(np.concatenate(hits), minlength=len(self._vocabulary))
+        dice = 2.0 * shared / (len(grams) + self._vocabulary_sizes)
+        shortlist = np.flatnonzero(dice >= TRIGRAM_SHORTLIST)
+        if shortlist.size > FUZZY_SHORTLIST:
+            shortlist = shortlist[np.argpartition(-dice[shortlist], FUZZY_SHORTLIST - 1)[:FUZZY_SHORTLIST]]
+
+        matcher = difflib.SequenceMatcher(b=word, autojunk=False)
+        for i in shortlist:
+            matcher.set_seq1(self._vocabulary[i])
+            if matcher.quick_ratio() < FUZZY_THRESHOLD:
+                continue
+            score = matcher.ratio()
+            if score < FUZZY_THRESHOLD:
+                continue
+            symbols = self._vocabulary_symbols[i]
+            scores[symbols] = np.maximum(scores[symbols], score)
+        return scores
+
+    def _fuzzy(self, words, postings):
+        """Symbols ranked by mean word similarity, for queries with a misspelt word.
+
+        Words that prefix a name token score 1 for those symbols; the rest are
+        scored by edit similarity to vocabulary tokens shortlisted through the
+        trigram index, which is also where the candidates come from, so
+        common words never widen the search. Ties keep rank order.
+        """
+        if all(postings):
+            return ()
+        total = np.zeros(len(self._ranked))
+        matched = np.ones(len(self._ranked), dtype=bool)
+        for word, posting in zip(words, postings):
+            if posting:
+                scores = np.zeros(len(self._ranked))
+                scores[np.fromiter(posting, dtype=np.int64, count=len(posting))] = 1.0
+            elif len(word) < 3:
+                return ()
+            else:
+                scores = self._similar(word)
+            matched &= scores > 0.0
+            total += scores
+        total /= len(words)
+        hits = np.flatnonzero(matched & (total >= FUZZY_THRESHOLD))
+        return (self._ranked[i] for i in hits[np.argsort(-total[hits], kind='stable')])
+
+if __name__ == '__main__':
+    target = sys.argv[1] if len(sys.argv) > 1 else SYMBOL_LIST_PATH
+    print(f"Wrote {download_symbol_listings(target)} symbols to {target}")
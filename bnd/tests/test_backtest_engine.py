@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest_engine import run_backtest_engine, run_rsi_sweep
+
+pytest.importorskip("backtrader")
+
+
+def synthetic_frame(n=750, seed=7):
+    """A fixed random-walk OHLCV series with a Date column"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0.0002, 0.02, n)))
+    open_ = close * (1 + rng.normal(0, 0.008, n))
+    spread = np.abs(rng.normal(0, 0.01, n))
+    return pd.DataFrame({
+        'Date': pd.bdate_range('2018-01-01', periods=n),
+        'Open': open_,
+        'High': np.maximum(open_, close) * (1 + spread),
+        'Low': np.minimum(open_, close) * (1 - spread),
+        'Close': close,
+        'Volume': rng.integers(100_000, 1_000_000, n).astype(float),
+    })
+
+
+def run(engine, df, sizer, rsi_period, rsi_buy, rsi_sell):
+    events = []
+    result = run_backtest_engine(df, engine, rsi_period, rsi_buy, rsi_sell, 100000.0,
+                                 events=events.append, sizer=sizer)
+    trades = [event for event in events if event['type'] == 'trade']
+    return result, trades
+
+
+@pytest.mark.parametrize("sizer", ["fixed", "all_in"])
+@pytest.mark.parametrize("rsi_period, rsi_buy, rsi_sell", [(14, 30, 70), (10, 25, 60), (21, 40, 65)])
+def test_vectorized_engine_matches_backtrader(sizer, rsi_period, rsi_buy, rsi_sell):
+    df = synthetic_frame()
+    expected, expected_trades = run("backtrader", df, sizer, rsi_period, rsi_buy, rsi_sell)
+    result, trades = run("vectorized", df, sizer, rsi_period, rsi_buy, rsi_sell)
+
+    assert expected['total_trades'] > 0
+    assert trades == expected_trades
+    assert result == expected
+
+
+def test_sizers_differ():
+    df = synthetic_frame()
+    fixed, fixed_trades = run("vectorized", df, "fixed", 14, 30, 70)
+    all_in, all_in_trades = run("vectorized", df, "all_in", 14, 30, 70)
+
+    assert {trade['size'] for trade in fixed_trades} == {1.0}
+    assert all_in_trades[0]['size'] > 1.0
+    assert fixed['final_value'] != all_in['final_value']
+
+
+@pytest.mark.parametrize("sizer", ["fixed", "all_in"])
+def test_sweep_rows_match_single_backtests(sizer):
+    df = synthetic_frame()
+    pairs = [(30, 70), (25, 60), (40, 65)]
+    rows = run_rsi_sweep(df, [10, 14], pairs, 100000.0, sizer=sizer)
+
+    assert len(rows) == 6
+    for row in rows:
+        params = {name: row.pop(name) for name in ('rsi_period', 'rsi_buy', 'rsi_sell')}
+        expected, _ = run("backtrader", df, sizer, **params)
+        assert row == expected
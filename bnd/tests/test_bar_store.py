@@ -0,0 +1,128 @@
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from bar_store import ADJUSTMENT_OVERLAP, BarStore
+from benchmarks.fixtures import symbol_history
+from upstream import UpstreamThrottled
+
+LISTED = date(2020, 1, 6)
+
+
+class Upstream:
+    """Fetchers over symbol_history that record every requested range.
+
+    Symbols have no bars before LISTED; scale multiplies every price, as a
+    split adjustment applied upstream would.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.scale = 1.0
+        self.error = None
+
+    def bars(self, symbol, start, end):
+        df = symbol_history(symbol)
+        df = df.loc[pd.Timestamp(max(start, LISTED)):pd.Timestamp(end) - pd.Timedelta(seconds=1)].copy()
+        df[['Open', 'High', 'Low', 'Close']] *= self.scale
+        return df
+
+    def fetch(self, symbol, start, end, interval='1d'):
+        self.calls.append((symbol, start, end))
+        if self.error:
+            raise self.error
+        return self.bars(symbol, start, end)
+
+    def fetch_many(self, symbols, start, end, interval='1d'):
+        self.calls.append((tuple(symbols), start, end))
+        if self.error:
+            raise self.error
+        frames = {symbol: self.bars(symbol, start, end) for symbol in symbols}
+        return {symbol: df for symbol, df in frames.items() if not df.empty}
+
+
+@pytest.fixture
+def upstream():
+    return Upstream()
+
+
+@pytest.fixture
+def store(tmp_path, upstream):
+    return BarStore(root=str(tmp_path), fetcher=upstream.fetch, bulk_fetcher=upstream.fetch_many,
+                    forming_day=lambda: date(2030, 1, 1), serve_stale_on=(UpstreamThrottled,))
+
+
+def test_repeat_requests_are_served_from_the_store(store, upstream):
+    first = store.get_bars('AAA', '2021-01-01', '2021-06-01')
+    assert upstream.calls == [('AAA', date(2021, 1, 1), date(2021, 6, 1))]
+    pd.testing.assert_frame_equal(store.get_bars('AAA', '2021-02-01', '2021-03-01'),
+                                  first.loc['2021-02-01':'2021-02-28'], check_freq=False)
+    assert len(upstream.calls) == 1
+    assert (store.hits, store.misses) == (1, 1)
+
+
+def test_ranges_without_bars_count_as_covered(store, upstream):
+    assert store.get_bars('AAA', '2019-01-01', '2019-06-01').empty
+    assert store.get_bars('AAA', '2019-01-01', '2019-06-01').empty
+    assert len(upstream.calls) == 1
+
+
+def test_only_the_gap_is_fetched_widened_into_stored_days(store, upstream):
+    store.get_bars('AAA', '2021-01-01', '2021-06-01')
+    store.get_bars('AAA', '2021-01-01', '2021-09-01')
+    assert upstream.calls[-1] == ('AAA', date(2021, 6, 1) - ADJUSTMENT_OVERLAP, date(2021, 9, 1))
+
+
+def test_an_older_range_does_not_refetch_the_days_in_between(store, upstream):
+    store.get_bars('AAA', '2023-01-01', '2023-02-01')
+    store.get_bars('AAA', '2021-01-01', '2021-02-01')
+    assert upstream.calls[-1] == ('AAA', date(2021, 1, 1), date(2021, 2, 1))
+    store.get_bars('AAA', '2021-01-10', '2021-01-20')
+    store.get_bars('AAA', '2023-01-10', '2023-01-20')
+    assert len(upstream.calls) == 2
+
+
+def test_adjusted_prices_refetch_the_whole_history(store, upstream):
+    store.get_bars('AAA', '2021-01-01', '2021-06-01')
+    upstream.scale = 0.5
+    bars = store.get_bars('AAA', '2021-01-01', '2021-09-01')
+    assert upstream.calls[-1] == ('AAA', date(2021, 1, 1), date(2021, 9, 1))
+    expected = upstream.bars('AAA', date(2021, 1, 1), date(2021, 9, 1))
+    assert bars['Close'].to_numpy() == pytest.approx(expected['Close'].to_numpy())
+    _, coverage = store._load('AAA', '1d')
+    assert coverage == [(date(2021, 1, 1), date(2021, 9, 1))]
+
+
+def test_the_forming_day_is_never_covered(tmp_path, upstream):
+    today = date(2021, 3, 10)
+    store = BarStore(root=str(tmp_path), fetcher=upstream.fetch, forming_day=lambda: today)
+    store.get_bars('AAA', '2021-01-01', today + timedelta(days=1))
+    _, coverage = store._load('AAA', '1d')
+    assert coverage == [(date(2021, 1, 1), today)]
+
+    store.get_bars('AAA', '2021-01-01', today + timedelta(days=1))
+    assert upstream.calls[-1] == ('AAA', today - ADJUSTMENT_OVERLAP, today + timedelta(days=1))
+    store.get_bars('AAA', '2021-01-01', today)
+    assert len(upstream.calls) == 2
+
+
+def test_stale_bars_are_served_while_upstream_is_throttled(store, upstream):
+    stored = store.get_bars('AAA', '2021-01-01', '2021-06-01')
+    upstream.error = UpstreamThrottled("slow down")
+    pd.testing.assert_frame_equal(store.get_bars('AAA', '2021-01-01', '2021-09-01'), stored, check_freq=False)
+    assert store.stale == 1
+    with pytest.raises(UpstreamThrottled):
+        store.get_bars('BBB', '2021-01-01', '2021-06-01')
+
+
+def test_bulk_requests_share_one_fetch_per_gap(store, upstream):
+    store.get_bars('AAA', '2021-01-01', '2021-06-01')
+    result = store.get_bars_many(['AAA', 'BBB', 'CCC'], '2021-01-01', '2021-06-01')
+    assert sorted(result) == ['AAA', 'BBB', 'CCC']
+    assert upstream.calls[1:] == [(('BBB', 'CCC'), date(2021, 1, 1), date(2021, 6, 1))]
+
+    # Symbols the bulk fetch left out have no bars there, and are covered too
+    assert store.get_bars_many(['DDD'], '2019-01-01', '2019-06-01') == {}
+    store.get_bars_many(['AAA', 'DDD'], '2019-01-01', '2019-06-01')
+    assert upstream.calls[-1] == (('AAA',), date(2019, 1, 1), date(2019, 6, 1))
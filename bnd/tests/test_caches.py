@@ -0,0 +1,149 @@
+import os
+import time
+
+import pytest
+
+from metadata_cache import MetadataCache
+from result_cache import ResultCache
+from snapshots import SnapshotCache, etag_matches
+from upstream import UpstreamUnavailable
+
+TTLS = {'longName': 100, 'marketCap': 10}
+
+
+class Loader:
+    """Metadata loader that counts calls; marketCap is the call number"""
+
+    def __init__(self):
+        self.calls = []
+        self.error = None
+
+    def __call__(self, symbol):
+        self.calls.append(symbol)
+        if self.error:
+            raise self.error
+        if symbol.startswith('NOPE'):
+            return {}
+        return {'longName': f"{symbol} Inc.", 'marketCap': len(self.calls), 'website': 'x'}
+
+
+@pytest.fixture
+def clock():
+    now = [0.0]
+
+    def clock():
+        return now[0]
+    clock.advance = lambda seconds: now.__setitem__(0, now[0] + seconds)
+    return clock
+
+
+@pytest.fixture
+def loader():
+    return Loader()
+
+
+def metadata_cache(loader, clock, **kwargs):
+    return MetadataCache(loader, field_ttls=TTLS, stale_ttl=50, negative_ttl=30, clock=clock,
+                         serve_stale_on=(UpstreamUnavailable,), **kwargs)
+
+
+def test_fresh_fields_are_served_from_memory(loader, clock):
+    cache = metadata_cache(loader, clock)
+    assert cache.get('AAA') == {'longName': 'AAA Inc.', 'marketCap': 1}
+    clock.advance(9)
+    assert cache.get('AAA') == {'longName': 'AAA Inc.', 'marketCap': 1}
+    assert cache.get('AAA', ['longName']) == {'longName': 'AAA Inc.', 'marketCap': 1}
+    assert (len(loader.calls), cache.hits, cache.misses) == (1, 2, 1)
+
+
+def test_expired_fields_are_served_stale_while_refreshing(loader, clock):
+    cache = metadata_cache(loader, clock)
+    cache.get('AAA')
+    clock.advance(20)
+    assert cache.get('AAA')['marketCap'] == 1
+    # Lookups keep getting the stale entry until the one refresh lands
+    deadline = time.monotonic() + 5
+    while cache.get('AAA')['marketCap'] == 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert cache.get('AAA')['marketCap'] == 2
+    assert len(loader.calls) == 2
+
+    # Past the stale window the lookup waits for a fresh fetch
+    clock.advance(100)
+    assert cache.get('AAA')['marketCap'] == 3
+
+
+def test_unknown_symbols_are_cached_as_misses(loader, clock):
+    cache = metadata_cache(loader, clock)
+    assert cache.get('NOPE') is None
+    assert cache.get('NOPE') is None
+    assert len(loader.calls) == 1
+    clock.advance(30)
+    assert cache.get('NOPE') is None
+    assert len(loader.calls) == 2
+
+
+def test_least_recently_used_entries_are_evicted(loader, clock):
+    cache = metadata_cache(loader, clock, max_entries=2)
+    for symbol in ('AAA', 'BBB', 'AAA', 'CCC'):
+        cache.get(symbol)
+    assert loader.calls == ['AAA', 'BBB', 'CCC']
+    cache.get('AAA')
+    cache.get('BBB')
+    assert loader.calls == ['AAA', 'BBB', 'CCC', 'BBB']
+
+
+def test_expired_entries_are_served_when_upstream_is_unavailable(loader, clock):
+    cache = metadata_cache(loader, clock)
+    cache.get('AAA')
+    clock.advance(1000)
+    loader.error = UpstreamUnavailable("throttled")
+    assert cache.get('AAA') == {'longName': 'AAA Inc.', 'marketCap': 1}
+    assert cache.stale == 1
+    with pytest.raises(UpstreamUnavailable):
+        cache.get('BBB')
+
+
+def test_snapshots_are_reused_only_for_the_same_version():
+    cache = SnapshotCache(max_entries=2)
+    snapshot = cache.put('AAA', 1, 'v1', b'{"a": 1}')
+    assert cache.get('AAA', 1, 'v1') is snapshot
+    assert cache.get('AAA', 1, 'v2') is None
+    assert cache.put('AAA', 1, 'v2', b'{"a": 2}').etag != snapshot.etag
+
+    cache.put('BBB', 1, 'v1', b'{}')
+    cache.get('AAA', 1, 'v2')
+    cache.put('CCC', 1, 'v1', b'{}')
+    assert cache.get('BBB', 1, 'v1') is None
+    assert cache.get('AAA', 1, 'v2') is not None
+
+
+def test_etag_matching_follows_if_none_match():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches('"xyz", "abc"', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches('"xyz"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_results_are_evicted_from_memory_but_kept_on_disk(tmp_path):
+    cache = ResultCache(root=str(tmp_path), max_entries=2, max_disk_entries=10)
+    for key in ('aa1', 'bb2', 'cc3'):
+        cache.put(key, {'key': key})
+    assert cache.get('aa1') == {'key': 'aa1'}
+    assert (cache.hits, cache.disk_hits) == (0, 1)
+    assert cache.get('cc3') == {'key': 'cc3'}
+    assert cache.hits == 1
+    assert cache.get('dd4') is None
+
+
+def test_pruning_keeps_the_newest_results_on_disk(tmp_path):
+    cache = ResultCache(root=str(tmp_path), max_entries=1, max_disk_entries=2)
+    for i, key in enumerate(('aa1', 'bb2', 'cc3')):
+        cache.put(key, {'key': key})
+        os.utime(cache._path(key), (i, i))
+    cache.prune()
+    assert not os.path.exists(cache._path('aa1'))
+    assert cache.get('bb2') == {'key': 'bb2'}
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from benchmarks.fixtures import synthetic_bars
+from benchmarks.reference_indicators import (
+    calculate_fibonacci_levels, calculate_support_resistance, calculate_technical_indicators,
+)
+from incremental import IndicatorState
+from indicators import compute_indicators
+
+
+def reference_levels(df):
+    levels = calculate_technical_indicators(df)
+    support, resistance = calculate_support_resistance(df)
+    levels['support_level'] = float(support)
+    levels['resistance_level'] = float(resistance)
+    levels.update(calculate_fibonacci_levels(df))
+    return levels
+
+
+@pytest.mark.parametrize("n", [1, 2, 13, 14, 30, 250, 2500])
+def test_kernel_matches_reference(n):
+    df = synthetic_bars(n, seed=n)
+    expected = reference_levels(df)
+    actual = compute_indicators(df['High'].values, df['Low'].values, df['Close'].values)
+    for name, value in expected.items():
+        np.testing.assert_allclose(actual[name], value, rtol=1e-9, atol=1e-9, equal_nan=True, err_msg=name)
+
+
+def test_incremental_state_matches_reference():
+    df = synthetic_bars(120, seed=3)
+    ts = df.index.values.astype('datetime64[s]').astype(np.int64)
+    high, low, close = (df[c].to_numpy(dtype=np.float64) for c in ('High', 'Low', 'Close'))
+
+    state = IndicatorState()
+    for end in (40, 41, 90, 120):
+        state.advance(ts[:end], high[:end], low[:end], close[:end])
+        values = state.values(high[end - 1], low[end - 1], close[end - 1])
+        expected = calculate_technical_indicators(df.iloc[:end])
+        for name, value in expected.items():
+            assert values[name] == pytest.approx(value, rel=1e-9, abs=1e-9), name
@@ -0,0 +1,38 @@
+from datetime import date, datetime
+
+import pandas as pd
+
+from prefetch import MARKET_TZ, PrefetchScheduler, forming_day, is_trading_day, last_session
+
+
+def at(*args):
+    return datetime(*args, tzinfo=MARKET_TZ)
+
+
+def test_exchange_holidays_are_not_trading_days():
+    assert not is_trading_day(date(2025, 4, 18))   # Good Friday
+    assert not is_trading_day(date(2026, 7, 3))    # Independence Day observed on Friday
+    assert not is_trading_day(date(2025, 11, 27))  # Thanksgiving
+    assert is_trading_day(date(2025, 10, 13))      # Columbus Day: banks close, exchanges do not
+    assert is_trading_day(date(2027, 12, 31))      # Saturday New Year's Day is not observed
+
+
+def test_sessions_skip_holidays():
+    assert last_session(at(2025, 12, 25, 18)) == date(2025, 12, 24)
+    assert last_session(at(2025, 12, 26, 10)) == date(2025, 12, 24)
+    assert forming_day(at(2025, 12, 25, 10)) == date(2025, 12, 26)
+
+
+def test_prefetch_on_a_holiday_is_covered_by_the_previous_session():
+    calls = []
+
+    def load_many(symbols, start, end):
+        calls.append(list(symbols))
+        index = pd.DatetimeIndex(['2025-11-25', '2025-11-26'], name='Date')
+        return {s: pd.DataFrame({'Close': [1.0, 2.0]}, index=index) for s in symbols}
+
+    scheduler = PrefetchScheduler(['AAA', 'BBB'], load_many, backoff=0,
+                                  clock=lambda: at(2025, 11, 27, 17))
+    assert set(scheduler.run_once()) == {'AAA', 'BBB'}
+    assert len(calls) == 1
+    assert (scheduler.refreshed, scheduler.failed) == (2, 0)
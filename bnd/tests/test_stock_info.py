@@ -0,0 +1,43 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.fixtures import StubProvider
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    import main
+    previous, root = main.market_data, main.bar_store.root
+    main.use_provider(StubProvider())
+    main.bar_store.root = str(tmp_path_factory.mktemp("bars"))
+    yield TestClient(main.app)
+    main.use_provider(previous)
+    main.bar_store.root = root
+
+
+def test_unchanged_stock_info_answers_304(client):
+    first = client.get('/stock-info/AAA')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    second = client.get('/stock-info/AAA')
+    assert (second.headers['ETag'], second.content) == (etag, first.content)
+
+    not_modified = client.get('/stock-info/AAA', headers={'If-None-Match': f'W/{etag}'})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b''
+    assert not_modified.headers['ETag'] == etag
+
+    assert client.get('/stock-info/AAA', headers={'If-None-Match': '"stale"'}).status_code == 200
+
+
+def test_batch_matches_single_stock_info(client):
+    batch = client.post('/stock-info/batch', json={'symbols': ['BBB', 'NOPE1', 'AAA']})
+    assert batch.status_code == 200
+    assert [info['symbol'] for info in batch.json()] == ['BBB', 'AAA']
+    assert batch.json()[1] == client.get('/stock-info/AAA').json()
+
+
+def test_unknown_symbol_is_not_found(client):
+    assert client.get('/stock-info/NOPE2').status_code == 404
@@ -0,0 +1,64 @@
+import time
+
+import pytest
+
+from benchmarks.fixtures import write_listing
+from symbol_index import SymbolIndex
+
+LISTINGS = {
+    'AAPL': 'Apple Inc.',
+    'APLE': 'Apple Hospitality REIT Inc.',
+    'AMD': 'Advanced Micro Devices Inc.',
+    'MSFT': 'Microsoft Corporation',
+    'A': 'Agilent Technologies Inc.',
+    'AA': 'Alcoa Corporation',
+}
+
+# Per-keystroke suggestions have to leave room for the request around them
+LATENCY_BUDGET = 0.001
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SymbolIndex(LISTINGS, popular=['AAPL', 'MSFT'])
+
+
+@pytest.fixture(scope="module")
+def large_index(tmp_path_factory):
+    path = tmp_path_factory.mktemp("listing") / "symbols.csv"
+    write_listing(path, extra=LISTINGS.items())
+    return SymbolIndex.from_csv(str(path), popular=['AAPL', 'MSFT'])
+
+
+def test_exact_symbol_ranks_before_prefixes(index):
+    assert [r[0] for r in index.search('a')][:3] == ['A', 'AAPL', 'AA']
+    assert index.search('a')[0][2] == 'symbol'
+
+
+def test_name_matches_follow_symbol_matches_popular_first(index):
+    results = index.search('apple')
+    assert [r[0] for r in results] == ['AAPL', 'APLE']
+    assert {r[2] for r in results} == {'company'}
+
+
+def test_every_word_must_prefix_some_name_token(index):
+    assert [r[0] for r in index.search('inc apple')] == ['AAPL', 'APLE']
+    assert [r[0] for r in index.search('micro dev')] == ['AMD']
+
+
+def test_misspelt_names_only_match_fuzzily(index):
+    assert index.search('microsfot', fuzzy=False) == []
+    assert index.search('microsfot')[0] == ('MSFT', 'Microsoft Corporation', 'company')
+    assert index.search('xqzv') == []
+
+
+@pytest.mark.parametrize("query", ['therapeutcs', 'synth gro', 'holdings tech', 'aapl', 'xqzv',
+                                   'micro', 'konrotel', 'kamitel holdngs'])
+def test_search_stays_within_latency_budget(large_index, query):
+    large_index.search(query)
+    best = float('inf')
+    for _ in range(20):
+        start = time.perf_counter()
+        large_index.search(query)
+        best = min(best, time.perf_counter() - start)
+    assert best < LATENCY_BUDGET, f"{query!r} took {best * 1000:.3f} ms"
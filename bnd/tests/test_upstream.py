@@ -0,0 +1,102 @@
+import pytest
+
+from upstream import TokenBucket, UpstreamEmpty, UpstreamGovernor, UpstreamThrottled
+
+
+class Clock:
+    """Fake monotonic clock; sleeping advances it and is recorded"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def governor(clock, **kwargs):
+    kwargs = {'rate': 1.0, 'burst': 2, 'max_concurrent': 2, 'max_wait': 0.0, 'retries': 2,
+              'backoff': 0.5, 'max_backoff': 4.0, **kwargs}
+    return UpstreamGovernor(clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def failing(*errors, result='ok'):
+    errors = list(errors)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+    fn.calls = calls
+    return fn
+
+
+def test_calls_past_the_burst_are_throttled():
+    clock = Clock()
+    g = governor(clock)
+    assert [g.call(lambda: i) for i in range(2)] == [0, 1]
+    with pytest.raises(UpstreamThrottled):
+        g.call(lambda: 2)
+    assert g.throttled['rate'] == 1
+
+    clock.now += 1.0
+    assert g.call(lambda: 3) == 3
+
+
+def test_calls_within_max_wait_queue_for_a_token():
+    clock = Clock()
+    g = governor(clock, max_wait=5.0)
+    for _ in range(4):
+        g.call(lambda: None)
+    assert clock.sleeps == [1.0, 1.0]
+    assert g.throttled == {'rate': 0, 'concurrency': 0, 'upstream': 0}
+
+
+def test_concurrent_reservations_queue_behind_each_other():
+    bucket = TokenBucket(rate=1.0, burst=2, clock=Clock())
+    assert [bucket.reserve(2.0) for _ in range(4)] == [0.0, 0.0, 1.0, 2.0]
+    assert bucket.reserve(2.0) is None
+
+
+def test_calls_beyond_the_concurrency_cap_are_throttled():
+    g = governor(Clock(), max_concurrent=1, burst=5)
+    with pytest.raises(UpstreamThrottled):
+        g.call(lambda: g.call(lambda: None))
+    assert g.throttled['concurrency'] == 1
+    assert (g.in_flight, g.waiting) == (0, 0)
+
+
+def test_transient_errors_are_retried_with_backoff():
+    clock = Clock()
+    fn = failing(ConnectionError("reset"), UpstreamEmpty("no bars"))
+    g = governor(clock, burst=5)
+    assert g.call(fn) == 'ok'
+    assert len(fn.calls) == 3
+    assert g.retried == 2
+    assert len(clock.sleeps) == 2
+    assert 0 <= clock.sleeps[0] <= 0.5 and 0 <= clock.sleeps[1] <= 1.0
+
+
+def test_persistent_rate_limiting_surfaces_as_throttled():
+    fn = failing(*[RuntimeError("429 Too Many Requests")] * 3)
+    g = governor(Clock(), burst=5)
+    with pytest.raises(UpstreamThrottled):
+        g.call(fn)
+    assert len(fn.calls) == 3
+    assert g.throttled['upstream'] == 1
+
+
+def test_other_errors_are_not_retried():
+    fn = failing(ValueError("bad symbol"))
+    g = governor(Clock())
+    with pytest.raises(ValueError):
+        g.call(fn)
+    assert len(fn.calls) == 1
+    assert g.retried == 0
+    assert g.in_flight == 0
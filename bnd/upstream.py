@@ -0,0 +1,145 @@
+import os
+import time
+import random
+import threading
+
+# Shared budget for calls to the market data provider, overridable from the
+# environment: sustained calls per second, burst size and concurrent calls
+UPSTREAM_RATE = float(os.environ.get("UPSTREAM_RATE", 2.0))
+UPSTREAM_BURST = int(os.environ.get("UPSTREAM_BURST", 10))
+UPSTREAM_MAX_CONCURRENT = int(os.environ.get("UPSTREAM_MAX_CONCURRENT", 4))
+# Longest a call may queue for its turn before it is throttled
+UPSTREAM_MAX_WAIT = float(os.environ.get("UPSTREAM_MAX_WAIT", 5.0))
+UPSTREAM_RETRIES = int(os.environ.get("UPSTREAM_RETRIES", 3))
+UPSTREAM_BACKOFF = float(os.environ.get("UPSTREAM_BACKOFF", 0.5))
+UPSTREAM_MAX_BACKOFF = float(os.environ.get("UPSTREAM_MAX_BACKOFF", 8.0))
+
+
+class UpstreamUnavailable(Exception):
+    """Upstream data could not be had right now; stored data may be served instead"""
+
+
+class UpstreamThrottled(UpstreamUnavailable):
+    """Raised when an upstream call cannot be made within the governor's budget"""
+
+
+class UpstreamEmpty(UpstreamUnavailable):
+    """Raised by a provider when upstream returned no bars for a range that has
+    sessions in it, without saying the symbol has none (yfinance answers
+    throttling and network failures that way)"""
+
+
+def is_rate_limited(error):
+    """Whether an upstream error means we are being throttled (yfinance raises
+    YFRateLimitError, or logs it behind an empty frame; raw HTTP clients
+    report a 429)"""
+    text = str(error)
+    return type(error).__name__ == 'YFRateLimitError' or '429' in text or 'Too Many Requests' in text
+
+
+def is_transient(error):
+    return is_rate_limited(error) or isinstance(error, (ConnectionError, TimeoutError, UpstreamEmpty))
+
+
+class TokenBucket:
+    """Token bucket whose callers reserve tokens ahead and sleep until they are due"""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait):
+        """Reserve one token; returns the seconds to wait for it, or None if over max_wait"""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1.0 - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            # Tokens may go negative: that is the queue of callers already waiting
+            self._tokens -= 1.0
+            return wait
+
+
+class UpstreamGovernor:
+    """Shared rate limit, bulkhead and retry policy for upstream calls.
+
+    Every call takes a token from a token bucket (``rate`` per second, up to
+    ``burst`` at once) and one of ``max_concurrent`` slots. A call that would
+    wait longer than ``max_wait`` for either fails fast with
+    UpstreamThrottled, so callers can fall back to stale data instead of
+    piling up behind a throttled provider. Transient errors (including
+    UpstreamEmpty) are retried with full-jitter exponential backoff; if
+    upstream keeps rate limiting us the last error also surfaces as
+    UpstreamThrottled.
+    """
+
+    def __init__(self, rate=UPSTREAM_RATE, burst=UPSTREAM_BURST, max_concurrent=UPSTREAM_MAX_CONCURRENT,
+                 max_wait=UPSTREAM_MAX_WAIT, retries=UPSTREAM_RETRIES, backoff=UPSTREAM_BACKOFF,
+                 max_backoff=UPSTREAM_MAX_BACKOFF, clock=time.monotonic, sleep=time.sleep):
+        self.bucket = TokenBucket(rate, burst, clock)
+        self.max_concurrent = max_concurrent
+        self.max_wait = max_wait
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+        self.sleep = sleep
+        self.waiting = 0
+        self.in_flight = 0
+        self.throttled = {'rate': 0, 'concurrency': 0, 'upstream': 0}
+        self.retried = 0
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+
+    def _throttle(self, reason, message):
+        with self._lock:
+            self.throttled[reason] += 1
+        raise UpstreamThrottled(message)
+
+    def _acquire(self):
+        deadline = self.clock() + self.max_wait
+        with self._lock:
+            self.waiting += 1
+        try:
+            wait = self.bucket.reserve(self.max_wait)
+            if wait is None:
+                self._throttle('rate', f"Upstream rate limit reached ({self.bucket.rate:g}/s)")
+            if wait > 0:
+                self.sleep(wait)
+            if not self._slots.acquire(timeout=max(deadline - self.clock(), 0.0)):
+                self._throttle('concurrency', f"All {self.max_concurrent} upstream slots are busy")
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        with self._lock:
+            self.in_flight += 1
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def call(self, fn, *args, **kwargs):
+        for attempt in range(self.retries + 1):
+            self._acquire()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                if attempt == self.retries:
+                    if is_rate_limited(e):
+                        self._throttle('upstream', f"Upstream is rate limiting us: {e}")
+                    raise
+            finally:
+                self._release()
+
+            with self._lock:
+                self.retried += 1
+            self.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))